@@ -0,0 +1,191 @@
+# FILE: struct_module/bundle.py
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+import yaml
+
+from struct_module.content_fetcher import STREAM_CHUNK_SIZE, FileSlice
+from struct_module.mappings_store import to_plain
+from struct_module.structure_loader import parse_yaml
+
+INDEX = "index.json"
+BUNDLE_VERSION = 1
+BUNDLE_FORMATS = {".zip": "zip", ".tar": "tar"}
+
+
+def bundle_format(path):
+  """Return 'zip' or 'tar' for a bundle path, or None."""
+  return BUNDLE_FORMATS.get(os.path.splitext(str(path))[1].lower())
+
+
+def is_bundle(path):
+  return bundle_format(path) is not None and os.path.isfile(path)
+
+
+def _member(folder, key, suffix=""):
+  return f"{folder}/{hashlib.sha256(key.encode()).hexdigest()}{suffix}"
+
+
+def write_bundle(path, root, structures, sources, mappings=None, lookups=None):
+  """
+  Write a bundle to path (.zip or .tar).
+
+  structures maps each structure definition name, as referenced in the
+  tree, to its raw YAML bytes; sources maps each file: location to its
+  body, or for binary sources to a callable opening a binary stream,
+  which is copied into the archive in chunks. index.json, written first,
+  maps names and locations to members.
+  """
+  index = {
+    "version": BUNDLE_VERSION,
+    "root": root,
+    "structures": {},
+    "sources": {},
+    "binary": [],
+    "mappings": None,
+    "lookups": lookups or {},
+  }
+  members = []
+  for name, data in structures.items():
+    member = index["structures"][name] = _member("structures", name, ".yaml")
+    members.append((member, data))
+  for location, body in sources.items():
+    member = index["sources"][location] = _member("sources", location)
+    if callable(body):
+      index["binary"].append(location)
+      members.append((member, body))
+    else:
+      members.append((member, body.encode("utf-8")))
+  if mappings:
+    index["mappings"] = "mappings.yaml"
+    members.append(("mappings.yaml", yaml.safe_dump(to_plain(mappings), sort_keys=False).encode("utf-8")))
+  members.insert(0, (INDEX, json.dumps(index, indent=2).encode("utf-8")))
+
+  directory = os.path.dirname(os.path.abspath(path))
+  fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+  os.close(fd)
+  try:
+    if bundle_format(path) == "tar":
+      with tarfile.open(tmp, "w") as tf:
+        for name, data in members:
+          info = tarfile.TarInfo(name)
+          if callable(data):
+            # Tar headers need the size up front: spool the stream to disk
+            with data() as source, tempfile.TemporaryFile() as spool:
+              shutil.copyfileobj(source, spool, STREAM_CHUNK_SIZE)
+              info.size = spool.tell()
+              spool.seek(0)
+              tf.addfile(info, spool)
+          else:
+            info.size = len(data)
+            tf.addfile(info, _BytesReader(data))
+    else:
+      with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+          if callable(data):
+            with data() as source, zf.open(name, "w", force_zip64=True) as target:
+              shutil.copyfileobj(source, target, STREAM_CHUNK_SIZE)
+          else:
+            zf.writestr(name, data)
+    os.replace(tmp, path)
+  finally:
+    if os.path.exists(tmp):
+      os.unlink(tmp)
+  return index
+
+
+class _BytesReader:
+  def __init__(self, data):
+    self._data = memoryview(data)
+    self._pos = 0
+
+  def read(self, size=-1):
+    end = len(self._data) if size is None or size < 0 else self._pos + size
+    chunk = self._data[self._pos:end].tobytes()
+    self._pos += len(chunk)
+    return chunk
+
+
+class StructureBundle:
+  """
+  Read-only view of a bundle written by write_bundle.
+
+  Zip bundles are read through their central directory and tar bundles
+  through one pass over the member headers; either way a member is only
+  read, by seeking to it, when a structure or source is first requested.
+  """
+  def __init__(self, path):
+    self.path = str(path)
+    self._lock = threading.Lock()
+    self._structures = {}
+    if bundle_format(self.path) == "tar":
+      self._archive = tarfile.open(self.path, "r:")
+      self._read_member = lambda name: self._archive.extractfile(name).read()
+    else:
+      self._archive = zipfile.ZipFile(self.path)
+      self._read_member = self._archive.read
+    self.index = json.loads(self._read(INDEX))
+    if self.index.get("version") != BUNDLE_VERSION:
+      raise ValueError(f"Unsupported bundle version in {self.path}: {self.index.get('version')}")
+
+  def _read(self, member):
+    with self._lock:
+      return self._read_member(member)
+
+  @property
+  def root(self):
+    return self.index["root"]
+
+  @property
+  def lookups(self):
+    return self.index.get("lookups") or {}
+
+  def load_structure(self, name):
+    """Return the parsed definition of a structure, or None if it is not bundled."""
+    member = self.index["structures"].get(name)
+    if member is None:
+      return None
+    with self._lock:
+      if name not in self._structures:
+        self._structures[name] = parse_yaml(self._read_member(member))
+      return self._structures[name]
+
+  def source(self, location):
+    member = self.index["sources"].get(location)
+    if member is None:
+      raise FileNotFoundError(f"{location} is not in the bundle {self.path}")
+    return self._read(member).decode("utf-8")
+
+  def is_binary(self, location):
+    return location in self.index.get("binary", ())
+
+  def open_source(self, location):
+    """Open a source as a binary stream read from the archive in chunks."""
+    member = self.index["sources"].get(location)
+    if member is None:
+      raise FileNotFoundError(f"{location} is not in the bundle {self.path}")
+    # Each stream gets its own file handle so parallel jobs never share one
+    if bundle_format(self.path) == "tar":
+      with self._lock:
+        info = self._archive.getmember(member)
+      return FileSlice(self.path, info.offset_data, info.size)
+    archive = zipfile.ZipFile(self.path)
+    try:
+      return archive.open(member)
+    finally:
+      # The member stream keeps the file open until it is closed
+      archive.close()
+
+  def mappings(self):
+    if not self.index.get("mappings"):
+      return {}
+    return parse_yaml(self._read(self.index["mappings"])) or {}
+
+  def close(self):
+    self._archive.close()
@@ -0,0 +1,345 @@
+# FILE: struct_module/cache_index.py
+import atexit
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.sqlite"
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+_AGE_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# resolved cache dir -> CacheIndex shared by every fetcher of the process
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def parse_size(text):
+  """Parse sizes such as 500M, 2G or 1048576 into bytes."""
+  match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(text), re.IGNORECASE)
+  if not match:
+    raise ValueError(f"Invalid size: {text}")
+  return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_age(text):
+  """Parse ages such as 7d, 12h, 30m or 90 (seconds) into seconds."""
+  match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", str(text))
+  if not match:
+    raise ValueError(f"Invalid age: {text}")
+  return float(match.group(1)) * _AGE_UNITS[match.group(2)]
+
+
+def path_size(path):
+  path = Path(path)
+  if path.is_dir():
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file() and not p.is_symlink())
+  return path.stat().st_size
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+  """sha256 of a file, read in chunks."""
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def _remove_path(path):
+  path = Path(path)
+  if path.is_dir():
+    shutil.rmtree(path, ignore_errors=True)
+  else:
+    path.unlink(missing_ok=True)
+  # Sidecar metadata written next to HTTP bodies
+  Path(f"{path}.meta.json").unlink(missing_ok=True)
+
+
+class CacheIndex:
+  """
+  Metadata index of the entries stored in a ContentFetcher cache directory.
+
+  Each entry (an HTTP body, a cloned repository, an S3/GCS download, or a
+  template, structure or mappings cache file kept under the same
+  directory) has a row with its kind, size, checksum, creation time, last
+  access and hit count, so stats, eviction and verification never walk
+  the content.
+  Accesses are buffered in memory and written in one transaction when the
+  process exits. When STRUCT_CACHE_MAX_MB is set, least recently used
+  entries are evicted as soon as the cache grows past it, except those
+  this process recorded or read, which may still be open; the cap is
+  enforced on them too when the process exits.
+  """
+  def __init__(self, cache_dir):
+    self.cache_dir = Path(cache_dir)
+    self.path = self.cache_dir / INDEX_FILE
+    self._real_dir = os.path.realpath(cache_dir)
+    self._conn = None
+    self._lock = threading.RLock()
+    # key -> (last access, hits) not yet written to the index
+    self._pending = {}
+    self._misses = 0
+    # Keys recorded or read by this process, never evicted while it runs
+    self._used = set()
+
+  def _connection(self):
+    if self._conn is None:
+      self.cache_dir.mkdir(parents=True, exist_ok=True)
+      self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+      self._conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+          key TEXT PRIMARY KEY,
+          kind TEXT NOT NULL,
+          size INTEGER NOT NULL,
+          checksum TEXT,
+          created REAL NOT NULL,
+          last_access REAL NOT NULL,
+          hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """
+      )
+    return self._conn
+
+  def _key(self, path):
+    return os.path.relpath(os.path.realpath(path), self._real_dir)
+
+  def record(self, path, kind, data=None, checksum=None):
+    """
+    Register a newly written entry. data (bytes) is hashed for verify, or
+    checksum is given for files too large to hold in memory; directories
+    are recorded by size only.
+    """
+    path = Path(path)
+    if data is not None:
+      checksum = hashlib.sha256(data).hexdigest()
+    size = len(data) if data is not None else path_size(path)
+    now = time.time()
+    with self._lock:
+      conn = self._connection()
+      conn.execute(
+        """
+        INSERT INTO entries (key, kind, size, checksum, created, last_access, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+        ON CONFLICT(key) DO UPDATE SET
+          kind = excluded.kind, size = excluded.size, checksum = excluded.checksum,
+          created = excluded.created, last_access = excluded.last_access
+        """,
+        (self._key(path), kind, size, checksum, now, now),
+      )
+      conn.commit()
+      self._misses += 1
+      self._used.add(self._key(path))
+      keep = set(self._used)
+    self._enforce_cap(keep)
+
+  def touch(self, path):
+    """Note a cache hit; written to the index on flush()."""
+    key = self._key(path)
+    with self._lock:
+      _, hits = self._pending.get(key, (0, 0))
+      self._pending[key] = (time.time(), hits + 1)
+      self._used.add(key)
+
+  def flush(self):
+    with self._lock:
+      if not self._pending and not self._misses:
+        return
+      try:
+        conn = self._connection()
+        conn.executemany(
+          "UPDATE entries SET last_access = MAX(last_access, ?), hits = hits + ? WHERE key = ?",
+          [(last_access, hits, key) for key, (last_access, hits) in self._pending.items()],
+        )
+        total_hits = sum(hits for _, hits in self._pending.values())
+        for name, value in (("hits", total_hits), ("misses", self._misses)):
+          conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+          )
+        conn.commit()
+      except sqlite3.Error as e:
+        logger.debug(f"Could not update cache index {self.path}: {e}")
+        return
+      self._pending.clear()
+      self._misses = 0
+
+  def entries(self):
+    self.flush()
+    with self._lock:
+      rows = self._connection().execute(
+        "SELECT key, kind, size, checksum, created, last_access, hits FROM entries ORDER BY last_access"
+      ).fetchall()
+    keys = ("key", "kind", "size", "checksum", "created", "last_access", "hits")
+    return [dict(zip(keys, row)) for row in rows]
+
+  def stats(self):
+    entries = self.entries()
+    with self._lock:
+      counters = dict(self._connection().execute("SELECT name, value FROM counters"))
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    kinds = {}
+    for entry in entries:
+      kind = kinds.setdefault(entry["kind"], {"entries": 0, "bytes": 0})
+      kind["entries"] += 1
+      kind["bytes"] += entry["size"]
+    return {
+      "entries": len(entries),
+      "bytes": sum(entry["size"] for entry in entries),
+      "hits": hits,
+      "misses": misses,
+      "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+      "oldest": min((entry["created"] for entry in entries), default=None),
+      "least_recently_used": min((entry["last_access"] for entry in entries), default=None),
+      "kinds": kinds,
+    }
+
+  def _remove(self, keys):
+    with self._lock:
+      for key in keys:
+        _remove_path(self.cache_dir / key)
+      conn = self._connection()
+      conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+      conn.commit()
+
+  def gc(self, max_bytes=None, max_age=None, keep=()):
+    """
+    Evict entries not used within max_age seconds, then least recently used
+    entries until the cache fits in max_bytes. Keys in keep are never
+    evicted. Returns (entries, bytes) freed.
+    """
+    entries = self.entries()
+    now = time.time()
+    total = sum(entry["size"] for entry in entries)
+    evicted = []
+    for entry in entries:
+      if entry["key"] in keep:
+        continue
+      too_old = max_age is not None and now - entry["last_access"] > max_age
+      too_big = max_bytes is not None and total > max_bytes
+      if not (too_old or too_big):
+        continue
+      evicted.append(entry)
+      total -= entry["size"]
+    self._remove([entry["key"] for entry in evicted])
+    return len(evicted), sum(entry["size"] for entry in evicted)
+
+  def verify(self):
+    """
+    Check every entry against its metadata and drop the broken ones.
+    Returns the keys of the entries that were missing or corrupt.
+    """
+    broken = []
+    for entry in self.entries():
+      path = self.cache_dir / entry["key"]
+      if not path.exists():
+        broken.append(entry["key"])
+        continue
+      if entry["checksum"] is None:
+        continue
+      if path.stat().st_size != entry["size"] or file_checksum(path) != entry["checksum"]:
+        broken.append(entry["key"])
+    self._remove(broken)
+    return broken
+
+  def remove(self, path):
+    """Delete an entry that was superseded, and its row."""
+    self._remove([self._key(path)])
+
+  def clear(self):
+    """Delete everything under the cache directory, including the index."""
+    with self._lock:
+      if self._conn is not None:
+        self._conn.close()
+        self._conn = None
+      self._pending.clear()
+      self._misses = 0
+      if self.cache_dir.exists():
+        for child in self.cache_dir.iterdir():
+          _remove_path(child)
+
+  def _enforce_cap(self, keep=()):
+    cap = os.getenv("STRUCT_CACHE_MAX_MB")
+    if not cap:
+      return
+    max_bytes = int(float(cap) * 1024 * 1024)
+    with self._lock:
+      total = self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total > max_bytes:
+      # Leave some headroom so every new entry does not trigger another pass
+      count, freed = self.gc(max_bytes=int(max_bytes * 0.9), keep=keep)
+      logger.debug(f"Cache over {cap} MB: evicted {count} entries ({freed} bytes)")
+
+
+def get_cache_index(cache_dir):
+  """Return the process-wide CacheIndex for cache_dir."""
+  key = os.path.realpath(cache_dir)
+  with _indexes_lock:
+    index = _indexes.get(key)
+    if index is None:
+      index = CacheIndex(cache_dir)
+      _indexes[key] = index
+    return index
+
+
+def index_for(path):
+  """
+  Return the CacheIndex of the innermost cache directory holding path:
+  ~/.struct/cache or the directory of a fetcher created in this process.
+  Returns None for a path outside all of them, such as a cache moved
+  elsewhere with its own STRUCT_*_DIR variable.
+  """
+  real = os.path.realpath(path)
+  roots = {os.path.realpath(os.path.expanduser("~/.struct/cache"))}
+  with _indexes_lock:
+    roots.update(_indexes)
+  containing = [root for root in roots if os.path.commonpath([real, root]) == root]
+  if not containing:
+    return None
+  return get_cache_index(max(containing, key=len))
+
+
+def record_cached(path, kind, data=None):
+  """
+  Register an entry written by one of the caches that live next to the
+  fetched content (templates, structures, mappings), so stats, gc and
+  STRUCT_CACHE_MAX_MB cover them too.
+  """
+  try:
+    index = index_for(path)
+    if index is not None:
+      index.record(path, kind, data)
+  except (OSError, sqlite3.Error) as e:
+    logger.debug(f"Could not record cache entry {path}: {e}")
+
+
+def touch_cached(path):
+  """Note a hit on an entry registered with record_cached."""
+  try:
+    index = index_for(path)
+    if index is not None:
+      index.touch(path)
+  except OSError as e:
+    logger.debug(f"Could not record cache hit {path}: {e}")
+
+
+@atexit.register
+def _flush_all():
+  with _indexes_lock:
+    indexes = list(_indexes.values())
+  for index in indexes:
+    index.flush()
+    if index._used:
+      # Nothing is in use any more: apply the cap to this run's entries too
+      index._enforce_cap()
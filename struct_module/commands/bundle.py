@@ -0,0 +1,64 @@
+from struct_module.commands import Command
+import argparse
+from struct_module.bundle import BUNDLE_FORMATS, write_bundle
+from struct_module.commands.fetch import LOOKUPS, build_plans, fetch_plan_sources
+from struct_module.commands.generate import GenerateCommand
+from struct_module.completers import structures_completer
+
+
+# Bundle command class
+class BundleCommand(Command):
+  def __init__(self, parser):
+    super().__init__(parser)
+    parser.description = "Pack a structure, its nested structures, remote file: sources, mappings and lookups into one archive for `struct generate <bundle>`"
+    structure_arg = parser.add_argument('structure_definition', type=str, help='Structure to bundle')
+    structure_arg.completer = structures_completer
+    parser.add_argument('output', type=str, help='Bundle file to write (.zip or .tar)')
+    parser.add_argument('-s', '--structures-path', type=str, help='Path to structure definitions')
+    parser.add_argument('-v', '--vars', type=str, help='Template variables in the format KEY1=value1,KEY2=value2')
+    parser.add_argument('--mappings-file', type=str, action='append',
+                        help='Path or remote location of a YAML file containing mappings (can be specified multiple times)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8,
+                        help='Maximum number of sources downloaded concurrently (default: 8)')
+    parser.set_defaults(func=self.execute)
+
+  def execute(self, args):
+    if not any(args.output.lower().endswith(suffix) for suffix in BUNDLE_FORMATS):
+      self.logger.error(f"❗ Bundle file must end with one of: {', '.join(BUNDLE_FORMATS)}")
+      return None
+
+    generate_parser = argparse.ArgumentParser()
+    generate = GenerateCommand(generate_parser)
+    mappings = generate._load_mappings(args.mappings_file)
+    if mappings is None:
+      return None
+
+    context, plans = build_plans(generate, generate_parser, [args.structure_definition],
+                                 args.structures_path, args.vars, mappings)
+    structures = {}
+    for plan in plans:
+      for node in plan.nodes:
+        if node.kind != "structure":
+          continue
+        name = node.data["args"].structure_definition
+        path = generate._structure_path(name, node.data["args"].structures_path)
+        if name not in structures and path:
+          with open(path, 'rb') as f:
+            structures[name] = f.read()
+    if args.structure_definition not in structures:
+      self.logger.error(f"❗ Structure not found: {args.structure_definition}")
+      return None
+
+    results = fetch_plan_sources(context, plans, args.fetch_concurrency)
+    failed = {location: result for location, result in results.items() if isinstance(result, Exception)}
+    if failed:
+      for location, error in failed.items():
+        self.logger.error(f"❗ Failed to fetch {location}: {error}")
+      self.logger.error("❗ Bundle not written: every source must be available")
+      return None
+
+    lookups = {key: value for key, value in results.items() if key.split(":", 1)[0] in LOOKUPS}
+    sources = {key: value for key, value in results.items() if key not in lookups}
+    index = write_bundle(args.output, args.structure_definition, structures, sources, mappings, lookups)
+    print(f"📦 Bundled {len(structures)} structures, {len(sources)} sources and {len(lookups)} lookups into {args.output}")
+    return index
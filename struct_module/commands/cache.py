@@ -0,0 +1,87 @@
+from struct_module.commands import Command
+import os
+import time
+from struct_module.cache_index import get_cache_index, parse_age, parse_size
+
+
+def _format_bytes(size):
+  for unit in ("B", "KB", "MB", "GB"):
+    if size < 1024 or unit == "GB":
+      return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+    size /= 1024
+
+
+def _format_age(timestamp):
+  if timestamp is None:
+    return "-"
+  seconds = max(0, time.time() - timestamp)
+  for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+    if seconds >= length:
+      return f"{seconds / length:.1f}{unit}"
+  return f"{seconds:.0f}s"
+
+
+# Cache command class
+class CacheCommand(Command):
+  def __init__(self, parser):
+    super().__init__(parser)
+    parser.description = "Inspect and manage the cache of fetched remote content"
+    parser.add_argument('--cache-dir', type=str, default=os.path.expanduser("~/.struct/cache"),
+                        help='Cache directory (default: ~/.struct/cache)')
+    sub = parser.add_subparsers(dest="action")
+
+    stats = sub.add_parser("stats", help="Show entries, size, hit rate and age of the cache")
+    stats.set_defaults(func=self._stats)
+
+    gc = sub.add_parser("gc", help="Evict least recently used entries down to a size or age budget")
+    gc.add_argument('--max-size', type=str, help='Size budget, e.g. 500M or 2G')
+    gc.add_argument('--max-age', type=str, help='Evict entries not used for this long, e.g. 7d or 12h')
+    gc.set_defaults(func=self._gc)
+
+    verify = sub.add_parser("verify", help="Check entries against their recorded size and checksum, dropping broken ones")
+    verify.set_defaults(func=self._verify)
+
+    clear = sub.add_parser("clear", help="Delete everything in the cache directory")
+    clear.set_defaults(func=self._clear)
+
+    parser.set_defaults(func=self.execute)
+
+  def execute(self, args):
+    self.parser.print_help()
+
+  def _stats(self, args):
+    stats = get_cache_index(args.cache_dir).stats()
+    print(f"📦 Cache: {args.cache_dir}")
+    print(f"  Entries: {stats['entries']}")
+    print(f"  Size: {_format_bytes(stats['bytes'])}")
+    print(f"  Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {stats['hit_rate']:.0%}")
+    print(f"  Oldest entry: {_format_age(stats['oldest'])}")
+    print(f"  Least recently used: {_format_age(stats['least_recently_used'])}")
+    for kind, totals in sorted(stats["kinds"].items()):
+      print(f"  - {kind}: {totals['entries']} entries, {_format_bytes(totals['bytes'])}")
+    return stats
+
+  def _gc(self, args):
+    if not args.max_size and not args.max_age:
+      self.logger.error("❗ Specify --max-size and/or --max-age")
+      return None
+    try:
+      max_bytes = parse_size(args.max_size) if args.max_size else None
+      max_age = parse_age(args.max_age) if args.max_age else None
+    except ValueError as e:
+      self.logger.error(f"❗ {e}")
+      return None
+    count, freed = get_cache_index(args.cache_dir).gc(max_bytes=max_bytes, max_age=max_age)
+    print(f"🧹 Evicted {count} entries ({_format_bytes(freed)})")
+    return count, freed
+
+  def _verify(self, args):
+    broken = get_cache_index(args.cache_dir).verify()
+    for key in broken:
+      print(f"❗ Removed broken entry: {key}")
+    print(f"✅ Verified cache: {len(broken)} broken entries removed")
+    return broken
+
+  def _clear(self, args):
+    get_cache_index(args.cache_dir).clear()
+    print(f"🗑️  Cleared cache: {args.cache_dir}")
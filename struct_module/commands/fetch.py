@@ -0,0 +1,119 @@
+from struct_module.commands import Command
+import os
+import re
+import argparse
+from struct_module import filters
+from struct_module.commands.generate import GenerateCommand
+from struct_module.content_fetcher import is_binary_source, start_run
+from struct_module.completers import structures_completer
+from struct_module.generation_context import GenerationContext
+
+# Filter lookups with a literal repository, e.g. {{@ "owner/repo" | latest_release @}}
+LOOKUP_PATTERN = re.compile(r"""["']([\w.-]+/[\w.-]+)["']\s*\|\s*(latest_release|default_branch)\b""")
+LOOKUPS = {
+  "latest_release": filters.get_latest_release,
+  "default_branch": filters.get_default_branch,
+}
+
+
+def build_plans(generate, generate_parser, structures, structures_path, vars, mappings):
+  """Resolve the generation plan of each structure, sharing one context."""
+  context = None
+  plans = []
+  for structure in structures:
+    gen_args = generate_parser.parse_args([structure, '.'])
+    gen_args.structures_path = structures_path
+    gen_args.vars = vars
+    gen_args.non_interactive = True
+    if context is None:
+      context = GenerationContext(gen_args.input_store, True, mappings)
+    plans.append(generate._build_plan(gen_args, mappings, context=context))
+  return context, plans
+
+
+def fetch_plan_sources(context, plans, concurrency=8):
+  """
+  Download every file: source of the plans and resolve filter lookups on
+  literal repository names found in their templates.
+
+  Returns a dict of location (or "<filter>:<repo>" for lookups) to the
+  fetched value, or to the exception raised while fetching it. Binary
+  sources map to a callable opening them from the cache.
+  """
+  contents = []
+  locations = []
+  binary = set()
+  for plan in plans:
+    for node in plan.files():
+      content = node.data["content"]
+      if isinstance(content, dict):
+        if content.get("file"):
+          locations.append(content["file"])
+          if is_binary_source(content):
+            binary.add(content["file"])
+        content = content.get("content")
+      if isinstance(content, str):
+        contents.append(content)
+
+  results = {}
+  if locations:
+    results = context.content_fetcher.prefetch(locations, max_workers=concurrency or 1, binary=binary)
+  contents.extend(result for result in results.values() if isinstance(result, str))
+
+  lookups = sorted({(kind, repo) for text in contents for repo, kind in LOOKUP_PATTERN.findall(text)})
+  for kind, repo in lookups:
+    value = LOOKUPS[kind](repo)
+    results[f"{kind}:{repo}"] = RuntimeError(value) if value.endswith("_ERROR") else value
+  return results
+
+
+# Fetch command class
+class FetchCommand(Command):
+  def __init__(self, parser):
+    super().__init__(parser)
+    parser.description = "Download every remote source of one or more structures into the cache, for use with generate --offline"
+    structure_arg = parser.add_argument('structure_definitions', nargs='*', type=str,
+                                        help='Structures to fetch (default: every available structure)')
+    structure_arg.completer = structures_completer
+    parser.add_argument('-s', '--structures-path', type=str, help='Path to structure definitions')
+    parser.add_argument('-v', '--vars', type=str, help='Template variables in the format KEY1=value1,KEY2=value2')
+    parser.add_argument('--mappings-file', type=str, action='append',
+                        help='Path or remote location of a YAML file containing mappings (can be specified multiple times)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8,
+                        help='Maximum number of sources downloaded concurrently (default: 8)')
+    parser.set_defaults(func=self.execute)
+
+  def _available_structures(self, structures_path):
+    this_file = os.path.dirname(os.path.realpath(__file__))
+    paths = [os.path.join(this_file, "..", "contribs")]
+    if structures_path:
+      paths.insert(0, structures_path)
+
+    names = set()
+    for path in paths:
+      for root, _, files in os.walk(path):
+        for file in files:
+          if file.endswith(".yaml"):
+            names.add(os.path.relpath(os.path.join(root, file), path)[:-5])
+    return sorted(names)
+
+  def execute(self, args):
+    start_run()
+    generate_parser = argparse.ArgumentParser()
+    generate = GenerateCommand(generate_parser)
+
+    # Remote mappings files are cached as they are loaded
+    mappings = generate._load_mappings(args.mappings_file)
+    if mappings is None:
+      return None
+
+    structures = args.structure_definitions or self._available_structures(args.structures_path)
+    self.logger.info(f"Fetching remote sources of {len(structures)} structures")
+    context, plans = build_plans(generate, generate_parser, structures, args.structures_path, args.vars, mappings)
+    results = fetch_plan_sources(context, plans, args.fetch_concurrency) if context else {}
+
+    failed = {location: result for location, result in results.items() if isinstance(result, Exception)}
+    for location, error in failed.items():
+      self.logger.error(f"❗ Failed to fetch {location}: {error}")
+    print(f"📥 Cached {len(results) - len(failed)} sources ({len(failed)} failed)")
+    return results
@@ -1,13 +1,41 @@
 from struct_module.commands import Command
 import os
+import json
 import yaml
 import argparse
+import difflib
+import functools
+import threading
+from collections import ChainMap
+from collections.abc import Mapping
 from struct_module.file_item import FileItem
+from struct_module.structure_loader import load_structure_file
+from struct_module.manifest import GenerationManifest, hash_obj, hash_stream, hash_text
+from struct_module.mappings_store import close_mappings, load_remote_mappings, mappings_fingerprint, merge_layers, open_mappings
+from struct_module.content_fetcher import CacheMissError, ContentFetcher, is_binary_source, is_offline, offline_mode, start_run
+from struct_module.plan import GenerationPlan, PlanNode, run_plan
 from struct_module.completers import file_strategy_completer, structures_completer
-from struct_module.template_renderer import TemplateRenderer
+from struct_module.generation_context import GenerationContext
+from struct_module.template_renderer import bytecode_store
+from struct_module.bundle import StructureBundle, is_bundle
+from struct_module import filters
 
 import subprocess
 
+
+def _source_hash(source):
+  """Hash of a prefetched file: source; None when it could not be fetched."""
+  if isinstance(source, str):
+    return hash_text(source)
+  if callable(source):
+    # Binary sources are hashed as they stream, never held in memory
+    try:
+      with source() as stream:
+        return hash_stream(stream)
+    except Exception:
+      return None
+  return None
+
 # Generate command class
 class GenerateCommand(Command):
   def __init__(self, parser):
@@ -21,15 +49,30 @@ class GenerateCommand(Command):
     parser.add_argument('-d', '--dry-run', action='store_true', help='Perform a dry run without creating any files or directories')
     parser.add_argument('--diff', action='store_true', help='Show unified diffs for files that would change during dry-run or console output')
     parser.add_argument('-v', '--vars', type=str, help='Template variables in the format KEY1=value1,KEY2=value2')
+    parser.add_argument('--vars-file', type=str, help='Path to a YAML or JSON file with template variables (overridden by --vars)')
     parser.add_argument('-b', '--backup', type=str, help='Path to the backup folder')
     parser.add_argument('-f', '--file-strategy', type=str, choices=['overwrite', 'skip', 'append', 'rename', 'backup'], default='overwrite', help='Strategy for handling existing files').completer = file_strategy_completer
     parser.add_argument('-p', '--global-system-prompt', type=str, help='Global system prompt for OpenAI')
     parser.add_argument('--non-interactive', action='store_true', help='Run the command in non-interactive mode')
     parser.add_argument('--mappings-file', type=str, action='append',
-                        help='Path to a YAML file containing mappings to be used in templates (can be specified multiple times)')
+                        help='Path or remote location (https://, github://, s3://, gs://) of a YAML file containing mappings to be used in templates (can be specified multiple times)')
+    parser.add_argument('--mappings-backend', type=str, choices=['yaml', 'sqlite'], default='yaml',
+                        help='How mappings files are loaded: parsed fully (yaml) or through an on-disk index with lazy lookups (sqlite)')
     parser.add_argument('-o', '--output', type=str,
                         choices=['console', 'file'], default='file', help='Output mode')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of parallel workers used to run the generation plan (default: 1)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8,
+                        help='Maximum number of remote file: sources downloaded concurrently before rendering (default: 8)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip files whose inputs did not change since the last run, tracked in <base_path>/.struct/manifest.json')
+    parser.add_argument('--offline', action='store_true',
+                        help='Serve every remote source from the cache (see `struct fetch`) and fail on any miss')
     parser.set_defaults(func=self.execute)
+    self._summary_lock = threading.Lock()
+    self._output_lock = threading.Lock()
+    # Structure bundle being generated from, if any
+    self._bundle = None
 
   def _parse_template_vars(self, vars_str):
     """Parse a comma-separated KEY=VALUE string into a dict safely.
@@ -58,13 +101,35 @@ class GenerateCommand(Command):
       result[key] = value
     return result
 
+  def _resolve_template_vars(self, args):
+    """
+    Build the top-level template variables once per run: values from
+    --vars-file, overridden by --vars. Programmatic callers may pass vars
+    as a dict instead of a KEY=value string.
+    """
+    template_vars = {}
+    vars_file = getattr(args, 'vars_file', None)
+    if vars_file:
+      with open(vars_file, 'r') as f:
+        data = json.load(f) if vars_file.endswith('.json') else yaml.safe_load(f)
+      if data is not None and not isinstance(data, dict):
+        raise ValueError("The vars file must contain a mapping of variable names to values.")
+      template_vars.update(data or {})
+
+    cli_vars = getattr(args, 'vars', None)
+    if isinstance(cli_vars, dict):
+      template_vars.update(cli_vars)
+    elif cli_vars:
+      template_vars.update(self._parse_template_vars(cli_vars))
+    return template_vars
+
   def _deep_merge_dicts(self, dict1, dict2):
     """
     Deep merge two dictionaries, with dict2 values overriding dict1 values.
     """
-    result = dict1.copy()
+    result = dict(dict1)
     for key, value in dict2.items():
-      if key in result and isinstance(result[key], dict) and isinstance(value, dict):
+      if key in result and isinstance(result[key], Mapping) and isinstance(value, Mapping):
         result[key] = self._deep_merge_dicts(result[key], value)
       else:
         result[key] = value
@@ -92,49 +157,105 @@ class GenerateCommand(Command):
     return True
 
   def _load_yaml_config(self, structure_definition, structures_path):
+    if self._bundle is not None:
+      config = self._bundle.load_structure(structure_definition)
+      if config is None:
+        self.logger.error(f"❗ Structure not found in bundle {self._bundle.path}: {structure_definition}")
+      return config
+
+    file_path = self._structure_path(structure_definition, structures_path)
+    if file_path is None:
+      return None
+    return load_structure_file(file_path)
+
+  def _structure_path(self, structure_definition, structures_path):
+    """Resolve a structure definition to its YAML file, or None if missing."""
     if structure_definition.endswith(".yaml") and not structure_definition.startswith("file://"):
       structure_definition = f"file://{structure_definition}"
 
     if structure_definition.startswith("file://") and structure_definition.endswith(".yaml"):
-      with open(structure_definition[7:], 'r') as f:
-        return yaml.safe_load(f)
-    else:
-      this_file = os.path.dirname(os.path.realpath(__file__))
-      contribs_path = os.path.join(this_file, "..", "contribs")
+      return structure_definition[7:]
+    this_file = os.path.dirname(os.path.realpath(__file__))
+    contribs_path = os.path.join(this_file, "..", "contribs")
+    file_path = os.path.join(contribs_path, f"{structure_definition}.yaml")
+    if structures_path:
+      file_path = os.path.join(structures_path, f"{structure_definition}.yaml")
+    if not os.path.exists(file_path):
       file_path = os.path.join(contribs_path, f"{structure_definition}.yaml")
-      if structures_path:
-        file_path = os.path.join(structures_path, f"{structure_definition}.yaml")
-      if not os.path.exists(file_path):
-        file_path = os.path.join(contribs_path, f"{structure_definition}.yaml")
-      if not os.path.exists(file_path):
-        self.logger.error(f"❗ File not found: {file_path}")
-        return None
-      with open(file_path, 'r') as f:
-        return yaml.safe_load(f)
+    if not os.path.exists(file_path):
+      self.logger.error(f"❗ File not found: {file_path}")
+      return None
+    return file_path
 
   def execute(self, args):
     self.logger.info(f"Generating structure")
     self.logger.info(f"  Structure definition: {args.structure_definition}")
     self.logger.info(f"  Base path: {args.base_path}")
 
-    # Load mappings if provided
-    mappings = {}
-    if getattr(args, 'mappings_file', None):
-      for mappings_file_path in args.mappings_file:
-        if os.path.exists(mappings_file_path):
-          self.logger.info(f"Loading mappings from: {mappings_file_path}")
-          with open(mappings_file_path, 'r') as mf:
-            try:
-              file_mappings = yaml.safe_load(mf) or {}
-              # Deep merge the mappings, with later files overriding earlier ones
-              mappings = self._deep_merge_dicts(mappings, file_mappings)
-            except Exception as e:
-              self.logger.error(f"Failed to load mappings file {mappings_file_path}: {e}")
-              return
-        else:
-          self.logger.error(f"Mappings file not found: {mappings_file_path}")
+    start_run()
+    with offline_mode(getattr(args, 'offline', False)):
+      try:
+        # Load mappings if provided
+        mappings = self._load_mappings(getattr(args, 'mappings_file', None), getattr(args, 'mappings_backend', 'yaml'))
+        if mappings is None:
           return
 
+        return self._generate(args, mappings)
+      finally:
+        close_mappings()
+
+  def _load_mappings(self, mappings_files, backend='yaml'):
+    """
+    Load mappings files and overlay them, later files overriding earlier
+    ones. Besides local paths, any location supported by ContentFetcher
+    (https://, github://, s3://, gs://) can be used. Nested mappings are
+    merged lazily when a template reads them.
+    With the sqlite backend each file is read through an on-disk index and
+    its values are only looked up when a template uses them.
+    Returns None when any of the files cannot be loaded.
+    """
+    layers = []
+    content_fetcher = None
+    for mappings_file_path in mappings_files or []:
+      if mappings_file_path.startswith("file://"):
+        mappings_file_path = mappings_file_path[7:]
+      if "://" in mappings_file_path:
+        self.logger.info(f"Loading mappings from: {mappings_file_path}")
+        try:
+          content_fetcher = content_fetcher or ContentFetcher()
+          layers.append(load_remote_mappings(mappings_file_path, content_fetcher, backend))
+        except Exception as e:
+          self.logger.error(f"Failed to load mappings file {mappings_file_path}: {e}")
+          return None
+        continue
+      if os.path.exists(mappings_file_path):
+        self.logger.info(f"Loading mappings from: {mappings_file_path}")
+        if backend == 'sqlite':
+          try:
+            layers.append(open_mappings(mappings_file_path))
+          except Exception as e:
+            self.logger.error(f"Failed to load mappings file {mappings_file_path}: {e}")
+            return None
+          continue
+        with open(mappings_file_path, 'r') as mf:
+          try:
+            file_mappings = yaml.safe_load(mf) or {}
+            if not isinstance(file_mappings, Mapping):
+              raise ValueError("a mappings file must contain a mapping at the top level")
+            layers.append(file_mappings)
+          except Exception as e:
+            self.logger.error(f"Failed to load mappings file {mappings_file_path}: {e}")
+            return None
+      else:
+        self.logger.error(f"Mappings file not found: {mappings_file_path}")
+        return None
+    return merge_layers(layers)
+
+  def _generate(self, args, mappings):
+    """Run hooks and generate the structure described by args."""
+    if is_bundle(args.structure_definition):
+      return self._generate_bundle(args, mappings)
+
     if args.backup and not os.path.exists(args.backup):
       os.makedirs(args.backup)
 
@@ -157,28 +278,44 @@ class GenerateCommand(Command):
       return
 
     # Actually generate structure
-    self._create_structure(args, mappings)
+    summary = self._create_structure(args, mappings)
 
     # Run post-hooks
     if not self._run_hooks(post_hooks, hook_type="post"):
       self.logger.error("Post-hook failed.")
       return
 
+    return summary
+
+  def _generate_bundle(self, args, mappings):
+    """
+    Generate from a bundle written by `struct bundle`: structures, file:
+    sources, mappings and lookups all come from the archive, so the run
+    needs neither the network nor a structures directory.
+    """
+    self.logger.info(f"Reading bundle: {args.structure_definition}")
+    try:
+      bundle = StructureBundle(args.structure_definition)
+    except Exception as e:
+      self.logger.error(f"❗ Failed to open bundle {args.structure_definition}: {e}")
+      return None
+
+    args = argparse.Namespace(**vars(args))
+    args.structure_definition = bundle.root
+    # Mappings given on the command line override the bundled ones
+    mappings = merge_layers([bundle.mappings(), mappings or {}])
+    self._bundle = bundle
+    filters.use_bundled_lookups(bundle.lookups)
+    try:
+      return self._generate(args, mappings)
+    finally:
+      filters.use_bundled_lookups(None)
+      self._bundle = None
+      bundle.close()
+
   def _create_structure(self, args, mappings=None, summary=None, print_summary=True):
     if isinstance(args, dict):
         args = argparse.Namespace(**args)
-    this_file = os.path.dirname(os.path.realpath(__file__))
-    contribs_path = os.path.join(this_file, "..", "contribs")
-
-    config = self._load_yaml_config(args.structure_definition, args.structures_path)
-    if config is None:
-      return summary if summary is not None else None
-
-    # Safely parse template variables
-    template_vars = self._parse_template_vars(args.vars) if getattr(args, 'vars', None) else {}
-    config_structure = config.get('files', config.get('structure', []))
-    config_folders = config.get('folders', [])
-    config_variables = config.get('variables', [])
 
     # Action counters for final summary (initialize once and reuse across recursive calls)
     if summary is None:
@@ -192,113 +329,123 @@ class GenerateCommand(Command):
           "folders": 0,
           "dry_run_created": 0,
           "dry_run_updated": 0,
+          "unchanged": 0,
+          "rebuilt": 0,
       }
 
+    try:
+      template_vars = self._resolve_template_vars(args)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+      self.logger.error(f"❗ Failed to load vars file {getattr(args, 'vars_file', None)}: {e}")
+      return summary
+
+    # One fetcher, model and renderer shared by every file of the run
+    context = GenerationContext(args.input_store, args.non_interactive, mappings)
+
+    # Phase 1: resolve the whole structure tree into an explicit plan
+    plan = self._build_plan(args, mappings, context=context, template_vars=template_vars)
+    if not plan.nodes:
+      return summary
+
+    # Download every file: source of the tree up front so rendering never
+    # waits on a network round-trip. Incremental runs fetch them too: the
+    # cache revalidates unchanged bodies cheaply and their hashes decide
+    # which files can be skipped.
+    prefetched = self._prefetch_plan(plan, args, context)
+    if is_offline() or self._bundle is not None:
+      misses = [result for result in prefetched.values() if isinstance(result, Exception)]
+      if misses:
+        for error in misses:
+          self.logger.error(f"❗ {error}")
+        if self._bundle is not None:
+          self.logger.error("❗ The bundle is incomplete: rebuild it with `struct bundle`")
+        else:
+          self.logger.error("❗ Offline mode: run `struct fetch` with network access to cache the missing sources")
+        return summary
+
+    # Decide which files can be skipped based on the previous manifest
+    incremental = self._plan_incremental(plan, args, mappings, context, prefetched)
+
+    # Phase 2: run the plan, siblings in parallel when --jobs > 1
+    jobs = getattr(args, 'jobs', 1) or 1
+    try:
+      run_plan(plan, lambda node: self._run_plan_node(node, context, summary, prefetched, incremental), jobs=jobs)
+    except CacheMissError as e:
+      # Usually a lookup filter (latest_release, default_branch, ...) that
+      # was never resolved online
+      self.logger.error(f"❗ {e}")
+      self.logger.error("❗ Offline mode: run `struct fetch` with network access to cache it")
+      return summary
+
+    if incremental:
+      incremental["manifest"].save()
+
+    # Final summary (only once for top-level call)
+    if print_summary:
+      bytecode_store.log_stats()
+      self._print_summary(summary, args.dry_run)
+
+    return summary
+
+  def _build_plan(self, args, mappings=None, plan=None, parent=None, context=None, template_vars=None):
+    """
+    Resolve a structure definition and all nested structures into a
+    GenerationPlan. Nothing is fetched, rendered or written here.
+
+    template_vars is a mapping; nested structures receive a ChainMap whose
+    first layer holds the rendered with: values of their folder, so a child
+    overrides its parent without copying or reparsing anything.
+    """
+    if plan is None:
+      plan = GenerationPlan()
+    if context is None:
+      context = GenerationContext(args.input_store, args.non_interactive, mappings)
+    if template_vars is None:
+      template_vars = self._resolve_template_vars(args)
+
+    config = self._load_yaml_config(args.structure_definition, args.structures_path)
+    if config is None:
+      return plan
+
+    config_structure = config.get('files', config.get('structure', []))
+    config_folders = config.get('folders', [])
+    config_variables = config.get('variables', [])
+    github_archive = bool(config.get('github_archive'))
+
+    structure_node = plan.add(PlanNode(
+        "structure",
+        args.base_path,
+        deps=[parent],
+        args=args,
+        template_vars=template_vars,
+        config_variables=config_variables,
+    ))
+
     for item in config_structure:
-      self.logger.debug(f"Processing item: {item}")
       for name, content in item.items():
-        self.logger.debug(f"Processing name: {name}, content: {content}")
-        if isinstance(content, dict):
-          content["name"] = name
-          content["global_system_prompt"] = args.global_system_prompt
-          content["config_variables"] = config_variables
-          content["input_store"] = args.input_store
-          content["non_interactive"] = args.non_interactive
-          content["mappings"] = mappings or {}
-          file_item = FileItem(content)
-          file_item.fetch_content()
-        elif isinstance(content, str):
-          file_item = FileItem(
-            {
-              "name": name,
-              "content": content,
-              "config_variables": config_variables,
-              "input_store": args.input_store,
-              "non_interactive": args.non_interactive,
-              "mappings": mappings or {},
-            }
-          )
-
-        # Determine the full file path
-        file_path_to_create = os.path.join(args.base_path, name)
-        existing_content = None
-        if os.path.exists(file_path_to_create):
-          self.logger.info(f"ℹ️  Exists: {file_path_to_create}")
-          with open(file_path_to_create, 'r') as existing_file:
-            existing_content = existing_file.read()
-
-        file_item.process_prompt(
-          args.dry_run,
-          existing_content=existing_content
-        )
-        file_item.apply_template_variables(template_vars)
-
-        # Output mode logic with diff support
-        if hasattr(args, 'output') and args.output == 'console':
-          print(f"=== {file_path_to_create} ===")
-          if args.diff and existing_content is not None:
-            import difflib
-            new_content = file_item.content if file_item.content.endswith("\n") else file_item.content + "\n"
-            old_content = existing_content if existing_content.endswith("\n") else existing_content + "\n"
-            diff = difflib.unified_diff(
-                old_content.splitlines(keepends=True),
-                new_content.splitlines(keepends=True),
-                fromfile=f"a/{file_path_to_create}",
-                tofile=f"b/{file_path_to_create}",
-            )
-            print("".join(diff))
-          else:
-            print(file_item.content)
-        else:
-          # When dry-run with --diff and files mode, print action and diff instead of writing
-          if args.dry_run and args.diff:
-            action = "create"
-            if existing_content is not None:
-              action = "update"
-            print(f"[DRY RUN] {action}: {file_path_to_create}")
-            if action == "create":
-              summary["dry_run_created"] += 1
-            else:
-              summary["dry_run_updated"] += 1
-            import difflib
-            new_content = file_item.content if file_item.content.endswith("\n") else file_item.content + "\n"
-            old_content = (existing_content if existing_content is not None else "")
-            old_content = old_content if old_content.endswith("\n") else (old_content + ("\n" if old_content else ""))
-            diff = difflib.unified_diff(
-                old_content.splitlines(keepends=True),
-                new_content.splitlines(keepends=True),
-                fromfile=f"a/{file_path_to_create}",
-                tofile=f"b/{file_path_to_create}",
-            )
-            print("".join(diff))
-          else:
-            result = file_item.create(
-                args.base_path,
-                args.dry_run or False,
-                args.backup or None,
-                args.file_strategy or 'overwrite'
-            )
-            if isinstance(result, dict):
-              if result.get("action") == "created":
-                summary["created"] += 1
-              elif result.get("action") == "updated":
-                summary["updated"] += 1
-              elif result.get("action") == "appended":
-                summary["appended"] += 1
-              elif result.get("action") == "skipped":
-                summary["skipped"] += 1
-              if result.get("backed_up_to"):
-                summary["backed_up"] += 1
-              if result.get("renamed_from"):
-                summary["renamed"] += 1
+        if not isinstance(content, (dict, str)):
+          self.logger.warning(f"Unsupported content for file: {name}")
+          continue
+        if github_archive:
+          content = self._use_github_archive(content)
+        plan.add(PlanNode(
+            "file",
+            os.path.join(args.base_path, name),
+            deps=[structure_node],
+            name=name,
+            content=content,
+            structure=structure_node,
+        ))
 
     for item in config_folders:
       for folder, content in item.items():
         folder_path = os.path.join(args.base_path, folder)
-        if hasattr(args, 'output') and args.output == 'file':
-          os.makedirs(folder_path, exist_ok=True)
-          self.logger.info(f"📁 Created folder: {folder_path}")
-          summary["folders"] += 1
+        folder_node = plan.add(PlanNode(
+            "folder",
+            folder_path,
+            deps=[structure_node],
+            structure=structure_node,
+        ))
 
         # check if content has struct value
         if 'struct' in content:
@@ -312,86 +459,325 @@ class GenerateCommand(Command):
           if isinstance(content['struct'], str):
             self.logger.info(f"    - {content['struct']}")
 
-          # get vars from with param. this will be a dict of key value pairs
-          merged_vars = ""
-
-          # dict to comma separated string
-          if 'with' in content:
-            if isinstance(content['with'], dict):
-              # Render Jinja2 expressions in each value using TemplateRenderer
-              rendered_with = {}
-              renderer = TemplateRenderer(
-                  config_variables, args.input_store, args.non_interactive, mappings)
-              for k, v in content['with'].items():
-                # Render the value as a template, passing in mappings and template_vars
-                context = template_vars.copy() if template_vars else {}
-                context['mappings'] = mappings or {}
-                rendered_with[k] = renderer.render_template(str(v), context)
-              merged_vars = ",".join(
-                  [f"{k}={v}" for k, v in rendered_with.items()])
-
-          # Merge parent args.vars safely without introducing trailing commas
-          if getattr(args, 'vars', None):
-            parts = []
-            parent_vars = args.vars.strip().strip(',')
-            if parent_vars:
-              parts.append(parent_vars)
-            if merged_vars:
-              parts.append(merged_vars)
-            merged_vars = ",".join(parts)
-
-          # If nothing to merge, keep None to avoid accidental truthiness with empty string
-          merged_vars = merged_vars if merged_vars else None
-
-          if isinstance(content['struct'], str):
-            self._create_structure({
-              'structure_definition': content['struct'],
+          # Render Jinja2 expressions in each with: value; they become the
+          # child's own layer on top of the parent's variables
+          rendered_with = {}
+          if isinstance(content.get('with'), dict):
+            renderer = context.renderer_for(config_variables)
+            with_vars = ChainMap({'mappings': mappings or {}}, template_vars)
+            for k, v in content['with'].items():
+              rendered_with[k] = renderer.render_template(str(v), with_vars)
+          child_vars = ChainMap(rendered_with, template_vars) if rendered_with else template_vars
+
+          structs = content['struct'] if isinstance(content['struct'], list) else [content['struct']]
+          for struct in structs:
+            child_args = argparse.Namespace(**{
+              'structure_definition': struct,
               'base_path': folder_path,
               'structures_path': args.structures_path,
               'dry_run': args.dry_run,
               'diff': getattr(args, 'diff', False),
               'output': getattr(args, 'output', 'file'),
-              'vars': merged_vars,
               'backup': args.backup,
               'file_strategy': args.file_strategy,
               'global_system_prompt': args.global_system_prompt,
               'input_store': args.input_store,
               'non_interactive': args.non_interactive,
-            }, mappings=mappings, summary=summary, print_summary=False)
-          elif isinstance(content['struct'], list):
-            for struct in content['struct']:
-              self._create_structure({
-                'structure_definition': struct,
-                'base_path': folder_path,
-                'structures_path': args.structures_path,
-                'dry_run': args.dry_run,
-                'diff': getattr(args, 'diff', False),
-                'output': getattr(args, 'output', 'file'),
-                'vars': merged_vars,
-                'backup': args.backup,
-                'file_strategy': args.file_strategy,
-                'global_system_prompt': args.global_system_prompt,
-                'input_store': args.input_store,
-                'non_interactive': args.non_interactive,
-              }, mappings=mappings, summary=summary, print_summary=False)
+            })
+            self._build_plan(child_args, mappings, plan=plan, parent=folder_node, context=context,
+                             template_vars=child_vars)
         else:
           self.logger.warning(f"Unsupported content in folder: {folder}")
 
-    # Final summary (only once for top-level call)
-    if print_summary:
-      self.logger.info("")
-      self.logger.info("Summary of actions:")
-      self.logger.info(f"  ✅  Created: {summary['created']}")
-      self.logger.info(f"  ✅  Updated: {summary['updated']}")
-      self.logger.info(f"  📝  Appended: {summary['appended']}")
-      self.logger.info(f"  ⏭️  Skipped: {summary['skipped']}")
-      self.logger.info(f"  🗄️  Backed up: {summary['backed_up']}")
-      self.logger.info(f"  🔁  Renamed: {summary['renamed']}")
-      self.logger.info(f"  📁  Folders created: {summary['folders']}")
-      if args.dry_run:
-        self.logger.info(
-            f"  [DRY RUN] Would create: {summary['dry_run_created']}")
-        self.logger.info(
-            f"  [DRY RUN] Would update: {summary['dry_run_updated']}")
+    return plan
 
-    return summary
+  def _use_github_archive(self, content):
+    """Serve a GitHub file: source from the repository tarball instead."""
+    location = content.get("file") if isinstance(content, dict) else None
+    if isinstance(location, str):
+      for prefix in ("github://", "githubhttps://", "githubssh://"):
+        if location.startswith(prefix):
+          return {**content, "file": "githubarchive://" + location[len(prefix):]}
+    return content
+
+  def _plan_incremental(self, plan, args, mappings, context, prefetched):
+    """
+    Compute the input hashes of every file node and compare them against
+    the manifest of the previous run. Only active when writing files.
+    """
+    if not getattr(args, 'incremental', False) or args.dry_run or getattr(args, 'output', 'file') != 'file':
+      return None
+
+    manifest = GenerationManifest(args.base_path).load()
+    # Indexed layers are hashed by their source file, not their contents
+    mappings_hash = mappings_fingerprint(mappings)
+    answers = context.template_renderer.input_data or {}
+    files = {}
+    seen = {}
+    for node in plan.files():
+      key = os.path.relpath(node.path, args.base_path)
+      seen[key] = seen.get(key, 0) + 1
+      if seen[key] > 1:
+        key = f"{key}#{seen[key]}"
+      inputs, answer_vars = self._file_inputs(node, mappings_hash, context, prefetched)
+      inputs["answers"] = self._answers_hash(answer_vars, answers)
+      input_hash = hash_obj(inputs)
+      files[node.id] = {
+        "key": key,
+        "inputs": inputs,
+        "answer_vars": answer_vars,
+        "input_hash": input_hash,
+        "unchanged": manifest.is_unchanged(key, input_hash),
+      }
+    return {"manifest": manifest, "files": files}
+
+  def _file_inputs(self, node, mappings_hash, context, prefetched):
+    """
+    Return the input hashes of a file node and the names of the input-store
+    answers its name and body read.
+    """
+    structure = node.data["structure"]
+    args = structure.data["args"]
+    content = node.data["content"]
+    config_variables = structure.data["config_variables"] or []
+
+    template = {"name": node.data["name"], "content": content}
+    texts = [node.data["name"]]
+    if isinstance(content, dict):
+      if content.get("file"):
+        # The fetched body, so changes behind an unchanged location count
+        source = (prefetched or {}).get(content["file"])
+        template["source"] = _source_hash(source)
+        if isinstance(source, str):
+          texts.append(source)
+      elif isinstance(content.get("content"), str):
+        texts.append(content["content"])
+    elif isinstance(content, str):
+      texts.append(content)
+
+    # Variables missing from vars are answered from the input store
+    template_vars = structure.data["template_vars"]
+    renderer = context.renderer_for(structure.data["config_variables"])
+    answer_vars = set()
+    for text in texts:
+      try:
+        answer_vars.update(renderer.get_undeclared_variables(text))
+      except Exception:
+        # Invalid templates fail when rendered; they have no answers to track
+        pass
+    answer_vars = sorted(v for v in answer_vars if v not in template_vars)
+
+    # Defaults sourced from the environment affect rendering too
+    env_defaults = {}
+    for item in config_variables:
+      for _, conf in item.items():
+        env_key = (conf or {}).get('env') or (conf or {}).get('default_from_env')
+        if env_key:
+          env_defaults[env_key] = os.environ.get(env_key)
+
+    inputs = {
+      "template": hash_obj(template),
+      "vars": hash_obj({
+        "vars": dict(template_vars),
+        "variables": config_variables,
+        "env": env_defaults,
+        "system_prompt": args.global_system_prompt,
+        "file_strategy": args.file_strategy,
+      }),
+      "mappings": mappings_hash,
+    }
+    return inputs, answer_vars
+
+  def _answers_hash(self, answer_vars, answers):
+    return hash_obj({var: answers.get(var) for var in answer_vars})
+
+  def _prefetch_plan(self, plan, args, context):
+    sources = [
+      node.data["content"]
+      for node in plan.files()
+      if isinstance(node.data["content"], dict) and node.data["content"].get("file")
+    ]
+    if not sources:
+      return {}
+    locations = [content["file"] for content in sources]
+    binary = {content["file"] for content in sources if is_binary_source(content)}
+    if self._bundle is not None:
+      prefetched = {}
+      for location in locations:
+        try:
+          if location in binary or self._bundle.is_binary(location):
+            self._bundle.open_source(location).close()
+            prefetched[location] = functools.partial(self._bundle.open_source, location)
+          else:
+            prefetched[location] = self._bundle.source(location)
+        except FileNotFoundError as e:
+          prefetched[location] = e
+      return prefetched
+    concurrency = getattr(args, 'fetch_concurrency', 8) or 1
+    self.logger.debug(f"Prefetching {len(set(locations))} file sources ({len(binary)} binary)")
+    return context.content_fetcher.prefetch(locations, max_workers=concurrency, binary=binary)
+
+  def _count(self, summary, key):
+    with self._summary_lock:
+      summary[key] += 1
+
+  def _run_plan_node(self, node, context, summary, prefetched=None, incremental=None):
+    if node.kind == "file":
+      self._process_file_node(node, context, summary, prefetched, incremental)
+    elif node.kind == "folder":
+      args = node.data["structure"].data["args"]
+      if hasattr(args, 'output') and args.output == 'file':
+        os.makedirs(node.path, exist_ok=True)
+        self.logger.info(f"📁 Created folder: {node.path}")
+        self._count(summary, "folders")
+
+  def _process_file_node(self, node, context, summary, prefetched=None, incremental=None):
+    structure = node.data["structure"]
+    args = structure.data["args"]
+    template_vars = structure.data["template_vars"]
+    config_variables = structure.data["config_variables"]
+    name = node.data["name"]
+    content = node.data["content"]
+
+    decision = incremental["files"].get(node.id) if incremental else None
+    if decision and decision["unchanged"]:
+      incremental["manifest"].keep(decision["key"])
+      self.logger.info(f"💤 Unchanged: {node.path}")
+      self._count(summary, "unchanged")
+      return
+
+    self.logger.debug(f"Processing name: {name}, content: {content}")
+    if isinstance(content, dict):
+      content = dict(content)
+      content["name"] = name
+      content["global_system_prompt"] = args.global_system_prompt
+      content["config_variables"] = config_variables
+      content["input_store"] = args.input_store
+      content["non_interactive"] = args.non_interactive
+      content["mappings"] = context.mappings
+      if prefetched and content.get("file") in prefetched:
+        content["prefetched_content"] = prefetched[content["file"]]
+      file_item = FileItem(content, context=context)
+      file_item.fetch_content()
+    else:
+      file_item = FileItem(
+        {
+          "name": name,
+          "content": content,
+          "config_variables": config_variables,
+          "input_store": args.input_store,
+          "non_interactive": args.non_interactive,
+          "mappings": context.mappings,
+        },
+        context=context,
+      )
+
+    # Determine the full file path
+    file_path_to_create = node.path
+    existing_content = None
+    if os.path.exists(file_path_to_create):
+      self.logger.info(f"ℹ️  Exists: {file_path_to_create}")
+      # Binary files are compared chunk by chunk when written, never read whole
+      if not file_item.binary:
+        with open(file_path_to_create, 'r') as existing_file:
+          existing_content = existing_file.read()
+
+    file_item.process_prompt(
+      args.dry_run,
+      existing_content=existing_content
+    )
+    file_item.apply_template_variables(template_vars)
+
+    # Output mode logic with diff support
+    if hasattr(args, 'output') and args.output == 'console':
+      with self._output_lock:
+        print(f"=== {file_path_to_create} ===")
+        if file_item.binary:
+          print(f"(binary content from {file_item.content_location})")
+        elif args.diff and existing_content is not None:
+          new_content = file_item.content if file_item.content.endswith("\n") else file_item.content + "\n"
+          old_content = existing_content if existing_content.endswith("\n") else existing_content + "\n"
+          diff = difflib.unified_diff(
+              old_content.splitlines(keepends=True),
+              new_content.splitlines(keepends=True),
+              fromfile=f"a/{file_path_to_create}",
+              tofile=f"b/{file_path_to_create}",
+          )
+          print("".join(diff))
+        else:
+          print(file_item.content)
+    else:
+      # When dry-run with --diff and files mode, print action and diff instead of writing
+      if args.dry_run and args.diff:
+        action = "create"
+        if existing_content is not None or (file_item.binary and os.path.exists(file_path_to_create)):
+          action = "update"
+        if action == "create":
+          self._count(summary, "dry_run_created")
+        else:
+          self._count(summary, "dry_run_updated")
+        if file_item.binary:
+          with self._output_lock:
+            print(f"[DRY RUN] {action}: {file_path_to_create} (binary content from {file_item.content_location})")
+          return
+        new_content = file_item.content if file_item.content.endswith("\n") else file_item.content + "\n"
+        old_content = (existing_content if existing_content is not None else "")
+        old_content = old_content if old_content.endswith("\n") else (old_content + ("\n" if old_content else ""))
+        diff = difflib.unified_diff(
+            old_content.splitlines(keepends=True),
+            new_content.splitlines(keepends=True),
+            fromfile=f"a/{file_path_to_create}",
+            tofile=f"b/{file_path_to_create}",
+        )
+        with self._output_lock:
+          print(f"[DRY RUN] {action}: {file_path_to_create}")
+          print("".join(diff))
+      else:
+        result = file_item.create(
+            args.base_path,
+            args.dry_run or False,
+            args.backup or None,
+            args.file_strategy or 'overwrite'
+        )
+        if isinstance(result, dict):
+          if result.get("action") == "created":
+            self._count(summary, "created")
+          elif result.get("action") == "updated":
+            self._count(summary, "updated")
+          elif result.get("action") == "appended":
+            self._count(summary, "appended")
+          elif result.get("action") == "skipped":
+            self._count(summary, "skipped")
+          elif result.get("action") == "unchanged":
+            self._count(summary, "unchanged")
+          if result.get("backed_up_to"):
+            self._count(summary, "backed_up")
+          if result.get("renamed_from"):
+            self._count(summary, "renamed")
+          if decision and result.get("action") in ("created", "updated", "appended", "unchanged"):
+            # Answers given while rendering are part of the inputs, so the
+            # next run matches once they are in the store
+            inputs = dict(decision["inputs"])
+            inputs["answers"] = self._answers_hash(decision["answer_vars"], file_item.template_renderer.input_data or {})
+            incremental["manifest"].record(decision["key"], result["path"], hash_obj(inputs), inputs)
+            # An identical rewrite is already counted as unchanged
+            if result.get("action") != "unchanged":
+              self._count(summary, "rebuilt")
+
+  def _print_summary(self, summary, dry_run=False):
+    self.logger.info("")
+    self.logger.info("Summary of actions:")
+    self.logger.info(f"  ✅  Created: {summary['created']}")
+    self.logger.info(f"  ✅  Updated: {summary['updated']}")
+    self.logger.info(f"  📝  Appended: {summary['appended']}")
+    self.logger.info(f"  ⏭️  Skipped: {summary['skipped']}")
+    self.logger.info(f"  🗄️  Backed up: {summary['backed_up']}")
+    self.logger.info(f"  🔁  Renamed: {summary['renamed']}")
+    self.logger.info(f"  📁  Folders created: {summary['folders']}")
+    self.logger.info(f"  💤  Unchanged: {summary['unchanged']}")
+    self.logger.info(f"  🔨  Rebuilt: {summary['rebuilt']}")
+    if dry_run:
+      self.logger.info(
+          f"  [DRY RUN] Would create: {summary['dry_run_created']}")
+      self.logger.info(
+          f"  [DRY RUN] Would update: {summary['dry_run_updated']}")
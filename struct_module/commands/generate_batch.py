@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from struct_module.commands import Command
+from struct_module.commands.generate import GenerateCommand
+from struct_module.completers import file_strategy_completer
+from struct_module.content_fetcher import offline_mode, start_run
+from struct_module.logging_config import configure_logging
+from struct_module.mappings_store import close_mappings, merge_layers
+
+# Per-process generate command, reused across targets so parsed
+# definitions and caches stay warm
+_worker = None
+
+
+def _worker_command():
+  global _worker
+  if _worker is None:
+    parser = argparse.ArgumentParser()
+    _worker = (parser, GenerateCommand(parser))
+  return _worker
+
+
+def _generate_target(target):
+  """Generate a single batch target. Runs in the main or a pool process."""
+  parser, command = _worker_command()
+  args = parser.parse_args([target["structure_definition"], target["base_path"]])
+  for key, value in target["options"].items():
+    setattr(args, key, value)
+
+  command.logger.info(f"Generating structure")
+  command.logger.info(f"  Structure definition: {args.structure_definition}")
+  command.logger.info(f"  Base path: {args.base_path}")
+
+  mappings = command._load_mappings(args.mappings_file, args.mappings_backend)
+  if mappings is None:
+    return None
+  if target.get("mappings"):
+    mappings = merge_layers([mappings, target["mappings"]])
+  return command._generate(args, mappings)
+
+
+# Generate-batch command class
+class GenerateBatchCommand(Command):
+  def __init__(self, parser):
+    super().__init__(parser)
+    parser.description = "Generate many structures from a batch file (YAML or JSON) in a single process"
+    parser.add_argument('batch_file', type=str, help='Path to a YAML or JSON file listing the targets to generate')
+    parser.add_argument('-s', '--structures-path', type=str, help='Path to structure definitions')
+    parser.add_argument('-n', '--input-store', type=str, help='Path to the input store', default='/tmp/struct/input.json')
+    parser.add_argument('-d', '--dry-run', action='store_true', help='Perform a dry run without creating any files or directories')
+    parser.add_argument('-f', '--file-strategy', type=str, choices=['overwrite', 'skip', 'append', 'rename', 'backup'], default='overwrite', help='Strategy for handling existing files').completer = file_strategy_completer
+    parser.add_argument('--mappings-file', type=str, action='append',
+                        help='Path or remote location of a YAML file containing mappings shared by all targets (can be specified multiple times)')
+    parser.add_argument('--mappings-backend', type=str, choices=['yaml', 'sqlite'], default='yaml',
+                        help='How mappings files are loaded: parsed fully (yaml) or through an on-disk index with lazy lookups (sqlite)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of parallel workers used to run each generation plan (default: 1)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8,
+                        help='Maximum number of remote file: sources downloaded concurrently (default: 8)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip files whose inputs did not change since the last run of each target')
+    parser.add_argument('--offline', action='store_true',
+                        help='Serve every remote source from the cache (see `struct fetch`) and fail on any miss')
+    parser.add_argument('-P', '--processes', type=int, default=1,
+                        help='Number of worker processes used to spread targets across cores (default: 1)')
+    parser.set_defaults(func=self.execute)
+
+  def _load_targets(self, batch_file):
+    """
+    Read the batch file. It is either a list of targets or a mapping with a
+    'targets' list and optional 'defaults' applied to every target.
+
+    Example:
+      defaults:
+        structures_path: ./structures
+      targets:
+        - structure_definition: project/python
+          base_path: ./repos/api
+          vars:
+            project_name: api
+          mappings:
+            team: backend
+    """
+    with open(batch_file, 'r') as f:
+      data = json.load(f) if batch_file.endswith('.json') else yaml.safe_load(f)
+
+    defaults = {}
+    if isinstance(data, dict):
+      defaults = data.get('defaults') or {}
+      data = data.get('targets')
+    if not isinstance(data, list):
+      raise ValueError("The batch file must contain a list of targets.")
+
+    targets = []
+    for index, entry in enumerate(data):
+      if not isinstance(entry, dict):
+        raise ValueError(f"Batch target #{index + 1} must be a dictionary.")
+      merged = {k.replace('-', '_'): v for k, v in {**defaults, **entry}.items()}
+      if not merged.get('structure_definition') or not merged.get('base_path'):
+        raise ValueError(f"Batch target #{index + 1} must define 'structure_definition' and 'base_path'.")
+      targets.append(merged)
+    return targets
+
+  def _build_target(self, args, entry):
+    entry = dict(entry)
+    target = {
+      "structure_definition": entry.pop('structure_definition'),
+      "base_path": entry.pop('base_path'),
+      "mappings": entry.pop('mappings', None),
+    }
+
+    options = {
+      "structures_path": args.structures_path,
+      "input_store": args.input_store,
+      "dry_run": args.dry_run,
+      "file_strategy": args.file_strategy,
+      "mappings_file": args.mappings_file,
+      "mappings_backend": args.mappings_backend,
+      "jobs": args.jobs,
+      "fetch_concurrency": args.fetch_concurrency,
+      "incremental": args.incremental,
+      # A dict is used as-is; a KEY=value string is parsed by generate
+      "vars": entry.pop('vars', None),
+    }
+    # Per-target keys override the batch-wide options
+    options.update(entry)
+    # Nobody can answer prompts for a whole batch
+    options["non_interactive"] = True
+    target["options"] = options
+    return target
+
+  def execute(self, args):
+    try:
+      entries = self._load_targets(args.batch_file)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+      self.logger.error(f"❗ Failed to load batch file {args.batch_file}: {e}")
+      return
+
+    targets = [self._build_target(args, entry) for entry in entries]
+    self.logger.info(f"Generating {len(targets)} targets from {args.batch_file}")
+
+    processes = max(1, args.processes or 1)
+    start_run()
+    # Offline mode is inherited by the worker processes
+    with offline_mode(args.offline):
+      if processes > 1 and len(targets) > 1:
+        level = logging.getLogger().getEffectiveLevel()
+        with ProcessPoolExecutor(max_workers=min(processes, len(targets)),
+                                 initializer=configure_logging, initargs=(level,)) as pool:
+          futures = [pool.submit(_generate_target, target) for target in targets]
+          results = [self._result(target, future.result) for target, future in zip(targets, futures)]
+      else:
+        try:
+          results = [self._result(target, lambda t=target: _generate_target(t)) for target in targets]
+        finally:
+          close_mappings()
+
+    self._print_batch_summary(targets, results)
+    return results
+
+  def _result(self, target, run):
+    try:
+      return run()
+    except Exception as e:
+      self.logger.error(f"❗ Target {target['base_path']} failed: {e}")
+      return None
+
+  def _print_batch_summary(self, targets, results):
+    totals = {}
+    failed = 0
+    for result in results:
+      if result is None:
+        failed += 1
+        continue
+      for key, value in result.items():
+        totals[key] = totals.get(key, 0) + value
+
+    self.logger.info("")
+    self.logger.info("Batch summary:")
+    self.logger.info(f"  🎯  Targets: {len(targets)}")
+    self.logger.info(f"  ❗  Failed: {failed}")
+    self.logger.info(f"  ✅  Created: {totals.get('created', 0)}")
+    self.logger.info(f"  ✅  Updated: {totals.get('updated', 0)}")
+    self.logger.info(f"  💤  Unchanged: {totals.get('unchanged', 0)}")
+    self.logger.info(f"  ⏭️  Skipped: {totals.get('skipped', 0)}")
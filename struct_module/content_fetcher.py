@@ -1,14 +1,33 @@
 # FILE: content_fetcher.py
+import atexit
+import contextlib
+import functools
+import io
 import os
+import posixpath
 import re
 import requests
+import shutil
 import subprocess
 from pathlib import Path
 import hashlib
+import itertools
+import json
 import logging
+import tarfile
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from struct_module.cache_index import file_checksum, get_cache_index
 
 try:
   import boto3
+  from botocore.config import Config as BotoConfig
   from botocore.exceptions import NoCredentialsError, ClientError
   boto3_available = True
 except ImportError:
@@ -21,11 +40,388 @@ try:
 except ImportError:
   gcs_available = False
 
+def is_offline():
+  """True when STRUCT_OFFLINE=1 (set by generate --offline): only the cache is used."""
+  return os.getenv("STRUCT_OFFLINE") == "1"
+
+
+@contextlib.contextmanager
+def offline_mode(enabled=True):
+  """
+  Set STRUCT_OFFLINE=1 for the duration of the block, restoring the
+  previous value afterwards. Worker processes started inside inherit it.
+  """
+  if not enabled:
+    yield
+    return
+  previous = os.environ.get("STRUCT_OFFLINE")
+  os.environ["STRUCT_OFFLINE"] = "1"
+  try:
+    yield
+  finally:
+    if previous is None:
+      os.environ.pop("STRUCT_OFFLINE", None)
+    else:
+      os.environ["STRUCT_OFFLINE"] = previous
+
+
+class CacheMissError(FileNotFoundError):
+  """Raised in offline mode for a location that is not in the cache."""
+
+
+# One lock per cache entry (cloned repository or HTTP body) so concurrent
+# fetches never clone, pull or rewrite the same entry at the same time.
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+def _path_lock(path):
+  with _path_locks_guard:
+    return _path_locks.setdefault(str(path), threading.RLock())
+
+# Files pinned or spooled by ContentFetcher.binary_opener
+_snapshot_ids = itertools.count()
+_snapshot_lock = threading.Lock()
+_swept_snapshot_dirs = set()
+
+def _process_alive(pid):
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:
+    pass
+  return True
+
+def _unlink_quietly(path):
+  try:
+    os.unlink(path)
+  except OSError:
+    pass
+
+# One keep-alive HTTP session per process, so every fetch from the same host
+# reuses pooled connections instead of a new TCP and TLS handshake.
+_session = None
+_session_lock = threading.Lock()
+
+def http_session():
+  global _session
+  with _session_lock:
+    if _session is None:
+      pool_size = int(os.getenv("STRUCT_HTTP_POOL_SIZE", "16"))
+      session = requests.Session()
+      adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+      session.mount("https://", adapter)
+      session.mount("http://", adapter)
+      _session = session
+    return _session
+
+# Object storage clients shared by every fetch of the process. Both are
+# thread-safe and keep their own connection pools.
+_s3_client = None
+_gcs_client = None
+_storage_clients_lock = threading.Lock()
+
+def s3_client():
+  """
+  Return the process-wide S3 client. STRUCT_S3_ENDPOINT_URL points it at an
+  S3-compatible service such as MinIO or LocalStack.
+  """
+  global _s3_client
+  with _storage_clients_lock:
+    if _s3_client is None:
+      pool_size = int(os.getenv("STRUCT_HTTP_POOL_SIZE", "16"))
+      _s3_client = boto3.session.Session().client(
+        "s3",
+        endpoint_url=os.getenv("STRUCT_S3_ENDPOINT_URL") or None,
+        config=BotoConfig(max_pool_connections=pool_size),
+      )
+    return _s3_client
+
+def gcs_client():
+  """Return the process-wide Google Cloud Storage client."""
+  global _gcs_client
+  with _storage_clients_lock:
+    if _gcs_client is None:
+      _gcs_client = storage.Client()
+    return _gcs_client
+
+def _large_object_threshold():
+  """Objects above STRUCT_OBJECT_CHUNK_MB (default 8) are downloaded in parallel ranges."""
+  return int(float(os.getenv("STRUCT_OBJECT_CHUNK_MB", "8")) * 1024 * 1024)
+
+def _ranged_download(path, size, read_range):
+  """
+  Download an object of size bytes to path as parallel ranged reads.
+  read_range(start, end) yields the bytes of the inclusive range.
+  """
+  chunk = _large_object_threshold()
+  ranges = [(start, min(start + chunk, size) - 1) for start in range(0, size, chunk)]
+  with open(path, 'wb') as f:
+    f.truncate(size)
+
+  def fetch(byte_range):
+    with open(path, 'r+b') as f:
+      f.seek(byte_range[0])
+      for data in read_range(*byte_range):
+        f.write(data)
+
+  workers = max(1, min(int(os.getenv("STRUCT_OBJECT_CONCURRENCY", "8")), len(ranges)))
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    # list() re-raises the first failed range
+    list(pool.map(fetch, ranges))
+
+# (scheme, bucket, key) -> cached path of the version checked in this run
+_object_versions = {}
+
+# Cloned repositories already fetched in this run; later reads from the
+# same repository and branch are served from the cache without a fetch
+_synced_repos = set()
+# Bare repository -> commit its branch resolved to in this run
+_repo_commits = {}
+# (owner, repo, ref) -> (tarball path, {member path: (offset, size)}) for
+# repository archives already downloaded or revalidated in this run, or
+# None when the archive could not be fetched in this run
+_github_archives = {}
+
+
+def start_run():
+  """
+  Forget which remotes earlier runs of this process checked, so that a
+  long-lived process such as the MCP server fetches them again. Called at
+  the start of every generate, generate-batch and fetch command.
+  """
+  _synced_repos.clear()
+  _repo_commits.clear()
+  _github_archives.clear()
+  _object_versions.clear()
+
+
+def _is_bare_repo(path):
+  return (path / "HEAD").is_file() and (path / "objects").is_dir()
+
+def _is_partial_clone(path):
+  try:
+    return "partialclone" in (path / "config").read_text()
+  except OSError:
+    return False
+
+# Sources with these extensions are copied byte for byte (binary: true)
+BINARY_EXTENSIONS = {
+  ".png", ".jpg", ".jpeg", ".gif", ".ico", ".webp", ".bmp", ".pdf",
+  ".zip", ".jar", ".war", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z",
+  ".woff", ".woff2", ".ttf", ".otf", ".eot",
+  ".so", ".dll", ".dylib", ".exe", ".class", ".wasm", ".bin",
+}
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+def is_binary_location(location):
+  """Guess from its extension whether a source is binary."""
+  path = str(location).split("?", 1)[0].split("#", 1)[0]
+  return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
+
+def is_binary_source(spec):
+  """True for a file: entry marked binary: true or, if unmarked, with a binary extension."""
+  if spec.get("binary") is not None:
+    return bool(spec["binary"])
+  return is_binary_location(spec.get("file", ""))
+
+def looks_binary(text):
+  """Like git, treat content with a NUL in its first 8000 characters as binary."""
+  return "\x00" in text[:8000]
+
+
+# Media types whose bodies are always binary, whatever the bytes look like
+_BINARY_MEDIA_TYPES = ("image/", "audio/", "video/", "font/")
+
+def _is_binary_body(content_type, body):
+  """
+  Decide from the Content-Type and the raw bytes of an HTTP response
+  whether it is binary, before anything decodes it as text.
+  """
+  media_type = (content_type or "").split(";", 1)[0].strip().lower()
+  if media_type.startswith("text/"):
+    return b"\x00" in body[:8000]
+  if media_type.startswith(_BINARY_MEDIA_TYPES):
+    return True
+  if b"\x00" in body[:8000]:
+    return True
+  try:
+    body.decode("utf-8")
+  except UnicodeDecodeError:
+    return True
+  return False
+
+
+class FileSlice(io.RawIOBase):
+  """Binary stream over size bytes of a file starting at offset."""
+  def __init__(self, path, offset, size):
+    self.path = path
+    self.offset = offset
+    self.size = size
+    self._file = open(path, 'rb')
+    self._file.seek(offset)
+    self._left = size
+
+  def readable(self):
+    return True
+
+  def readinto(self, buffer):
+    size = min(len(buffer), self._left)
+    if size <= 0:
+      return 0
+    data = self._file.read(size)
+    buffer[:len(data)] = data
+    self._left -= len(data)
+    return len(data)
+
+  def close(self):
+    self._file.close()
+    super().close()
+
+
+class _ProcessStream(io.RawIOBase):
+  """
+  Binary stream over the stdout of a process, reaped on close. Closing a
+  stream read to the end raises OSError when the process failed, since
+  its output may then be truncated.
+  """
+  def __init__(self, process):
+    self._process = process
+    self._at_eof = False
+
+  def readable(self):
+    return True
+
+  def readinto(self, buffer):
+    size = self._process.stdout.readinto(buffer)
+    if not size:
+      self._at_eof = True
+    return size
+
+  def close(self):
+    if self.closed:
+      return
+    try:
+      self._process.stdout.close()
+      returncode = self._process.wait()
+    finally:
+      super().close()
+    # A stream closed early may have killed the process with SIGPIPE
+    if returncode != 0 and self._at_eof:
+      raise OSError(f"{' '.join(self._process.args)} exited with status {returncode}")
+
+
+class GitObjectReader:
+  """
+  Long-lived `git cat-file --batch` process reading the objects of one
+  repository, so many files are read without a working tree, a checkout
+  or a new git process per file.
+  """
+  def __init__(self, repo_path):
+    self.repo_path = str(repo_path)
+    self._process = None
+    self._lock = threading.Lock()
+
+  def read(self, spec):
+    """
+    Return (sha, type, data) for an object name such as 'main:path/file',
+    or None when it does not exist.
+    """
+    if "\n" in spec:
+      raise ValueError(f"Invalid object name: {spec!r}")
+    with self._lock:
+      if self._process is None or self._process.poll() is not None:
+        self._process = subprocess.Popen(
+          ["git", "-C", self.repo_path, "cat-file", "--batch"],
+          stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+      self._process.stdin.write(spec.encode("utf-8") + b"\n")
+      self._process.stdin.flush()
+      header = self._process.stdout.readline().decode("utf-8", "replace").rstrip("\n")
+      if not header:
+        raise RuntimeError(f"git cat-file exited while reading {spec} from {self.repo_path}")
+      if header.endswith((" missing", " ambiguous")):
+        return None
+      sha, kind, size = header.rsplit(" ", 2)
+      data = self._process.stdout.read(int(size))
+      # Each object is followed by a newline
+      self._process.stdout.read(1)
+      return sha, kind, data
+
+  def close(self):
+    with self._lock:
+      if self._process is not None:
+        self._process.stdin.close()
+        self._process.wait()
+        self._process.stdout.close()
+        self._process = None
+
+
+_object_readers = {}
+_object_readers_lock = threading.Lock()
+
+def git_object_reader(repo_path):
+  """Return the process-wide GitObjectReader for repo_path."""
+  with _object_readers_lock:
+    reader = _object_readers.get(str(repo_path))
+    if reader is None:
+      reader = _object_readers[str(repo_path)] = GitObjectReader(repo_path)
+    return reader
+
+@atexit.register
+def _close_object_readers():
+  with _object_readers_lock:
+    readers = list(_object_readers.values())
+    _object_readers.clear()
+  for reader in readers:
+    reader.close()
+
+# HTTP cache entries (metadata, body) already read in this process, bounded
+# by the total size of the bodies
+_memory_cache = LRUCache(
+  maxsize=int(os.getenv("STRUCT_FETCH_MEMORY_CACHE_MB", "64")) * 1024 * 1024,
+  getsizeof=lambda entry: len(entry[1]),
+)
+_memory_cache_lock = threading.Lock()
+
+# (commit, path) -> content of files read from bare repositories
+_git_blob_cache = LRUCache(
+  maxsize=int(os.getenv("STRUCT_FETCH_MEMORY_CACHE_MB", "64")) * 1024 * 1024,
+  getsizeof=len,
+)
+
+# URLs with a background revalidation in flight
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def _cache_freshness(headers):
+  """
+  Read max-age and stale-while-revalidate from Cache-Control, falling back
+  to STRUCT_HTTP_CACHE_TTL (default 300s) and
+  STRUCT_HTTP_STALE_WHILE_REVALIDATE (default 0s).
+  """
+  max_age = int(os.getenv("STRUCT_HTTP_CACHE_TTL", "300"))
+  stale_while_revalidate = int(os.getenv("STRUCT_HTTP_STALE_WHILE_REVALIDATE", "0"))
+  for directive in (headers.get("Cache-Control") or "").split(","):
+    name, _, value = directive.strip().partition("=")
+    name = name.lower()
+    if name in ("no-cache", "no-store"):
+      max_age = 0
+    elif name == "max-age" and value.isdigit():
+      max_age = int(value)
+    elif name == "stale-while-revalidate" and value.isdigit():
+      stale_while_revalidate = int(value)
+  return {"max_age": max_age, "stale_while_revalidate": stale_while_revalidate}
+
+
 class ContentFetcher:
   def __init__(self, cache_dir=None):
     self.logger = logging.getLogger(__name__)
     self.cache_dir = Path(cache_dir or os.path.expanduser("~/.struct/cache"))
     self.cache_dir.mkdir(parents=True, exist_ok=True)
+    self.cache_index = get_cache_index(self.cache_dir)
+    # URL -> cached blob of HTTP bodies the text path found to be binary
+    self._binary_bodies = {}
 
   def fetch_content(self, content_location):
     """
@@ -35,15 +431,29 @@ class ContentFetcher:
     - GitHub repository (github://owner/repo/branch/file_path)
     - GitHub HTTPS (githubhttps://owner/repo/branch/file_path)
     - GitHub SSH (githubssh://owner/repo/branch/file_path)
+    - GitHub archive (githubarchive://owner/repo/branch/file_path)
     - S3 bucket (s3://bucket_name/key)
     - Google Cloud Storage (gs://bucket_name/key)
     """
+    return self._dispatch(content_location)
+
+  def open_binary(self, content_location):
+    """
+    Open a source of any supported protocol as a binary stream, for assets
+    that must be copied byte for byte. Remote bodies are downloaded to the
+    cache in chunks and the stream reads from there, so a source is never
+    held in memory as a whole. The caller closes the stream.
+    """
+    return self._dispatch(content_location, binary=True)
+
+  def _dispatch(self, content_location, binary=False):
     protocol_map = {
       "file://": self._fetch_local_file,
       "https://": self._fetch_http_url,
       "github://": self._fetch_github_file,
       "githubhttps://": self._fetch_github_https_file,
       "githubssh://": self._fetch_github_ssh_file,
+      "githubarchive://": self._fetch_github_archive_file,
     }
 
     if boto3_available:
@@ -56,38 +466,387 @@ class ContentFetcher:
         # Only treat the raw HTTPS prefix as a direct URL fetch. All other
         # custom prefixes (e.g., githubhttps://, githubssh://) should have
         # their prefix stripped and be dispatched to the appropriate handler.
-        if prefix == "https://":
-          return method(content_location)
-        else:
-          return method(content_location[len(prefix):])
+        path = content_location if prefix == "https://" else content_location[len(prefix):]
+        return method(path, binary=True) if binary else method(path)
 
     raise ValueError(f"Unsupported content location: {content_location}")
 
-  def _fetch_local_file(self, file_path):
+  def prefetch(self, content_locations, max_workers=8, binary=()):
+    """
+    Fetch many locations concurrently.
+
+    Returns a dict mapping each unique location to its content, or to the
+    exception raised while fetching it so callers can report the failure
+    without retrying the download. Locations in binary, and text sources
+    that turn out to be binary, are only downloaded to the cache and
+    mapped to a callable opening them (see binary_opener).
+    """
+    locations = list(dict.fromkeys(content_locations))
+    results = {}
+    if not locations:
+      return results
+
+    workers = max(1, min(max_workers or 1, len(locations)))
+    self.logger.debug(f"Prefetching {len(locations)} locations with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      futures = {pool.submit(self._prefetch_one, loc, loc in binary): loc for loc in locations}
+      for future in as_completed(futures):
+        location = futures[future]
+        try:
+          results[location] = future.result()
+        except Exception as e:
+          self.logger.debug(f"Prefetch failed for {location}: {e}")
+          results[location] = e
+    return results
+
+  def _prefetch_one(self, content_location, binary):
+    if binary:
+      return self.binary_opener(content_location)
+    try:
+      content = self.fetch_content(content_location)
+    except UnicodeDecodeError:
+      return self.binary_opener(content_location)
+    if isinstance(content, str) and looks_binary(content):
+      return self.binary_opener(content_location)
+    return content
+
+  def binary_opener(self, content_location):
+    """
+    Resolve a binary source once and return a callable opening the bytes
+    it resolved to. Cached files are pinned with a hard link and process
+    output (git blobs) is spooled to a file, so every call reads the same
+    bytes without fetching the source again.
+    """
+    path = self._binary_bodies.pop(content_location, None)
+    if path is not None:
+      return self._file_opener(path)
+    with self.open_binary(content_location) as stream:
+      if isinstance(stream, FileSlice):
+        path = self._pin(stream.path)
+        return self._track(functools.partial(FileSlice, path, stream.offset, stream.size), path, stream.path)
+      name = getattr(stream, "name", None)
+      if isinstance(name, str) and os.path.isfile(name):
+        return self._file_opener(name)
+      return self._spool(stream)
+
+  def _file_opener(self, path):
+    pinned = self._pin(path)
+    return self._track(functools.partial(open, pinned, 'rb'), pinned, path)
+
+  def _snapshot_dir(self):
+    """
+    Directory of the files pinned or spooled by binary_opener. Entries are
+    named after the owning process and removed when their opener is
+    garbage collected; those of processes that died are swept here.
+    """
+    directory = self.cache_dir / "snapshots"
+    with _snapshot_lock:
+      if str(directory) not in _swept_snapshot_dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+        for entry in directory.iterdir():
+          pid = entry.name.split("-", 1)[0]
+          if pid.isdigit() and not _process_alive(int(pid)):
+            entry.unlink(missing_ok=True)
+        _swept_snapshot_dirs.add(str(directory))
+    return directory
+
+  def _pin(self, path):
+    """
+    Hard link a cached file into the snapshot directory, so a concurrent
+    refresh or eviction of the cache entry cannot change what is read.
+    Files outside the cache (local sources) are read in place.
+    """
+    path = os.path.abspath(path)
+    cache_root = os.path.realpath(self.cache_dir)
+    if os.path.commonpath([os.path.realpath(path), cache_root]) != cache_root:
+      return path
+    pinned = self._snapshot_dir() / f"{os.getpid()}-{next(_snapshot_ids)}"
+    try:
+      os.link(path, pinned)
+    except OSError as e:
+      self.logger.debug(f"Could not pin {path}, reading it in place: {e}")
+      return path
+    return str(pinned)
+
+  def _spool(self, stream):
+    """Copy a stream to the snapshot directory and return an opener over the copy."""
+    fd, spooled = tempfile.mkstemp(dir=self._snapshot_dir(), prefix=f"{os.getpid()}-")
+    try:
+      with os.fdopen(fd, 'wb') as file:
+        shutil.copyfileobj(stream, file, STREAM_CHUNK_SIZE)
+      stream.close()
+    except BaseException:
+      os.unlink(spooled)
+      raise
+    return self._track(functools.partial(open, spooled, 'rb'), spooled)
+
+  def _track(self, opener, path, original=None):
+    """Remove a pinned or spooled file once its opener is gone."""
+    if path != original:
+      weakref.finalize(opener, _unlink_quietly, path)
+    return opener
+
+  def _fetch_local_file(self, file_path, binary=False):
     self.logger.debug(f"Fetching content from local file: {file_path}")
     file_path = Path(file_path)
+    if binary:
+      return file_path.open('rb')
     with file_path.open('r') as file:
       return file.read()
 
-  def _fetch_http_url(self, url):
+  def _fetch_http_url(self, url, binary=False):
     self.logger.debug(f"Fetching content from URL: {url}")
-    # Create a hash of the URL to use as a cache key
+    if binary:
+      return self._cached_http_download(url).open('rb')
+    return self._cached_http_get(url)
+
+  def _http_cache_paths(self, url):
+    # Bodies are keyed by a hash of the URL, metadata lives next to them
     cache_key = hashlib.md5(url.encode()).hexdigest()
-    cache_file_path = self.cache_dir / cache_key
+    return self.cache_dir / cache_key, self.cache_dir / f"{cache_key}.meta.json"
 
-    if cache_file_path.exists():
-      self.logger.debug(f"Loading content from cache: {cache_file_path}")
-      with cache_file_path.open('r') as file:
-        return file.read()
+  def _cached_http_get(self, url, timeout=None):
+    """
+    GET a URL through the HTTP cache.
 
-    response = requests.get(url)
-    response.raise_for_status()
-    with cache_file_path.open('w') as file:
-      file.write(response.text)
+    Fresh entries are served without touching the network. Stale entries
+    are revalidated with If-None-Match / If-Modified-Since, or served as-is
+    while a background request revalidates them when the response allowed
+    stale-while-revalidate. With STRUCT_DENY_NETWORK=1 any cached entry is
+    served; offline, a missing entry raises CacheMissError.
+    """
+    body_path, meta_path = self._http_cache_paths(url)
+    with _path_lock(body_path):
+      entry = self._load_http_entry(body_path, meta_path)
+      if entry is None and self._is_cached_binary_body(url):
+        raise UnicodeDecodeError("utf-8", b"", 0, 0, f"binary content at {url}")
+      if entry is None and is_offline():
+        raise CacheMissError(f"{url} is not in the cache (offline mode)")
+      if entry is not None:
+        meta, content = entry
+        age = time.time() - meta.get("fetched_at", 0)
+        max_age = meta.get("max_age", 0)
+        if age < max_age or os.getenv("STRUCT_DENY_NETWORK") == "1" or is_offline():
+          self.logger.debug(f"Loading content from cache: {body_path}")
+          self.cache_index.touch(body_path)
+          return content
+        if age < max_age + meta.get("stale_while_revalidate", 0):
+          self.logger.debug(f"Serving stale cache entry while revalidating: {url}")
+          self.cache_index.touch(body_path)
+          self._revalidate_in_background(url, timeout, entry)
+          return content
+      return self._http_fetch(url, timeout, entry)
+
+  def _http_fetch(self, url, timeout, entry):
+    body_path, meta_path = self._http_cache_paths(url)
+    headers = {}
+    if entry is not None:
+      if entry[0].get("etag"):
+        headers["If-None-Match"] = entry[0]["etag"]
+      if entry[0].get("last_modified"):
+        headers["If-Modified-Since"] = entry[0]["last_modified"]
+
+    kwargs = {}
+    if headers:
+      kwargs["headers"] = headers
+    if timeout is not None:
+      kwargs["timeout"] = timeout
+    response = http_session().get(url, **kwargs)
+    response_headers = getattr(response, "headers", None) or {}
 
+    if entry is not None and getattr(response, "status_code", 200) == 304:
+      self.logger.debug(f"Cache entry revalidated (304): {url}")
+      meta = {**entry[0], **_cache_freshness(response_headers), "fetched_at": time.time()}
+      self._store_http_entry(body_path, meta_path, meta, entry[1], write_body=False)
+      self.cache_index.touch(body_path)
+      return entry[1]
+
+    response.raise_for_status()
+    meta = {
+      "url": url,
+      "etag": response_headers.get("ETag"),
+      "last_modified": response_headers.get("Last-Modified"),
+      "fetched_at": time.time(),
+      **_cache_freshness(response_headers),
+    }
+    body = getattr(response, "content", None)
+    if isinstance(body, bytes) and _is_binary_body(response_headers.get("Content-Type"), body):
+      # Keep the raw bytes in the binary cache instead of a garbled text
+      # entry; binary_opener serves them without downloading them again
+      self._binary_bodies[url] = self._store_http_blob(url, body, {**meta, "binary": True})
+      raise UnicodeDecodeError("utf-8", body[:1], 0, 1, f"binary content at {url}")
+    self._store_http_entry(body_path, meta_path, meta, response.text)
     return response.text
 
-  def _fetch_github_file(self, github_path):
+  def _is_cached_binary_body(self, url):
+    """True when a text fetch of url already found it to be binary."""
+    body_path, meta_path = self._http_blob_paths(url)
+    try:
+      with meta_path.open('r') as file:
+        return bool(json.load(file).get("binary")) and body_path.exists()
+    except (OSError, ValueError):
+      return False
+
+  def _http_blob_paths(self, url):
+    cache_key = hashlib.sha256(url.encode()).hexdigest()
+    return self.cache_dir / "blobs" / cache_key, self.cache_dir / "blobs" / f"{cache_key}.meta.json"
+
+  def _cached_http_download(self, url, timeout=None):
+    """
+    Download a URL to the cache in chunks and return the cached path.
+
+    Binary counterpart of _cached_http_get with the same freshness,
+    revalidation and offline rules; stale entries are always revalidated
+    before being served.
+    """
+    body_path, meta_path = self._http_blob_paths(url)
+    with _path_lock(body_path):
+      meta = None
+      if body_path.exists():
+        try:
+          with meta_path.open('r') as file:
+            meta = json.load(file)
+        except (OSError, ValueError):
+          meta = {}
+      if meta is None and is_offline():
+        raise CacheMissError(f"{url} is not in the cache (offline mode)")
+      if meta is not None:
+        age = time.time() - meta.get("fetched_at", 0)
+        if age < meta.get("max_age", 0) or os.getenv("STRUCT_DENY_NETWORK") == "1" or is_offline():
+          self.logger.debug(f"Loading binary content from cache: {body_path}")
+          self.cache_index.touch(body_path)
+          return body_path
+
+      headers = {}
+      if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+      if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+      kwargs = {"headers": headers, "stream": True}
+      if timeout is not None:
+        kwargs["timeout"] = timeout
+      response = http_session().get(url, **kwargs)
+      try:
+        response_headers = getattr(response, "headers", None) or {}
+        if meta is not None and getattr(response, "status_code", 200) == 304:
+          self.logger.debug(f"Binary cache entry revalidated (304): {url}")
+          self._write_meta(meta_path, {**meta, **_cache_freshness(response_headers), "fetched_at": time.time()})
+          self.cache_index.touch(body_path)
+          return body_path
+        response.raise_for_status()
+
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=body_path.parent, prefix=".")
+        try:
+          with os.fdopen(fd, 'wb') as file:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+              digest.update(chunk)
+              file.write(chunk)
+          os.replace(tmp, body_path)
+        finally:
+          Path(tmp).unlink(missing_ok=True)
+      finally:
+        response.close()
+
+      self._write_meta(meta_path, {
+        "url": url,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+        **_cache_freshness(response_headers),
+        **({"binary": True} if meta and meta.get("binary") else {}),
+      })
+      self.cache_index.record(body_path, "http", checksum=digest.hexdigest())
+      return body_path
+
+  def _store_http_blob(self, url, body, meta):
+    body_path, meta_path = self._http_blob_paths(url)
+    with _path_lock(body_path):
+      body_path.parent.mkdir(parents=True, exist_ok=True)
+      fd, tmp = tempfile.mkstemp(dir=body_path.parent, prefix=".")
+      try:
+        with os.fdopen(fd, 'wb') as file:
+          file.write(body)
+        os.replace(tmp, body_path)
+      finally:
+        Path(tmp).unlink(missing_ok=True)
+      self._write_meta(meta_path, meta)
+      self.cache_index.record(body_path, "http", body)
+    return body_path
+
+  def _write_meta(self, meta_path, meta):
+    fd, tmp = tempfile.mkstemp(dir=meta_path.parent)
+    with os.fdopen(fd, 'w') as file:
+      json.dump(meta, file)
+    os.replace(tmp, meta_path)
+
+  def _revalidate_in_background(self, url, timeout, entry):
+    with _revalidating_lock:
+      if url in _revalidating:
+        return
+      _revalidating.add(url)
+
+    def revalidate():
+      body_path, _ = self._http_cache_paths(url)
+      try:
+        with _path_lock(body_path):
+          self._http_fetch(url, timeout, entry)
+      except Exception as e:
+        self.logger.debug(f"Background revalidation failed for {url}: {e}")
+      finally:
+        with _revalidating_lock:
+          _revalidating.discard(url)
+
+    threading.Thread(target=revalidate, name="struct-revalidate").start()
+
+  def _load_http_entry(self, body_path, meta_path):
+    with _memory_cache_lock:
+      entry = _memory_cache.get(str(body_path))
+    if entry is not None:
+      return entry
+    try:
+      with body_path.open('r') as file:
+        content = file.read()
+    except FileNotFoundError:
+      return None
+    try:
+      with meta_path.open('r') as file:
+        meta = json.load(file)
+    except (OSError, ValueError):
+      # Entries written before metadata existed are treated as stale
+      meta = {}
+    entry = (meta, content)
+    self._remember_http_entry(body_path, entry)
+    return entry
+
+  def _store_http_entry(self, body_path, meta_path, meta, content, write_body=True):
+    if write_body:
+      # Swap the body in, so other processes never read a partial one
+      fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".")
+      try:
+        with os.fdopen(fd, 'w') as file:
+          file.write(content)
+        os.replace(tmp, body_path)
+      finally:
+        Path(tmp).unlink(missing_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+    with os.fdopen(fd, 'w') as file:
+      json.dump(meta, file)
+    os.replace(tmp, meta_path)
+    self._remember_http_entry(body_path, (meta, content))
+    if write_body:
+      self.cache_index.record(body_path, "http", body_path.read_bytes())
+
+  def _remember_http_entry(self, body_path, entry):
+    with _memory_cache_lock:
+      try:
+        _memory_cache[str(body_path)] = entry
+      except ValueError:
+        # Larger than the whole cache; only keep it on disk
+        pass
+
+  def _fetch_github_file(self, github_path, binary=False):
     """
     Fetch a file from a GitHub repository using HTTPS.
     Dispatcher passes: owner/repo/branch/file_path
@@ -98,9 +857,9 @@ class ContentFetcher:
       raise ValueError("Invalid GitHub path. Expected owner/repo/branch/file_path")
 
     owner, repo, branch, file_path = match.groups()
-    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=True)
+    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=True, binary=binary)
 
-  def _fetch_github_https_file(self, github_path):
+  def _fetch_github_https_file(self, github_path, binary=False):
     """
     Fetch a file from a GitHub repository using HTTPS.
     Dispatcher passes: owner/repo/branch/file_path
@@ -111,9 +870,9 @@ class ContentFetcher:
       raise ValueError("Invalid GitHub path. Expected owner/repo/branch/file_path")
 
     owner, repo, branch, file_path = match.groups()
-    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=True)
+    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=True, binary=binary)
 
-  def _fetch_github_ssh_file(self, github_path):
+  def _fetch_github_ssh_file(self, github_path, binary=False):
     """
     Fetch a file from a GitHub repository using SSH.
     Dispatcher passes: owner/repo/branch/file_path
@@ -124,44 +883,321 @@ class ContentFetcher:
       raise ValueError("Invalid GitHub path. Expected owner/repo/branch/file_path")
 
     owner, repo, branch, file_path = match.groups()
-    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=False)
+    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=False, binary=binary)
 
-  def _clone_or_fetch_github(self, owner, repo, branch, file_path, https=True):
+  def _fetch_github_archive_file(self, github_path, binary=False):
+    """
+    Fetch a file from the tarball of a GitHub repository.
+    Dispatcher passes: owner/repo/branch/file_path
+    """
+    self.logger.debug(f"Fetching content from GitHub (archive): {github_path}")
+    match = re.match(r"([^/]+)/([^/]+)/([^/]+)/(.+)", github_path)
+    if not match:
+      raise ValueError("Invalid GitHub path. Expected owner/repo/branch/file_path")
+
+    owner, repo, branch, file_path = match.groups()
+    return self._github_fetch_with_raw_then_git(owner, repo, branch, file_path, use_https=True, archive=True, binary=binary)
+
+  def _clone_or_fetch_github(self, owner, repo, branch, file_path, https=True, binary=False):
     repo_cache_path = self.cache_dir / f"{owner}_{repo}_{branch}"
     clone_url = f"https://github.com/{owner}/{repo}.git" if https else f"git@github.com:{owner}/{repo}.git"
 
-    # Clone or fetch the repository
-    if not repo_cache_path.exists():
-      self.logger.debug(f"Cloning repository: {owner}/{repo} (branch: {branch})")
-      subprocess.run(["git", "clone", "-b", branch, clone_url, str(repo_cache_path)], check=True)
-    else:
-      self.logger.debug(f"Repository already cloned. Pulling latest changes for: {repo_cache_path}")
-      subprocess.run(["git", "-C", str(repo_cache_path), "pull"], check=True)
+    with _path_lock(repo_cache_path):
+      if (str(repo_cache_path) not in _synced_repos and _is_partial_clone(repo_cache_path)
+          and not is_offline() and os.getenv("STRUCT_DENY_NETWORK") != "1"):
+        # Blobless clones made by earlier versions fetch every blob lazily,
+        # which fails offline; replace them with a complete one
+        self.logger.debug(f"Replacing partial clone: {repo_cache_path}")
+        shutil.rmtree(repo_cache_path, ignore_errors=True)
+
+      # Clone or fetch the repository, at most once per run. HEAD of the
+      # bare repository is the requested branch or tag.
+      if not repo_cache_path.exists():
+        self.logger.debug(f"Cloning repository: {owner}/{repo} (ref: {branch})")
+        subprocess.run([
+          "git", "clone", "--bare", "--depth", "1", "--no-tags",
+          "-b", branch, clone_url, str(repo_cache_path),
+        ], check=True)
+        if repo_cache_path.exists():
+          self.cache_index.record(repo_cache_path, "git")
+        _synced_repos.add(str(repo_cache_path))
+      elif str(repo_cache_path) not in _synced_repos and not is_offline():
+        self.logger.debug(f"Repository already cloned. Fetching latest changes for: {repo_cache_path}")
+        if _is_bare_repo(repo_cache_path):
+          # The remote resolves the name, so branches and tags both work
+          subprocess.run([
+            "git", "-C", str(repo_cache_path), "fetch", "--depth", "1", "--no-tags", "origin", branch,
+          ], check=True)
+          subprocess.run([
+            "git", "-C", str(repo_cache_path), "update-ref", "--no-deref", "HEAD", "FETCH_HEAD^{commit}",
+          ], check=True)
+        else:
+          subprocess.run(["git", "-C", str(repo_cache_path), "fetch", "--depth", "1", "origin", branch], check=True)
+          subprocess.run(["git", "-C", str(repo_cache_path), "reset", "--hard", "FETCH_HEAD"], check=True)
+        _synced_repos.add(str(repo_cache_path))
+        self.cache_index.touch(repo_cache_path)
+      else:
+        self.cache_index.touch(repo_cache_path)
+
+      if _is_bare_repo(repo_cache_path):
+        return self._read_git_blob(repo_cache_path, owner, repo, branch, file_path, binary)
 
-    # Read the requested file
-    file_full_path = repo_cache_path / file_path
-    if not file_full_path.exists():
+      # Checkouts made by earlier versions: read the requested file, widening
+      # the sparse checkout to its folder if needed
+      file_full_path = repo_cache_path / file_path
+      if not file_full_path.exists() and (repo_cache_path / ".git" / "info" / "sparse-checkout").exists():
+        folder = Path(file_path).parent.as_posix()
+        if folder != ".":
+          self.logger.debug(f"Adding {folder} to the sparse checkout of {repo_cache_path}")
+          subprocess.run(["git", "-C", str(repo_cache_path), "sparse-checkout", "add", folder], check=True)
+      if not file_full_path.exists():
+        raise FileNotFoundError(f"File {file_path} not found in repository {owner}/{repo} on branch {branch}")
+
+      if binary:
+        return file_full_path.open('rb')
+      with file_full_path.open('r') as file:
+        return file.read()
+
+  def _read_git_blob(self, repo_cache_path, owner, repo, branch, file_path, binary=False):
+    """
+    Read a file straight from the object database of a bare cached repo.
+    HEAD (the requested branch or tag) is resolved to a commit once per run
+    and file contents are cached by (commit, path), which never changes.
+    Binary files are streamed from a single `git cat-file blob` process
+    instead and never cached in memory.
+    """
+    reader = git_object_reader(repo_cache_path)
+    key = str(repo_cache_path)
+    commit = _repo_commits.get(key)
+    if commit is None:
+      found = reader.read("HEAD^{commit}")
+      if found is None:
+        raise FileNotFoundError(f"Ref {branch} not found in repository {owner}/{repo}")
+      commit = _repo_commits[key] = found[0]
+
+    if binary:
+      process = subprocess.Popen(
+        ["git", "-C", str(repo_cache_path), "cat-file", "blob", f"{commit}:{file_path}"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+      )
+      # git prints nothing for a missing path or a tree; an empty blob
+      # exits cleanly
+      if not process.stdout.peek(1) and process.wait() != 0:
+        process.stdout.close()
+        raise FileNotFoundError(f"File {file_path} not found in repository {owner}/{repo} on branch {branch}")
+      return _ProcessStream(process)
+
+    cache_key = (commit, file_path)
+    with _memory_cache_lock:
+      content = _git_blob_cache.get(cache_key)
+    if content is not None:
+      return content
+
+    found = reader.read(f"{commit}:{file_path}")
+    if found is None or found[1] != "blob":
       raise FileNotFoundError(f"File {file_path} not found in repository {owner}/{repo} on branch {branch}")
+    content = found[2].decode("utf-8")
+    with _memory_cache_lock:
+      try:
+        _git_blob_cache[cache_key] = content
+      except ValueError:
+        pass
+    return content
 
-    with file_full_path.open('r') as file:
-      return file.read()
+  def _github_archive_path(self, owner, repo, ref):
+    return self.cache_dir / "archives" / f"{owner}_{repo}_{ref}.tar"
+
+  def _archive_tar(self, base_path, meta):
+    # Each download is a new file named in the metadata; archives stored
+    # before that used the base path itself
+    return base_path.parent / meta["tar"] if meta.get("tar") else base_path
 
-  def _github_fetch_with_raw_then_git(self, owner, repo, branch, file_path, use_https=True):
+  def _github_archive(self, owner, repo, ref):
+    """
+    Download the tarball of a repository ref once per run and return
+    (tarball path, {member path: (offset, size)}).
+
+    The archive is stored decompressed so members can be read by seeking to
+    their offset, and its member index is kept in a metadata file next to
+    it. Later runs revalidate it with If-None-Match and reuse it on 304.
+    A changed archive is written to a new file and the metadata switched to
+    it, so other processes keep reading the tarball their index describes.
+    """
+    key = (owner, repo, ref)
+    base_path = self._github_archive_path(owner, repo, ref)
+    meta_path = Path(f"{base_path}.meta.json")
+    with _path_lock(base_path):
+      if key in _github_archives:
+        archive = _github_archives[key]
+        if archive is None:
+          raise requests.ConnectionError(f"Archive of {owner}/{repo}@{ref} is unavailable in this run")
+        return archive
+
+      meta = None
+      try:
+        with meta_path.open('r') as f:
+          meta = json.load(f)
+      except (OSError, ValueError):
+        pass
+      if meta is not None and not self._archive_tar(base_path, meta).exists():
+        meta = None
+
+      try:
+        if is_offline() and meta is None:
+          raise CacheMissError(f"Archive of {owner}/{repo}@{ref} is not in the cache (offline mode)")
+        if os.getenv("STRUCT_DENY_NETWORK") == "1" or is_offline():
+          if meta is None:
+            raise requests.ConnectionError("Network denied by STRUCT_DENY_NETWORK=1 and no cached archive")
+          self.logger.debug(f"Network denied; using cached archive {self._archive_tar(base_path, meta)}")
+        else:
+          meta = self._download_github_archive(owner, repo, ref, base_path, meta_path, meta)
+        tar_path = self._archive_tar(base_path, meta)
+        members = {path: tuple(location) for path, location in meta["members"].items()}
+      except Exception:
+        # Do not retry the download for every file of the repository;
+        # the next run tries again
+        _github_archives[key] = None
+        raise
+
+      archive = _github_archives[key] = (tar_path, members)
+      self.cache_index.touch(tar_path)
+      return archive
+
+  def _download_github_archive(self, owner, repo, ref, base_path, meta_path, meta):
+    url = f"https://codeload.github.com/{owner}/{repo}/tar.gz/{ref}"
+    headers = {"If-None-Match": meta["etag"]} if meta and meta.get("etag") else {}
+    timeout = float(os.getenv("STRUCT_HTTP_TIMEOUT", "10"))
+    self.logger.debug(f"Downloading repository archive: {url}")
+    response = http_session().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+      if meta is not None and response.status_code == 304:
+        self.logger.debug(f"Repository archive unchanged (304): {url}")
+        return meta
+      response.raise_for_status()
+
+      # Decompress while downloading; only the plain tar is kept, under a
+      # name of its own that is never overwritten
+      base_path.parent.mkdir(parents=True, exist_ok=True)
+      fd, tmp = tempfile.mkstemp(dir=base_path.parent, prefix=f"{base_path.stem}.", suffix=".tar")
+      tar_path = Path(tmp)
+      try:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        with os.fdopen(fd, 'wb') as f:
+          for chunk in response.iter_content(chunk_size=1024 * 1024):
+            f.write(decompressor.decompress(chunk))
+          f.write(decompressor.flush())
+        members, commit = self._index_archive(tar_path)
+      except BaseException:
+        tar_path.unlink(missing_ok=True)
+        raise
+    finally:
+      response.close()
+
+    previous = self._archive_tar(base_path, meta).name if meta else None
+    new_meta = {
+      "url": url, "etag": response.headers.get("ETag"), "commit": commit,
+      "tar": tar_path.name, "previous": previous, "members": members,
+    }
+    fd, tmp = tempfile.mkstemp(dir=base_path.parent, suffix=".json")
+    with os.fdopen(fd, 'w') as f:
+      json.dump(new_meta, f)
+    os.replace(tmp, meta_path)
+    self.cache_index.record(tar_path, "archive")
+    # Processes that loaded the previous index may still read the previous
+    # tarball; the one before it is no longer referenced
+    if meta and meta.get("previous"):
+      self.cache_index.remove(base_path.parent / meta["previous"])
+    return new_meta
+
+  def _index_archive(self, tar_path):
+    """
+    Return ({member path: (offset, size)}, commit) for a plain tarball.
+    Symbolic and hard links to files in the archive are served as their
+    target; other links are skipped.
+    """
+    members = {}
+    links = {}
+    with tarfile.open(tar_path) as tf:
+      commit = tf.pax_headers.get("comment")
+      for member in tf:
+        # Members live under a single "<repo>-<ref>/" folder
+        _, _, path = member.name.partition("/")
+        if member.isfile():
+          members[path] = (member.offset_data, member.size)
+        elif member.issym():
+          links[path] = posixpath.normpath(posixpath.join(posixpath.dirname(path), member.linkname))
+        elif member.islnk():
+          links[path] = member.linkname.partition("/")[2]
+    for path, target in links.items():
+      seen = {path}
+      while target in links and target not in seen:
+        seen.add(target)
+        target = links[target]
+      if target in members:
+        members[path] = members[target]
+      else:
+        self.logger.debug(f"Skipping link {path} in {tar_path}: {target} is not a file in the archive")
+    return members, commit
+
+  def _read_github_archive_file(self, owner, repo, ref, file_path, binary=False):
+    tar_path, members = self._github_archive(owner, repo, ref)
+    location = members.get(file_path)
+    if location is None:
+      raise FileNotFoundError(f"File {file_path} not found in repository {owner}/{repo} on branch {ref}")
+    offset, size = location
+    if binary:
+      return FileSlice(tar_path, offset, size)
+    with tar_path.open('rb') as f:
+      f.seek(offset)
+      return f.read(size).decode("utf-8")
+
+  def _github_fetch_offline(self, owner, repo, branch, file_path, binary=False):
+    """Serve a GitHub file from whichever cache holds it: archive, repo or raw fetch."""
+    if Path(f"{self._github_archive_path(owner, repo, branch)}.meta.json").exists():
+      return self._read_github_archive_file(owner, repo, branch, file_path, binary)
+    if (self.cache_dir / f"{owner}_{repo}_{branch}").exists():
+      return self._clone_or_fetch_github(owner, repo, branch, file_path, binary=binary)
+    raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{file_path}"
+    try:
+      if binary:
+        return self._cached_http_download(raw_url).open('rb')
+      return self._cached_http_get(raw_url)
+    except CacheMissError:
+      raise CacheMissError(f"GitHub file {owner}/{repo}/{branch}/{file_path} is not in the cache (offline mode)")
+
+  def _github_fetch_with_raw_then_git(self, owner, repo, branch, file_path, use_https=True, archive=None, binary=False):
     """
     Try lightweight fetch via raw.githubusercontent.com first. If it fails
     (network disabled, HTTP error, etc.), fall back to git clone/pull.
     If a local cache repo exists already, prefer using git path directly
     to avoid surprise network requests.
+
+    In archive mode (githubarchive:// or STRUCT_GITHUB_ARCHIVE=1) every file
+    is served from one download of the repository tarball instead, falling
+    back to the above if the archive cannot be downloaded.
     """
+    if is_offline():
+      return self._github_fetch_offline(owner, repo, branch, file_path, binary)
+
+    if archive is None:
+      archive = os.getenv("STRUCT_GITHUB_ARCHIVE") == "1"
+    if archive:
+      try:
+        return self._read_github_archive_file(owner, repo, branch, file_path, binary)
+      except (requests.RequestException, OSError, tarfile.TarError, zlib.error, KeyError, ValueError) as e:
+        if isinstance(e, FileNotFoundError):
+          raise
+        self.logger.warning(f"GitHub archive fetch failed, fetching files one by one. Error: {e}")
+
     # Deny network option
     if os.getenv("STRUCT_DENY_NETWORK") == "1":
       self.logger.debug("Network denied by STRUCT_DENY_NETWORK=1; using git fallback if available")
-      return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https)
+      return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https, binary=binary)
 
     repo_cache_path = self.cache_dir / f"{owner}_{repo}_{branch}"
     if repo_cache_path.exists():
       # Keep existing behavior: use git path if cache exists
-      return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https)
+      return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https, binary=binary)
 
     # Attempt raw fetch
     raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{file_path}"
@@ -172,22 +1208,74 @@ class ContentFetcher:
     for attempt in range(retries + 1):
       try:
         self.logger.debug(f"Attempting raw fetch: {raw_url} (attempt {attempt+1}/{retries+1})")
-        resp = requests.get(raw_url, timeout=timeout)
-        resp.raise_for_status()
-        return resp.text
+        if binary:
+          return self._cached_http_download(raw_url, timeout=timeout).open('rb')
+        return self._cached_http_get(raw_url, timeout=timeout)
       except Exception as e:
         last_err = e
         # simple backoff
-        try:
-          import time
-          time.sleep(min(2 ** attempt, 5))
-        except Exception:
-          pass
+        time.sleep(min(2 ** attempt, 5))
 
     self.logger.warning(f"Raw GitHub fetch failed, falling back to git. Last error: {last_err}")
-    return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https)
+    return self._clone_or_fetch_github(owner, repo, branch, file_path, https=use_https, binary=binary)
 
-  def _fetch_s3_file(self, s3_path):
+  def _object_cache_dir(self, scheme, bucket_name, key):
+    """
+    Cache folder of an object, holding one file per ETag or generation, so
+    keys sharing a basename never collide and a changed object never
+    overwrites an older entry.
+    """
+    return self.cache_dir / scheme / hashlib.sha256(f"{bucket_name}/{key}".encode()).hexdigest()
+
+  def _latest_cached_object(self, folder):
+    if not folder.is_dir():
+      return None
+    versions = [p for p in folder.iterdir() if p.is_file() and not p.name.startswith(".")]
+    return max(versions, key=lambda p: p.stat().st_mtime, default=None)
+
+  def _cached_object(self, scheme, bucket_name, key, check, download, binary=False):
+    """
+    Return the text of an object through the cache, or a binary stream
+    over the cached file with binary=True.
+
+    check() returns the current version (ETag or generation) of the object
+    and is called at most once per object and run; download(path) writes
+    that version to path. Only changed objects are downloaded. With
+    STRUCT_DENY_NETWORK=1 or offline the newest cached version is served.
+    """
+    memo_key = (scheme, bucket_name, key)
+    folder = self._object_cache_dir(scheme, bucket_name, key)
+    local_path = _object_versions.get(memo_key)
+    if local_path is None and (os.getenv("STRUCT_DENY_NETWORK") == "1" or is_offline()):
+      local_path = self._latest_cached_object(folder)
+      if local_path is None and is_offline():
+        raise CacheMissError(f"{scheme}://{bucket_name}/{key} is not in the cache (offline mode)")
+    if local_path is None:
+      version = check()
+      local_path = folder / re.sub(r"[^A-Za-z0-9_.-]", "_", str(version))
+      with _path_lock(local_path):
+        if local_path.exists():
+          self.logger.debug(f"{scheme} object unchanged, using cache: {local_path}")
+        else:
+          local_path.parent.mkdir(parents=True, exist_ok=True)
+          fd, tmp = tempfile.mkstemp(dir=local_path.parent, prefix=".")
+          os.close(fd)
+          try:
+            download(tmp)
+            os.replace(tmp, local_path)
+          finally:
+            Path(tmp).unlink(missing_ok=True)
+          self.logger.debug(f"Downloaded {scheme} object to: {local_path}")
+          self.cache_index.record(local_path, scheme, checksum=file_checksum(local_path))
+      _object_versions[memo_key] = local_path
+
+    self.cache_index.touch(local_path)
+    if binary:
+      return local_path.open('rb')
+    with local_path.open('r') as file:
+      return file.read()
+
+  def _fetch_s3_file(self, s3_path, binary=False):
     """
     Fetch a file from an S3 bucket.
     Dispatcher passes: bucket_name/key
@@ -201,26 +1289,40 @@ class ContentFetcher:
       raise ValueError("Invalid S3 path. Expected bucket_name/key")
 
     bucket_name, key = match.groups()
-    local_file_path = self.cache_dir / Path(key).name
+    head = {}
+
+    def check():
+      head.update(s3_client().head_object(Bucket=bucket_name, Key=key))
+      return head["ETag"].strip('"')
+
+    def download(path):
+      # The IfMatch condition makes sure every read belongs to the version
+      # checked above
+      client = s3_client()
+      size = head.get("ContentLength", 0)
+      if size > _large_object_threshold():
+        def read_range(start, end):
+          response = client.get_object(Bucket=bucket_name, Key=key, IfMatch=head["ETag"], Range=f"bytes={start}-{end}")
+          return response["Body"].iter_chunks()
+        _ranged_download(path, size, read_range)
+      else:
+        response = client.get_object(Bucket=bucket_name, Key=key, IfMatch=head["ETag"])
+        with open(path, 'wb') as f:
+          for data in response["Body"].iter_chunks():
+            f.write(data)
 
     try:
-      session = boto3.Session()  # Create a new session
-      s3_client = session.client("s3")
-      s3_client.download_file(bucket_name, key, str(local_file_path))
-      self.logger.debug(f"Downloaded S3 file to: {local_file_path}")
+      return self._cached_object("s3", bucket_name, key, check, download, binary)
     except NoCredentialsError:
       raise RuntimeError("AWS credentials not found. Ensure that your credentials are configured properly.")
     except ClientError as e:
       error_code = e.response.get("Error", {}).get("Code")
-      if error_code == "404":
+      if error_code in ("404", "NoSuchKey"):
         raise FileNotFoundError(f"The specified S3 key does not exist: {key}")
       else:
         raise RuntimeError(f"Failed to download S3 file: {e}")
 
-    with local_file_path.open('r') as file:
-      return file.read()
-
-  def _fetch_gcs_file(self, gcs_path):
+  def _fetch_gcs_file(self, gcs_path, binary=False):
     """
     Fetch a file from Google Cloud Storage.
     Dispatcher passes: bucket_name/key
@@ -234,16 +1336,25 @@ class ContentFetcher:
       raise ValueError("Invalid GCS path. Expected bucket_name/key")
 
     bucket_name, key = match.groups()
-    local_file_path = self.cache_dir / Path(key).name
+    blobs = []
+
+    def check():
+      blob = gcs_client().bucket(bucket_name).get_blob(key)
+      if blob is None:
+        raise FileNotFoundError(f"The specified GCS key does not exist: {key}")
+      blobs.append(blob)
+      return blob.generation
+
+    def download(path):
+      blob = blobs[0]
+      if (blob.size or 0) > _large_object_threshold():
+        def read_range(start, end):
+          return [blob.download_as_bytes(start=start, end=end, if_generation_match=blob.generation)]
+        _ranged_download(path, blob.size, read_range)
+      else:
+        blob.download_to_filename(path, if_generation_match=blob.generation)
 
     try:
-      gcs_client = storage.Client()
-      bucket = gcs_client.bucket(bucket_name)
-      blob = bucket.blob(key)
-      blob.download_to_filename(str(local_file_path))
-      self.logger.debug(f"Downloaded GCS file to: {local_file_path}")
+      return self._cached_object("gcs", bucket_name, key, check, download, binary)
     except GoogleAPIError as e:
       raise RuntimeError(f"Failed to download GCS file: {e}")
-
-    with local_file_path.open('r') as file:
-      return file.read()
@@ -3,42 +3,55 @@ import requests
 import os
 import shutil
 import logging
+import threading
 import time
+from collections import ChainMap
 from dotenv import load_dotenv
 from struct_module.template_renderer import TemplateRenderer
-from struct_module.content_fetcher import ContentFetcher
+from struct_module.content_fetcher import STREAM_CHUNK_SIZE, CacheMissError, ContentFetcher, is_binary_source, looks_binary
 from struct_module.model_wrapper import ModelWrapper
 
 load_dotenv()
 
 class FileItem:
-    def __init__(self, properties):
+    def __init__(self, properties, context=None):
       self.logger = logging.getLogger(__name__)
       self.name = properties.get("name")
       self.file_directory = self._get_file_directory()
       self.content = properties.get("content")
       self.config_variables = properties.get("config_variables")
       self.content_location = properties.get("file")
+      # raw content (or fetch error) already downloaded by a prefetch stage;
+      # a callable opens a binary source
+      self.prefetched_content = properties.get("prefetched_content")
+      # Binary sources (binary: true, a known binary extension or content
+      # with NUL bytes) are streamed to the destination, never rendered
+      self._binary_flag = properties.get("binary")
+      self.binary = bool(self.content_location) and (callable(self.prefetched_content) or is_binary_source(properties))
       self.permissions = properties.get("permissions")
       self.input_store = properties.get("input_store")
       self.non_interactive = properties.get("non_interactive")
       self.skip = properties.get("skip", False)
       self.skip_if_exists = properties.get("skip_if_exists", False)
 
-      self.content_fetcher = ContentFetcher()
-
       self.system_prompt = properties.get("system_prompt") or properties.get("global_system_prompt")
       self.user_prompt = properties.get("user_prompt")
       self.mappings = properties.get("mappings", {})
 
-      self.model_wrapper = ModelWrapper(self.logger)
-
-      self.template_renderer = TemplateRenderer(
-          self.config_variables,
-          self.input_store,
-          self.non_interactive,
-          self.mappings
-      )
+      if context is not None:
+        # Reuse the run-wide fetcher, model and renderer
+        self.content_fetcher = context.content_fetcher
+        self.model_wrapper = context.model_wrapper
+        self.template_renderer = context.renderer_for(self.config_variables)
+      else:
+        self.content_fetcher = ContentFetcher()
+        self.model_wrapper = ModelWrapper(self.logger)
+        self.template_renderer = TemplateRenderer(
+            self.config_variables,
+            self.input_store,
+            self.non_interactive,
+            self.mappings
+        )
       # internal flags used for reporting
       self._last_action = None
 
@@ -71,8 +84,19 @@ class FileItem:
       if self.content_location:
         self.logger.debug(f"Fetching content from: {self.content_location}")
         try:
-          raw_content = self.content_fetcher.fetch_content(
-              self.content_location)
+          if isinstance(self.prefetched_content, Exception):
+            raise self.prefetched_content
+          if self.binary:
+            self._fetch_binary()
+            return
+          if self.prefetched_content is not None:
+            raw_content = self.prefetched_content
+          else:
+            raw_content = self.content_fetcher.fetch_content(
+                self.content_location)
+          if self._binary_flag is None and isinstance(raw_content, str) and looks_binary(raw_content):
+            self._fetch_binary()
+            return
           self.logger.debug(f"Fetched content: {raw_content}")
           # Render the fetched content using the template renderer
           template_vars = self._merge_default_template_vars(
@@ -83,21 +107,47 @@ class FileItem:
           self.content = self.template_renderer.render_template(
               raw_content, template_vars)
           self.logger.debug(f"Rendered content: {self.content}")
+        except UnicodeDecodeError as e:
+          if self._binary_flag is None:
+            self._fetch_binary()
+          else:
+            self.logger.error(f"❗ Failed to fetch content from {self.content_location}: {e}")
+        except CacheMissError:
+          # Offline and not cached: the whole run has to stop
+          raise
         except Exception as e:
           self.logger.error(f"❗ Failed to fetch content from {self.content_location}: {e}")
 
-    def _merge_default_template_vars(self, template_vars):
-      default_vars = {
+    def _fetch_binary(self):
+      """Download a binary source to the cache; create() streams it from there."""
+      self.binary = True
+      if not callable(self.prefetched_content):
+        try:
+          self.prefetched_content = self.content_fetcher.binary_opener(self.content_location)
+        except Exception as e:
+          self.prefetched_content = None
+          self.logger.error(f"❗ Failed to fetch content from {self.content_location}: {e}")
+
+    def _default_template_vars(self):
+      return {
         "file_name": self.name,
         "file_directory": self.file_directory,
       }
+
+    def _merge_default_template_vars(self, template_vars):
+      default_vars = self._default_template_vars()
       if not template_vars:
         return default_vars
       return {**default_vars, **template_vars}
 
     def apply_template_variables(self, template_vars):
-      vars = self._merge_default_template_vars(template_vars)
+      # File layer (answers to prompts) over structure vars over defaults;
+      # the structure's variables are shared, never copied per file
+      vars = ChainMap({}, template_vars or {}, self._default_template_vars())
       self.logger.debug(f"Applying template variables: {vars}")
+      if self.binary:
+        self.vars = vars
+        return
 
       missing_vars = self.template_renderer.prompt_for_missing_vars(self.content, vars)
       vars.update(missing_vars)
@@ -130,6 +180,10 @@ class FileItem:
         result["action"] = "skipped"
         return result
 
+      if self.binary and not callable(self.prefetched_content):
+        self.logger.error(f"❗ Nothing to write to {file_path}: {self.content_location} could not be fetched")
+        return result
+
       # Create the directory if it does not exist
       os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
@@ -148,8 +202,11 @@ class FileItem:
           result["action"] = "skipped"
           return result
         elif file_strategy == 'append':
-          with open(file_path, 'a') as f:
-              f.write(f"{self.content}\n")
+          if self.binary:
+            self._copy_binary(file_path, 'ab')
+          else:
+            with open(file_path, 'a') as f:
+                f.write(f"{self.content}\n")
           self.logger.info(f"📝 Appended: {file_path}")
           result.update({"action": "appended"})
           return result
@@ -159,20 +216,29 @@ class FileItem:
           renamed_from = new_name
           self.logger.info(f"🔁 Renamed: {file_path} -> {new_name}")
 
+      # Leave identical files alone so mtimes and downstream caches survive
+      if existed_before and file_strategy == 'overwrite' and self._has_same_content(file_path):
+        self.logger.info(f"💤 Unchanged: {file_path}")
+        self._apply_permissions(file_path)
+        result["action"] = "unchanged"
+        return result
+
       # Write/overwrite the file
-      with open(file_path, 'w') as f:
-        f.write(f"{self.content}\n")
+      if self.binary:
+        self._copy_binary(file_path, 'wb')
+      else:
+        with open(file_path, 'w') as f:
+          f.write(f"{self.content}\n")
 
       action = "created" if not existed_before else "updated"
       if action == "created":
         self.logger.info(f"✅ Created: {file_path}")
       else:
         self.logger.info(f"✅ Updated: {file_path}")
-      self.logger.debug(f"Content: \n\n{self.content}")
+      if not self.binary:
+        self.logger.debug(f"Content: \n\n{self.content}")
 
-      if self.permissions:
-        os.chmod(file_path, int(self.permissions, 8))
-        self.logger.info(f"🔐 Set permissions: {self.permissions} on {file_path}")
+      self._apply_permissions(file_path)
 
       result.update({
         "action": action,
@@ -180,3 +246,63 @@ class FileItem:
         "backed_up_to": backed_up_to,
       })
       return result
+
+    def _copy_binary(self, file_path, mode):
+      if mode == 'ab':
+        with self.prefetched_content() as source, open(file_path, mode) as f:
+          shutil.copyfileobj(source, f, STREAM_CHUNK_SIZE)
+        return
+      # Write next to the target and swap it in, so a failed copy never
+      # leaves a truncated file behind
+      try:
+        file_mode = os.stat(file_path).st_mode & 0o7777
+      except FileNotFoundError:
+        file_mode = None
+      tmp = os.path.join(os.path.dirname(file_path),
+                         f".{os.path.basename(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+      fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+      try:
+        with os.fdopen(fd, 'wb') as f, self.prefetched_content() as source:
+          shutil.copyfileobj(source, f, STREAM_CHUNK_SIZE)
+        if file_mode is not None:
+          os.chmod(tmp, file_mode)
+        os.replace(tmp, file_path)
+      except BaseException:
+        if os.path.exists(tmp):
+          os.unlink(tmp)
+        raise
+
+    def _has_same_content(self, file_path):
+      """Cheap identity check: compare sizes first, then bytes."""
+      if self.binary:
+        return self._has_same_bytes(file_path)
+      new_bytes = f"{self.content}\n".encode()
+      try:
+        if os.path.getsize(file_path) != len(new_bytes):
+          return False
+        with open(file_path, 'rb') as f:
+          return f.read() == new_bytes
+      except OSError:
+        return False
+
+    def _has_same_bytes(self, file_path):
+      """Compare a binary source with an existing file chunk by chunk."""
+      try:
+        with self.prefetched_content() as source, open(file_path, 'rb') as f:
+          while True:
+            new_chunk = source.read(STREAM_CHUNK_SIZE)
+            if new_chunk != f.read(len(new_chunk) or 1):
+              return False
+            if not new_chunk:
+              return True
+      except OSError:
+        return False
+
+    def _apply_permissions(self, file_path):
+      if not self.permissions:
+        return
+      mode = int(self.permissions, 8)
+      if (os.stat(file_path).st_mode & 0o7777) == mode:
+        return
+      os.chmod(file_path, mode)
+      self.logger.info(f"🔐 Set permissions: {self.permissions} on {file_path}")
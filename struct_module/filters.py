@@ -1,6 +1,7 @@
 import os
 import re
 import json
+import tempfile
 from uuid import uuid4
 from datetime import datetime, timezone
 from typing import Any
@@ -9,10 +10,73 @@ import yaml
 from github import Github
 from cachetools import TTLCache, cached
 
+from struct_module.content_fetcher import CacheMissError, is_offline
+from struct_module.mappings_store import to_plain
+
 cache = TTLCache(maxsize=100, ttl=600)
 
+LOOKUPS_FILE = os.path.join("~", ".struct", "cache", "lookups.json")
+
+# Lookups shipped in a structure bundle, answered before the cache or network
+_bundled = {}
+
+
+def use_bundled_lookups(lookups):
+    """Serve lookups from a bundle index; pass None to stop."""
+    _bundled.clear()
+    _bundled.update(lookups or {})
+
+
+def _lookups_path():
+    return os.path.expanduser(os.environ.get("STRUCT_LOOKUPS_FILE") or LOOKUPS_FILE)
+
+
+def _read_lookups():
+    try:
+        with open(_lookups_path(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _remember_lookup(key, value):
+    """Persist a successful lookup so offline runs can resolve it."""
+    path = _lookups_path()
+    lookups = _read_lookups()
+    if lookups.get(key) == value:
+        return
+    lookups[key] = value
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(lookups, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _lookup(kind, repo_name, resolve):
+    key = f"{kind}:{repo_name}"
+    if key in _bundled:
+        return _bundled[key]
+    if is_offline():
+        value = _read_lookups().get(key)
+        if value is None:
+            raise CacheMissError(f"{kind} of {repo_name} is not in the cache (offline mode)")
+        return value
+    value = resolve()
+    if not value.endswith("_ERROR"):
+        _remember_lookup(key, value)
+    return value
+
+
 @cached(cache)
 def get_latest_release(repo_name):
+    return _lookup("latest_release", repo_name, lambda: _latest_release(repo_name))
+
+
+def _latest_release(repo_name):
     token = os.getenv('GITHUB_TOKEN')
 
     # Use the token if available, otherwise proceed without authentication
@@ -37,6 +101,10 @@ def get_latest_release(repo_name):
 
 @cached(cache)
 def get_default_branch(repo_name):
+    return _lookup("default_branch", repo_name, lambda: _default_branch(repo_name))
+
+
+def _default_branch(repo_name):
     token = os.getenv('GITHUB_TOKEN')
 
     if token:
@@ -86,7 +154,7 @@ def read_file(path: str, encoding: str = "utf-8") -> str:
 
 def to_yaml(obj: Any) -> str:
     try:
-        return yaml.safe_dump(obj, sort_keys=False)
+        return yaml.safe_dump(to_plain(obj), sort_keys=False)
     except Exception:
         return ""
 
@@ -100,7 +168,7 @@ def from_yaml(s: str) -> Any:
 
 def to_json(obj: Any, indent: int | None = None) -> str:
     try:
-        return json.dumps(obj, indent=indent)
+        return json.dumps(to_plain(obj), indent=indent)
     except Exception:
         return ""
 
@@ -0,0 +1,40 @@
+# FILE: struct_module/generation_context.py
+import logging
+import threading
+
+from struct_module.content_fetcher import ContentFetcher
+from struct_module.model_wrapper import ModelWrapper
+from struct_module.template_renderer import TemplateRenderer
+
+
+class GenerationContext:
+  """
+  Objects shared by every FileItem of a generation run.
+
+  Holds one ContentFetcher, one ModelWrapper (whose Agent is only built
+  when a prompt is used) and one TemplateRenderer. Structures with their
+  own variables get a renderer view that reuses the same Jinja environment
+  and input store.
+  """
+  def __init__(self, input_store, non_interactive, mappings=None, cache_dir=None):
+    self.logger = logging.getLogger(__name__)
+    self.mappings = mappings or {}
+    self.input_store = input_store
+    self.non_interactive = non_interactive
+    self.content_fetcher = ContentFetcher(cache_dir)
+    self.model_wrapper = ModelWrapper()
+    self.template_renderer = TemplateRenderer([], input_store, non_interactive, self.mappings)
+    # id(config_variables) -> (config_variables, renderer); the list is kept
+    # alive so its id cannot be reused while cached
+    self._renderers = {}
+    self._lock = threading.Lock()
+
+  def renderer_for(self, config_variables):
+    config_variables = config_variables or []
+    key = id(config_variables)
+    with self._lock:
+      cached = self._renderers.get(key)
+      if cached is None:
+        cached = (config_variables, self.template_renderer.for_config_variables(config_variables))
+        self._renderers[key] = cached
+    return cached[1]
@@ -1,11 +1,20 @@
 import json
 import os
+import stat
+import tempfile
+
+try:
+  import fcntl
+except ImportError:  # Windows
+  fcntl = None
 
 class InputStore:
 
   def __init__(self, input_file):
     self.input_file = input_file
     self.data = None
+    # Keys set by this process; save() only writes these over the file
+    self._changed = set()
 
     # create directory if it doesn't exist
     directory = os.path.dirname(input_file)
@@ -29,7 +38,35 @@ class InputStore:
 
   def set_value(self, key, value):
     self.data[key] = value
+    self._changed.add(key)
 
   def save(self):
-    with open(self.input_file, 'w') as f:
-      json.dump(self.data, f, indent=2)
+    # Concurrent generate-batch workers share the store: under an exclusive
+    # lock, re-read it and apply only the keys set here, so answers saved by
+    # another process since load() are kept. The merged store is written to
+    # a temporary file and swapped in, so readers never see a partial file.
+    with open(f"{self.input_file}.lock", 'a') as lock:
+      if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+      try:
+        mode = stat.S_IMODE(os.stat(self.input_file).st_mode)
+        with open(self.input_file, 'r') as f:
+          current = json.load(f)
+      except FileNotFoundError:
+        current, mode = {}, None
+      except ValueError:
+        current = {}
+      current.update({key: self.data[key] for key in self._changed if key in self.data})
+      fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.input_file) or '.')
+      try:
+        with os.fdopen(fd, 'w') as f:
+          json.dump(current, f, indent=2)
+        # mkstemp creates 0600 files; keep the mode the store already had
+        if mode is not None:
+          os.chmod(tmp, mode)
+        os.replace(tmp, self.input_file)
+      except BaseException:
+        os.unlink(tmp)
+        raise
+    self.data.update(current)
+    self._changed.clear()
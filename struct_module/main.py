@@ -4,6 +4,9 @@ import os
 from dotenv import load_dotenv
 from struct_module.utils import read_config_file, merge_configs
 from struct_module.commands.generate import GenerateCommand
+from struct_module.commands.generate_batch import GenerateBatchCommand
+from struct_module.commands.fetch import FetchCommand
+from struct_module.commands.bundle import BundleCommand
 from struct_module.commands.info import InfoCommand
 from struct_module.commands.validate import ValidateCommand
 from struct_module.commands.list import ListCommand
@@ -32,6 +35,9 @@ def get_parser():
     InfoCommand(subparsers.add_parser('info', help='Show information about the package'))
     ValidateCommand(subparsers.add_parser('validate', help='Validate the YAML configuration file'))
     GenerateCommand(subparsers.add_parser('generate', help='Generate the project structure'))
+    GenerateBatchCommand(subparsers.add_parser('generate-batch', help='Generate many structures from a batch file in one process'))
+    FetchCommand(subparsers.add_parser('fetch', help='Download remote sources into the cache for offline generation'))
+    BundleCommand(subparsers.add_parser('bundle', help='Pack a structure and all its sources into one archive'))
     ListCommand(subparsers.add_parser('list', help='List available structures'))
     GenerateSchemaCommand(subparsers.add_parser('generate-schema', help='Generate JSON schema for available structures'))
     MCPCommand(subparsers.add_parser('mcp', help='MCP (Model Context Protocol) support'))
@@ -40,6 +46,10 @@ def get_parser():
     from struct_module.commands.init import InitCommand
     InitCommand(subparsers.add_parser('init', help='Initialize a basic .struct.yaml in the target directory'))
 
+    # cache management
+    from struct_module.commands.cache import CacheCommand
+    CacheCommand(subparsers.add_parser('cache', help='Inspect and manage the cache of fetched remote content'))
+
     # completion manager
     from struct_module.commands.completion import CompletionCommand
     CompletionCommand(subparsers.add_parser('completion', help='Manage shell completions'))
@@ -0,0 +1,108 @@
+# FILE: struct_module/manifest.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+MANIFEST_DIR = ".struct"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+  return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+  return hash_bytes((text or "").encode("utf-8"))
+
+
+def hash_obj(obj):
+  """Stable hash of any JSON-like object (dict key order does not matter)."""
+  return hash_text(json.dumps(obj, sort_keys=True, default=str))
+
+
+def hash_stream(stream, chunk_size=1024 * 1024):
+  digest = hashlib.sha256()
+  for chunk in iter(lambda: stream.read(chunk_size), b""):
+    digest.update(chunk)
+  return digest.hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+  with open(path, 'rb') as f:
+    return hash_stream(f, chunk_size)
+
+
+class GenerationManifest:
+  """
+  Record of the files produced by a previous `struct generate` run.
+
+  Stored in <base_path>/.struct/manifest.json. Each entry maps a file key
+  to the rendered output path, the hash and size of the written content and
+  the hashes of the inputs (template, vars, mappings, fetched source) that
+  produced it.
+  """
+  def __init__(self, base_path):
+    self.logger = logging.getLogger(__name__)
+    self.base_path = base_path
+    self.path = os.path.join(base_path, MANIFEST_DIR, MANIFEST_FILE)
+    self.previous = {}
+    self.entries = {}
+    self._lock = threading.Lock()
+
+  def load(self):
+    try:
+      with open(self.path, 'r') as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return self
+    except (OSError, ValueError) as e:
+      self.logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+      return self
+    if data.get("version") == MANIFEST_VERSION:
+      self.previous = data.get("files", {})
+    return self
+
+  def is_unchanged(self, key, input_hash):
+    """
+    True when the previous run produced this key from the same inputs and
+    the file on disk still holds exactly what was written.
+    """
+    entry = self.previous.get(key)
+    if not entry or entry.get("input_hash") != input_hash:
+      return False
+    output = os.path.join(self.base_path, entry.get("path", ""))
+    try:
+      if os.path.getsize(output) != entry.get("size"):
+        return False
+      return hash_file(output) == entry.get("content_hash")
+    except OSError:
+      return False
+
+  def keep(self, key):
+    with self._lock:
+      self.entries[key] = self.previous[key]
+
+  def record(self, key, output_path, input_hash, inputs):
+    entry = {
+      "path": os.path.relpath(output_path, self.base_path),
+      "size": os.path.getsize(output_path),
+      "content_hash": hash_file(output_path),
+      "input_hash": input_hash,
+      "inputs": inputs,
+    }
+    with self._lock:
+      self.entries[key] = entry
+
+  def save(self):
+    directory = os.path.dirname(self.path)
+    os.makedirs(directory, exist_ok=True)
+    data = {"version": MANIFEST_VERSION, "files": self.entries}
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'w') as f:
+      json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, self.path)
+    self.logger.debug(f"Wrote manifest with {len(self.entries)} entries: {self.path}")
@@ -0,0 +1,365 @@
+# FILE: struct_module/mappings_store.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+import yaml
+
+from struct_module.cache_index import record_cached, touch_cached
+from struct_module.structure_loader import parse_yaml
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+
+# (realpath, (mtime_ns, size), index dir) -> root LazyMapping, so batch targets and
+# repeated loads in one process share a single connection. Entries for an
+# older version of a file are closed when it is reopened, and close_mappings()
+# closes the rest at the end of a run.
+_open_indexes = {}
+_open_lock = threading.Lock()
+
+
+def _index_dir():
+  return Path(os.getenv("STRUCT_MAPPINGS_INDEX_DIR") or os.path.expanduser("~/.struct/cache/mappings"))
+
+
+def _encode_path(path):
+  return json.dumps(list(path), default=str)
+
+
+def _encode_value(value):
+  """
+  Return (format, text) for a node value: JSON when it represents the
+  value exactly, else YAML, which round-trips everything the safe loader
+  produces (dates, non-string keys).
+  """
+  try:
+    text = json.dumps(value)
+    if json.loads(text) == value:
+      return "json", text
+  except (TypeError, ValueError):
+    pass
+  return "yaml", yaml.safe_dump(value)
+
+
+def _decode_value(fmt, text):
+  return json.loads(text) if fmt == "json" else parse_yaml(text)
+
+
+def _index_rows(data):
+  """Yield one (path, kind, format, value) row per node of the parsed mappings tree."""
+  stack = [((), data)]
+  while stack:
+    path, node = stack.pop()
+    if isinstance(node, dict):
+      yield (_encode_path(path), "map", *_encode_value(list(node.keys())))
+      stack.extend((path + (key,), value) for key, value in node.items())
+    else:
+      yield (_encode_path(path), "value", *_encode_value(node))
+
+
+class MappingsIndex:
+  """
+  SQLite index of a single mappings YAML file.
+
+  Every mapping node is stored as its list of keys and every other value as
+  a leaf, both addressed by their key path and encoded as JSON or YAML, so
+  reading the index never executes code. The index lives under
+  STRUCT_MAPPINGS_INDEX_DIR (default ~/.struct/cache/mappings) and is
+  rebuilt only when the source file's mtime or size changes.
+  """
+  def __init__(self, source_path, index_dir=None):
+    self.source_path = os.path.realpath(source_path)
+    self.index_dir = Path(index_dir) if index_dir else _index_dir()
+    self.path = self.index_dir / f"{hashlib.sha256(self.source_path.encode()).hexdigest()}.sqlite"
+    self.fingerprint = None
+    self._conn = None
+    self._lock = threading.Lock()
+    self._resolved = {}
+
+  def _signature(self):
+    st = os.stat(self.source_path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+  def _read_meta(self):
+    try:
+      conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+    except sqlite3.Error:
+      return {}
+    try:
+      return dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+      return {}
+    finally:
+      conn.close()
+
+  def _build(self, signature):
+    logger.info(f"Indexing mappings file: {self.source_path}")
+    with open(self.source_path, 'rb') as f:
+      raw = f.read()
+    data = parse_yaml(raw) or {}
+    if not isinstance(data, dict):
+      raise ValueError("A mappings file must contain a mapping at the top level.")
+
+    self.index_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=self.index_dir, suffix=".sqlite")
+    os.close(fd)
+    conn = sqlite3.connect(tmp)
+    try:
+      conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+      conn.execute("CREATE TABLE nodes (path TEXT PRIMARY KEY, kind TEXT NOT NULL, format TEXT NOT NULL, value TEXT NOT NULL) WITHOUT ROWID")
+      conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?)", _index_rows(data))
+      conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", str(INDEX_VERSION)),
+        ("source", self.source_path),
+        ("signature", signature),
+        ("fingerprint", hashlib.sha256(raw).hexdigest()),
+      ])
+      conn.commit()
+    finally:
+      conn.close()
+    os.replace(tmp, self.path)
+
+  def open(self):
+    """Build the index if it is missing or stale and return the root view."""
+    signature = self._signature()
+    meta = self._read_meta()
+    if meta.get("version") != str(INDEX_VERSION) or meta.get("signature") != signature:
+      self._build(signature)
+      record_cached(self.path, "mappings")
+      meta = self._read_meta()
+    else:
+      logger.debug(f"Reusing mappings index: {self.path}")
+      touch_cached(self.path)
+    self.fingerprint = meta.get("fingerprint")
+    self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+    return self.resolve(())
+
+  def close(self):
+    with self._lock:
+      if self._conn is not None:
+        self._conn.close()
+        self._conn = None
+      self._resolved = {}
+
+  def resolve(self, path):
+    """Return the value at path: a LazyMapping for mappings, else the leaf."""
+    with self._lock:
+      if path in self._resolved:
+        return self._resolved[path]
+      row = self._conn.execute("SELECT kind, format, value FROM nodes WHERE path = ?", (_encode_path(path),)).fetchone()
+      if row is None:
+        raise KeyError(path[-1] if path else path)
+      kind, fmt, text = row
+      value = _decode_value(fmt, text)
+      if kind == "map":
+        value = LazyMapping(self, path, value)
+      self._resolved[path] = value
+      return value
+
+
+class LazyMapping(Mapping):
+  """
+  Read-only view of one mapping node of a MappingsIndex.
+
+  Child values are fetched from the index the first time they are looked
+  up, so templates only pay for the keys they actually read.
+  """
+  def __init__(self, index, path, keys):
+    self._index = index
+    self._path = path
+    self._keys = keys
+
+  def __getitem__(self, key):
+    return self._index.resolve(self._path + (key,))
+
+  def __iter__(self):
+    return iter(self._keys)
+
+  def __len__(self):
+    return len(self._keys)
+
+  def __repr__(self):
+    return f"<LazyMapping {self._index.source_path} {list(self._path)}>"
+
+
+class OverlayMapping(Mapping):
+  """
+  Read-only deep merge of several mappings, later layers winning.
+
+  Equivalent to deep merging the layers in order, but nothing is copied up
+  front: a key is resolved by checking the layers from last to first, and a
+  merged view of nested mappings is only built when that key is accessed.
+  """
+  def __init__(self, layers):
+    self._layers = list(layers)
+    self._resolved = {}
+
+  def __getitem__(self, key):
+    try:
+      return self._resolved[key]
+    except KeyError:
+      pass
+
+    # Collect the values for key from the last layer backwards, stopping at
+    # the first one that is not a mapping: it replaces everything before it
+    found = []
+    for layer in reversed(self._layers):
+      if key not in layer:
+        continue
+      value = layer[key]
+      if found and not isinstance(value, Mapping):
+        break
+      found.append(value)
+      if not isinstance(value, Mapping):
+        break
+    if not found:
+      raise KeyError(key)
+
+    value = found[0] if len(found) == 1 else OverlayMapping(reversed(found))
+    self._resolved[key] = value
+    return value
+
+  def __iter__(self):
+    seen = set()
+    for layer in self._layers:
+      for key in layer:
+        if key not in seen:
+          seen.add(key)
+          yield key
+
+  def __len__(self):
+    return sum(1 for _ in self)
+
+  def __repr__(self):
+    return f"<OverlayMapping of {len(self._layers)} layers>"
+
+
+def merge_layers(layers):
+  """Merge mappings layers (later wins) without copying any of them."""
+  layers = [layer for layer in layers if layer]
+  if not layers:
+    return {}
+  if len(layers) == 1:
+    return layers[0]
+  return OverlayMapping(layers)
+
+
+def open_mappings(source_path, index_dir=None):
+  """Return a lazily resolved view of a mappings file, indexing it if needed."""
+  real_path = os.path.realpath(source_path)
+  st = os.stat(real_path)
+  key = (real_path, (st.st_mtime_ns, st.st_size), str(index_dir))
+  with _open_lock:
+    root = _open_indexes.get(key)
+    if root is None:
+      for stale in [k for k in _open_indexes if k[0] == key[0] and k[2] == key[2]]:
+        _open_indexes.pop(stale)._index.close()
+      root = MappingsIndex(real_path, index_dir).open()
+      _open_indexes[key] = root
+  return root
+
+
+def close_mappings():
+  """Close every index opened by open_mappings in this process."""
+  with _open_lock:
+    roots = list(_open_indexes.values())
+    _open_indexes.clear()
+  for root in roots:
+    root._index.close()
+
+
+def mappings_fingerprint(mappings):
+  """
+  Hash of a mappings object for change detection. Indexed layers are
+  hashed by their source file, so an overlay of large catalogs is never
+  loaded just to be hashed; plain layers are hashed by content.
+  """
+  if isinstance(mappings, LazyMapping):
+    key = f"{mappings._index.fingerprint}:{_encode_path(mappings._path)}"
+  elif isinstance(mappings, OverlayMapping):
+    key = "\n".join(mappings_fingerprint(layer) for layer in mappings._layers)
+  else:
+    key = json.dumps(to_plain(mappings or {}), sort_keys=True, default=str)
+  return hashlib.sha256(key.encode()).hexdigest()
+
+
+# sha256 of fetched text -> parsed mappings, shared by batch targets
+_remote_parsed = {}
+
+
+def _write_atomic(path, data):
+  path.parent.mkdir(parents=True, exist_ok=True)
+  fd, tmp = tempfile.mkstemp(dir=path.parent)
+  with os.fdopen(fd, 'wb') as f:
+    f.write(data)
+  os.replace(tmp, path)
+  record_cached(path, "mappings", data)
+
+
+def load_remote_mappings(location, content_fetcher, backend='yaml'):
+  """
+  Load a mappings file from any location ContentFetcher understands.
+
+  The download goes through the fetcher and its cache. The parsed result
+  is then cached by the hash of the fetched text under
+  STRUCT_MAPPINGS_INDEX_DIR/remote: as JSON for the yaml backend, or as a
+  content-addressed copy indexed like a local file for the sqlite backend.
+  An unchanged catalog is never parsed twice; catalogs JSON cannot
+  represent exactly (dates, non-string keys) are only cached in memory.
+  """
+  text = content_fetcher.fetch_content(location)
+  raw = text.encode('utf-8')
+  digest = hashlib.sha256(raw).hexdigest()
+  directory = _index_dir() / "remote"
+
+  if backend == 'sqlite':
+    source = directory / f"{digest}.yaml"
+    if source.exists():
+      touch_cached(source)
+    else:
+      _write_atomic(source, raw)
+    return open_mappings(str(source))
+
+  with _open_lock:
+    if digest in _remote_parsed:
+      return _remote_parsed[digest]
+
+  cache_file = directory / f"{digest}.json"
+  try:
+    with cache_file.open('r') as f:
+      data = json.load(f)
+    if not isinstance(data, dict):
+      raise ValueError("not a mapping")
+    logger.debug(f"Loaded parsed mappings for {location} from cache")
+    touch_cached(cache_file)
+  except (OSError, ValueError):
+    data = parse_yaml(text) or {}
+    if not isinstance(data, Mapping):
+      raise ValueError("A mappings file must contain a mapping at the top level.")
+    try:
+      cached = json.dumps(data)
+      if json.loads(cached) == data:
+        _write_atomic(cache_file, cached.encode('utf-8'))
+    except (OSError, TypeError, ValueError) as e:
+      logger.debug(f"Could not cache parsed mappings for {location}: {e}")
+
+  with _open_lock:
+    _remote_parsed[digest] = data
+  return data
+
+
+def to_plain(obj):
+  """Recursively turn lazy mapping views into plain dicts."""
+  if isinstance(obj, Mapping):
+    return {key: to_plain(value) for key, value in obj.items()}
+  if isinstance(obj, list):
+    return [to_plain(value) for value in obj]
+  return obj
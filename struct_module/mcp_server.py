@@ -138,9 +138,9 @@ class StructMCPServer:
         args.config_file = None
         args.log_file = None
 
-        # If mappings provided, convert to vars string consumed by GenerateCommand
+        # Mappings are handed to GenerateCommand as template variables
         if mappings:
-            args.vars = ",".join([f"{k}={v}" for k, v in mappings.items()])
+            args.vars = dict(mappings)
 
         if output == "console":
             from io import StringIO
@@ -18,16 +18,23 @@ class ModelWrapper:
         os.environ["OPENAI_API_KEY"] = "sk-default-placeholder-key"
         self.logger.warning("OPENAI_API_KEY not set. Using placeholder. AI features may not work properly.")
 
-    self.agent = Agent(model=self.model_name)
-    self.logger.debug(f"Configured Agent with model: {self.model_name}")
+    # The Agent is built on first use so runs without prompts never pay for it
+    self._agent = None
+
+  @property
+  def agent(self):
+    if self._agent is None:
+      self._agent = Agent(model=self.model_name)
+      self.logger.debug(f"Configured Agent with model: {self.model_name}")
+    return self._agent
 
   def generate_content(self, system_prompt, user_prompt, dry_run=False):
-    if not self.agent:
-      self.logger.warning("No agent configured. Skipping content generation.")
-      return "No agent configured. Skipping content generation."
     if dry_run:
       self.logger.info("[DRY RUN] Would generate content using AI agent.")
       return "[DRY RUN] Generating content using AI agent"
+    if not self.agent:
+      self.logger.warning("No agent configured. Skipping content generation.")
+      return "No agent configured. Skipping content generation."
 
     # Check if using placeholder API key
     if os.getenv("OPENAI_API_KEY") == "sk-default-placeholder-key":
@@ -0,0 +1,95 @@
+# FILE: struct_module/plan.py
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+class PlanNode:
+  """
+  A single unit of work in a generation plan.
+
+  kind is one of "structure", "folder" or "file". Nodes only start once all
+  of their dependencies have finished.
+  """
+  def __init__(self, kind, path, deps=None, **data):
+    self.id = None
+    self.kind = kind
+    self.path = path
+    self.deps = [d for d in (deps or []) if d is not None]
+    self.data = data
+
+  def __repr__(self):
+    return f"PlanNode({self.kind}, {self.path})"
+
+
+class GenerationPlan:
+  """
+  Fully resolved structure tree expressed as a DAG of PlanNode objects.
+
+  Nodes are stored in insertion order, which is always a valid topological
+  order because a node can only depend on nodes added before it.
+  """
+  def __init__(self):
+    self.nodes = []
+    # last file node writing a given path, so writers to the same
+    # destination keep their declaration order
+    self._writers = {}
+
+  def add(self, node):
+    node.id = len(self.nodes)
+    if node.kind == "file":
+      previous = self._writers.get(node.path)
+      if previous is not None:
+        node.deps.append(previous)
+      self._writers[node.path] = node
+    self.nodes.append(node)
+    return node
+
+  def files(self):
+    return [n for n in self.nodes if n.kind == "file"]
+
+  def __len__(self):
+    return len(self.nodes)
+
+
+def run_plan(plan, handler, jobs=1):
+  """
+  Execute every node of the plan with handler(node).
+
+  With jobs <= 1 nodes run inline in plan order, matching the historical
+  sequential behaviour. Otherwise a bounded thread pool runs every node as
+  soon as its dependencies are done. The first exception raised by a
+  handler cancels pending work and is re-raised.
+  """
+  if jobs is None or jobs <= 1:
+    for node in plan.nodes:
+      handler(node)
+    return
+
+  pending = {node.id: len(node.deps) for node in plan.nodes}
+  dependents = {node.id: [] for node in plan.nodes}
+  for node in plan.nodes:
+    for dep in node.deps:
+      dependents[dep.id].append(node)
+
+  logger.debug(f"Running plan with {len(plan)} nodes using {jobs} workers")
+  with ThreadPoolExecutor(max_workers=jobs) as pool:
+    futures = {}
+    for node in plan.nodes:
+      if pending[node.id] == 0:
+        futures[pool.submit(handler, node)] = node
+
+    while futures:
+      done, _ = wait(futures, return_when=FIRST_COMPLETED)
+      for future in done:
+        node = futures.pop(future)
+        error = future.exception()
+        if error is not None:
+          for other in futures:
+            other.cancel()
+          raise error
+        for child in dependents[node.id]:
+          pending[child.id] -= 1
+          if pending[child.id] == 0:
+            futures[pool.submit(handler, child)] = child
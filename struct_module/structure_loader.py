@@ -0,0 +1,121 @@
+# FILE: struct_module/structure_loader.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import yaml
+
+from struct_module.cache_index import record_cached, touch_cached
+
+# Prefer libyaml's C loader when PyYAML was built with it
+try:
+  from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # pragma: no cover - depends on how PyYAML was built
+  from yaml import SafeLoader as _SafeLoader
+
+logger = logging.getLogger(__name__)
+
+# realpath -> ((mtime_ns, size), parsed definition)
+_memory_cache = {}
+_lock = threading.Lock()
+_MISS = object()
+
+
+def parse_yaml(stream):
+  """Parse YAML with the fastest available safe loader."""
+  return yaml.load(stream, Loader=_SafeLoader)
+
+
+def _disk_cache_dir():
+  # The on-disk cache is opt-in: STRUCT_STRUCTURE_CACHE=1
+  if os.getenv("STRUCT_STRUCTURE_CACHE") != "1":
+    return None
+  return Path(os.getenv("STRUCT_STRUCTURE_CACHE_DIR") or os.path.expanduser("~/.struct/cache/structures"))
+
+
+def _disk_cache_file(cache_dir, real_path):
+  return cache_dir / f"{hashlib.sha256(real_path.encode()).hexdigest()}.json"
+
+
+def _read_disk_cache(real_path, signature):
+  cache_dir = _disk_cache_dir()
+  if cache_dir is None:
+    return _MISS
+  cache_file = _disk_cache_file(cache_dir, real_path)
+  try:
+    with cache_file.open('r') as f:
+      cached_signature, data = json.load(f)
+  except (OSError, ValueError, TypeError):
+    return _MISS
+  if tuple(cached_signature) != signature:
+    return _MISS
+  logger.debug(f"Loaded parsed structure from disk cache: {real_path}")
+  touch_cached(cache_file)
+  return data
+
+
+def _write_disk_cache(real_path, signature, data):
+  cache_dir = _disk_cache_dir()
+  if cache_dir is None:
+    return
+  try:
+    # Entries are plain JSON, never pickles, so a tampered cache cannot run
+    # code. Definitions JSON cannot represent exactly (dates, sets,
+    # non-string keys) are simply not cached on disk.
+    text = json.dumps([signature, data])
+    if json.loads(text)[1] != data:
+      return
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, 'w') as f:
+      f.write(text)
+    cache_file = _disk_cache_file(cache_dir, real_path)
+    os.replace(tmp, cache_file)
+    record_cached(cache_file, "structure", text.encode())
+  except Exception as e:
+    logger.debug(f"Could not write structure cache for {real_path}: {e}")
+
+
+def load_structure_file(path):
+  """
+  Load and parse a structure definition YAML file.
+
+  Parsed definitions are cached in-process keyed by real path and
+  invalidated when the file's mtime or size changes. When
+  STRUCT_STRUCTURE_CACHE=1 the parsed form is also persisted on disk so
+  later invocations skip YAML parsing. The returned object is shared
+  between callers and must be treated as read-only.
+  """
+  try:
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+  except OSError:
+    # Not a regular path we can fingerprint; load it without caching
+    with open(path, 'r') as f:
+      return yaml.safe_load(f)
+
+  signature = (st.st_mtime_ns, st.st_size)
+  with _lock:
+    cached = _memory_cache.get(real_path)
+  if cached is not None and cached[0] == signature:
+    return cached[1]
+
+  data = _read_disk_cache(real_path, signature)
+  if data is _MISS:
+    with open(real_path, 'r') as f:
+      data = parse_yaml(f)
+    _write_disk_cache(real_path, signature, data)
+
+  with _lock:
+    _memory_cache[real_path] = (signature, data)
+  return data
+
+
+def clear_structure_cache():
+  """Drop every parsed definition held in memory."""
+  with _lock:
+    _memory_cache.clear()
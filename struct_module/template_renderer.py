@@ -1,8 +1,19 @@
 # FILE: template_renderer.py
+import copy
+import hashlib
+import importlib.util
 import logging
+import marshal
 import os
+import re
 import sys
-from jinja2 import Environment, meta
+import tempfile
+import threading
+from collections import ChainMap
+from pathlib import Path
+import jinja2
+from cachetools import LRUCache
+from jinja2 import Environment, meta, pass_context
 from struct_module.filters import (
   get_latest_release,
   slugify,
@@ -17,50 +28,217 @@ from struct_module.filters import (
   from_json,
 )
 from struct_module.input_store import InputStore
+from struct_module.cache_index import record_cached, touch_cached
 from struct_module.utils import get_current_repo
 
+# Prompts and input store writes are serialized so parallel generation
+# workers never interleave questions or clobber the input store file.
+_prompt_lock = threading.RLock()
+
+# Every renderer uses the same delimiters, filters and globals, so one
+# Jinja environment (and its compiled templates) is shared process-wide.
+_shared_env = None
+_shared_env_lock = threading.Lock()
+
+# source digest -> (compiled Template, frozenset of undeclared variables)
+_template_cache = LRUCache(maxsize=int(os.getenv("STRUCT_TEMPLATE_CACHE_SIZE", "2048")))
+_template_cache_lock = threading.Lock()
+
+
+# Start delimiters of the custom syntax; content without any of them is
+# plain text and never needs to go through Jinja.
+TEMPLATE_MARKERS = ('{{@', '{%@', '{#@')
+_newline_re = re.compile(r"\r\n|\r")
+
+
+def has_template_markers(content):
+  return any(marker in content for marker in TEMPLATE_MARKERS)
+
+
+def _render_plain_text(content):
+  """
+  Return plain text exactly as Jinja would render it: newlines normalized to
+  \n and a single trailing newline removed (keep_trailing_newline=False).
+  """
+  if '\r' in content:
+    content = _newline_re.sub('\n', content)
+  if content.endswith('\n'):
+    content = content[:-1]
+  return content
+
+
+def _at_render_time(func):
+  """
+  Wrap a filter whose result can change between runs. Jinja folds filter
+  calls with constant arguments into the compiled code, which the template
+  caches would then keep; context filters are never folded.
+  """
+  @pass_context
+  def wrapper(context, *args, **kwargs):
+    return func(*args, **kwargs)
+  return wrapper
+
+
+def _create_environment():
+  env = Environment(
+    trim_blocks=True,
+    block_start_string='{%@',
+    block_end_string='@%}',
+    variable_start_string='{{@',
+    variable_end_string='@}}',
+    comment_start_string='{#@',
+    comment_end_string='@#}'
+  )
+
+  custom_filters = {
+    'latest_release': _at_render_time(get_latest_release),
+    'slugify': slugify,
+    'default_branch': _at_render_time(get_default_branch),
+    'to_yaml': to_yaml,
+    'from_yaml': from_yaml,
+    'to_json': to_json,
+    'from_json': from_json,
+  }
+
+  globals = {
+    'current_repo': get_current_repo,
+    'uuid': gen_uuid,
+    'now': now_iso,
+    'env': env_get,
+    'read_file': read_file,
+  }
+
+  env.globals.update(globals)
+  env.filters.update(custom_filters)
+  return env
+
+
+def get_environment():
+  global _shared_env
+  with _shared_env_lock:
+    if _shared_env is None:
+      _shared_env = _create_environment()
+    return _shared_env
+
+
+def clear_template_cache():
+  with _template_cache_lock:
+    _template_cache.clear()
+
+
+class BytecodeStore:
+  """
+  Persistent cache of compiled template code across CLI invocations.
+
+  Entries hold the marshalled code object and the undeclared variables of
+  a template, keyed by the source digest, the Jinja version and the Python
+  bytecode magic number, so upgrades never load incompatible code.
+  Disabled with STRUCT_JINJA_CACHE=0; location set by STRUCT_JINJA_CACHE_DIR
+  (default ~/.struct/cache/jinja).
+
+  Marshalled code is executed when rendered, so the directory is kept
+  private (0700) and an entry is only loaded when both the directory and
+  the file belong to the current user and no one else can access them.
+  """
+  def __init__(self):
+    self.logger = logging.getLogger(__name__)
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+    # The trailing number changes when the code generated for the same
+    # source does, so older entries are never loaded
+    self._version = f"{jinja2.__version__}-{importlib.util.MAGIC_NUMBER.hex()}-2"
+
+  def _directory(self):
+    if os.getenv("STRUCT_JINJA_CACHE", "1") == "0":
+      return None
+    return Path(os.getenv("STRUCT_JINJA_CACHE_DIR") or os.path.expanduser("~/.struct/cache/jinja"))
+
+  def _path(self, directory, digest):
+    return directory / f"{self._version}-{digest}.bin"
+
+  def load(self, digest):
+    directory = self._directory()
+    if directory is None:
+      return None
+    try:
+      with self._path(directory, digest).open('rb') as f:
+        if not (_is_private(os.stat(directory)) and _is_private(os.fstat(f.fileno()))):
+          raise PermissionError(f"{directory} is not private to the current user")
+        code, undeclared = marshal.load(f)
+    except PermissionError as e:
+      self.logger.debug(f"Ignoring template bytecode cache entry: {e}")
+      with self._lock:
+        self.misses += 1
+      return None
+    except (OSError, EOFError, ValueError, TypeError):
+      with self._lock:
+        self.misses += 1
+      return None
+    with self._lock:
+      self.hits += 1
+    touch_cached(self._path(directory, digest))
+    return code, frozenset(undeclared)
+
+  def store(self, digest, code, undeclared):
+    directory = self._directory()
+    if directory is None:
+      return
+    try:
+      directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+      if hasattr(os, "getuid") and directory.stat().st_uid == os.getuid():
+        directory.chmod(0o700)
+      data = marshal.dumps((code, tuple(sorted(undeclared))))
+      # mkstemp creates the entry with mode 0600
+      fd, tmp = tempfile.mkstemp(dir=directory)
+      with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+      path = self._path(directory, digest)
+      os.replace(tmp, path)
+      record_cached(path, "jinja", data)
+    except Exception as e:
+      self.logger.debug(f"Could not write template bytecode cache: {e}")
+
+  def log_stats(self):
+    self.logger.debug(f"Jinja bytecode cache: {self.hits} hits, {self.misses} misses")
+
+
+def _is_private(st):
+  """True for a file or directory owned by this user that no one else can access."""
+  if not hasattr(os, "getuid"):
+    return True
+  return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+bytecode_store = BytecodeStore()
+
+
 class TemplateRenderer:
     def __init__(self, config_variables, input_store, non_interactive, mappings=None):
       self.config_variables = config_variables
       self.non_interactive = non_interactive
       self.mappings = mappings or {}
+      # Mappings are exposed to templates through their own context layer
+      self._mappings_layer = {'mappings': self.mappings} if self.mappings else {}
 
-      self.env = Environment(
-        trim_blocks=True,
-        block_start_string='{%@',
-        block_end_string='@%}',
-        variable_start_string='{{@',
-        variable_end_string='@}}',
-        comment_start_string='{#@',
-        comment_end_string='@#}'
-      )
+      self.env = get_environment()
 
       self.logger = logging.getLogger(__name__)
 
-      custom_filters = {
-        'latest_release': get_latest_release,
-        'slugify': slugify,
-        'default_branch': get_default_branch,
-        'to_yaml': to_yaml,
-        'from_yaml': from_yaml,
-        'to_json': to_json,
-        'from_json': from_json,
-      }
-
-      globals = {
-        'current_repo': get_current_repo,
-        'uuid': gen_uuid,
-        'now': now_iso,
-        'env': env_get,
-        'read_file': read_file,
-      }
-
-      self.env.globals.update(globals)
-      self.env.filters.update(custom_filters)
-      self.input_store = InputStore(input_store)
-      self.input_store.load()
+      with _prompt_lock:
+        self.input_store = InputStore(input_store)
+        self.input_store.load()
       self.input_data = self.input_store.get_data()
 
+    def for_config_variables(self, config_variables):
+      """
+      Return a renderer for another set of config variables that shares this
+      renderer's Jinja environment, mappings and input store.
+      """
+      view = copy.copy(self)
+      view.config_variables = config_variables
+      return view
+
     # Get the config variables from the list and create a dictionary that has
     # variable name and their default value
     #
@@ -92,12 +270,53 @@ class TemplateRenderer:
 
 
     def render_template(self, content, vars):
-      # Inject mappings into the template context
-      if self.mappings:
-        vars = vars.copy() if vars else {}
-        vars['mappings'] = self.mappings
-      template = self.env.from_string(content)
-      return template.render(vars)
+      """
+      Render content against vars, which may be any mapping (usually a
+      ChainMap of file, structure and parent variables).
+
+      The context is layered as mappings over vars over the Jinja globals
+      and handed to Jinja as-is, so neither the variables nor the mappings
+      are copied per render.
+      """
+      if not has_template_markers(content):
+        return _render_plain_text(content)
+      template, _ = self._compile(content)
+      layers = ChainMap(self._mappings_layer, vars if vars is not None else {}, template.globals)
+      context = template.new_context(layers, shared=True)
+      try:
+        return self.env.concat(template.root_render_func(context))
+      except Exception:
+        self.env.handle_exception()
+
+    def _compile(self, content):
+      """
+      Return the compiled template and its undeclared variables for content.
+
+      Both come from a single parse and are cached by source digest, so the
+      same body, path or with: value is only compiled once per process.
+      """
+      key = hashlib.blake2b(content.encode("utf-8"), digest_size=20).hexdigest()
+      with _template_cache_lock:
+        entry = _template_cache.get(key)
+      if entry is None:
+        cached = bytecode_store.load(key)
+        if cached is not None:
+          code, undeclared = cached
+        else:
+          ast = self.env.parse(content)
+          undeclared = frozenset(meta.find_undeclared_variables(ast))
+          code = self.env.compile(ast)
+          bytecode_store.store(key, code, undeclared)
+        template = self.env.template_class.from_code(self.env, code, self.env.make_globals(None))
+        entry = (template, undeclared)
+        with _template_cache_lock:
+          _template_cache[key] = entry
+      return entry
+
+    def get_undeclared_variables(self, content):
+      if not has_template_markers(content):
+        return frozenset()
+      return self._compile(content)[1]
 
     def _get_variable_icon(self, var_name, var_type):
       """Get contextual icon for variable based on name and type"""
@@ -132,8 +351,11 @@ class TemplateRenderer:
         return '🔧'
 
     def prompt_for_missing_vars(self, content, vars):
-      parsed_content = self.env.parse(content)
-      undeclared_variables = meta.find_undeclared_variables(parsed_content)
+      with _prompt_lock:
+        return self._prompt_for_missing_vars(content, vars)
+
+    def _prompt_for_missing_vars(self, content, vars):
+      undeclared_variables = self.get_undeclared_variables(content)
       self.logger.debug(f"Undeclared variables: {undeclared_variables}")
 
       # Build schema lookup
@@ -0,0 +1,122 @@
+import argparse
+import shutil
+
+import pytest
+
+from struct_module import filters
+from struct_module.bundle import StructureBundle, is_bundle
+from struct_module.commands.bundle import BundleCommand
+from struct_module.commands.generate import GenerateCommand
+
+
+class _Resp:
+  def __init__(self, text):
+    self.text = text
+    self.status_code = 200
+    self.headers = {}
+
+  def raise_for_status(self):
+    return None
+
+
+LOGO = b"\x89PNG\r\n\x1a\n\x00\xff" * 4096
+
+
+def _no_network(*args, **kwargs):
+  raise AssertionError("network used while generating from a bundle")
+
+
+def _bundle(tmp_path, monkeypatch, name):
+  monkeypatch.setenv("HOME", str(tmp_path / "home"))
+  monkeypatch.delenv("STRUCT_OFFLINE", raising=False)
+  filters.cache.clear()
+  structures = tmp_path / 'structures'
+  (structures / 'ci').mkdir(parents=True)
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - LICENSE:
+      file: https://example.com/LICENSE
+  - owner.txt: '{{@ mappings.teams.platform @}}'
+folders:
+  - ci:
+      struct: ci/child
+"""
+  )
+  (structures / 'ci' / 'child.yaml').write_text(
+    """
+files:
+  - version.txt: '{{@ "owner/tool" | latest_release @}}'
+"""
+  )
+  assets = tmp_path / 'assets'
+  assets.mkdir()
+  (assets / 'logo.png').write_bytes(LOGO)
+  (structures / 'root.yaml').write_text((structures / 'root.yaml').read_text().replace(
+    "files:\n", f"files:\n  - logo.png:\n      file: file://{assets / 'logo.png'}\n", 1))
+  mappings = tmp_path / 'mappings.yaml'
+  mappings.write_text("teams:\n  platform: infra\n")
+
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: type("S", (), {
+    "get": lambda self, url, timeout=None, headers=None: _Resp("MIT License"),
+  })())
+  monkeypatch.setattr(filters, "_latest_release", lambda repo: "v2.0.0")
+
+  parser = argparse.ArgumentParser()
+  command = BundleCommand(parser)
+  output = tmp_path / name
+  index = command.execute(parser.parse_args(
+    ['root', str(output), '-s', str(structures), '--mappings-file', str(mappings)]))
+
+  # Nothing but the bundle is available from here on
+  shutil.rmtree(structures)
+  shutil.rmtree(assets)
+  mappings.unlink()
+  shutil.rmtree(tmp_path / "home")
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", _no_network)
+  monkeypatch.setattr(filters, "_latest_release", _no_network)
+  filters.cache.clear()
+  return output, index
+
+
+@pytest.mark.parametrize("name", ["bundle.zip", "bundle.tar"])
+def test_generate_from_bundle_without_network(tmp_path, monkeypatch, name):
+  output, index = _bundle(tmp_path, monkeypatch, name)
+
+  assert is_bundle(str(output))
+  assert sorted(index["structures"]) == ["ci/child", "root"]
+  logo = f"file://{tmp_path / 'assets' / 'logo.png'}"
+  assert sorted(index["sources"]) == sorted(["https://example.com/LICENSE", logo])
+  assert index["binary"] == [logo]
+  assert index["lookups"] == {"latest_release:owner/tool": "v2.0.0"}
+
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args([str(output), str(tmp_path / 'out'), '-n', str(store), '--non-interactive'])
+  summary = command.execute(args)
+
+  assert summary["created"] == 4
+  assert (tmp_path / 'out' / 'logo.png').read_bytes() == LOGO
+  assert (tmp_path / 'out' / 'LICENSE').read_text() == "MIT License\n"
+  assert (tmp_path / 'out' / 'owner.txt').read_text() == "infra\n"
+  assert (tmp_path / 'out' / 'ci' / 'version.txt').read_text() == "v2.0.0\n"
+  assert command._bundle is None
+  assert filters._bundled == {}
+
+
+def test_bundle_reads_members_on_demand(tmp_path, monkeypatch):
+  output, _ = _bundle(tmp_path, monkeypatch, "bundle.zip")
+
+  bundle = StructureBundle(str(output))
+  try:
+    assert bundle.root == "root"
+    assert bundle.load_structure("ci/child")["files"][0]["version.txt"]
+    assert bundle.load_structure("missing") is None
+    assert bundle.source("https://example.com/LICENSE") == "MIT License"
+    assert bundle.mappings() == {"teams": {"platform": "infra"}}
+    with pytest.raises(FileNotFoundError):
+      bundle.source("https://example.com/other")
+  finally:
+    bundle.close()
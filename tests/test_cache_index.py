@@ -0,0 +1,195 @@
+import argparse
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from struct_module.cache_index import CacheIndex, get_cache_index, parse_age, parse_size
+from struct_module.commands.cache import CacheCommand
+
+
+def _write(index, name, data, kind="http"):
+  path = index.cache_dir / name
+  path.write_bytes(data)
+  index.record(path, kind, data)
+  return path
+
+
+def test_parse_size_and_age():
+  assert parse_size("500") == 500
+  assert parse_size("2K") == 2048
+  assert parse_size("1.5MB") == int(1.5 * 1024 * 1024)
+  assert parse_age("90") == 90
+  assert parse_age("12h") == 12 * 3600
+  assert parse_age("7d") == 7 * 86400
+  with pytest.raises(ValueError):
+    parse_size("lots")
+
+
+def test_record_touch_and_stats(tmp_path):
+  index = CacheIndex(tmp_path)
+  path = _write(index, "a", b"hello")
+  repo = tmp_path / "repo"
+  (repo / "sub").mkdir(parents=True)
+  (repo / "sub" / "f.txt").write_bytes(b"12345678")
+  index.record(repo, "git")
+  index.touch(path)
+  index.touch(path)
+
+  stats = index.stats()
+
+  assert stats["entries"] == 2
+  assert stats["bytes"] == 13
+  assert stats["hits"] == 2 and stats["misses"] == 2
+  assert stats["hit_rate"] == 0.5
+  assert stats["kinds"] == {"http": {"entries": 1, "bytes": 5}, "git": {"entries": 1, "bytes": 8}}
+  entry = next(e for e in index.entries() if e["key"] == "a")
+  assert entry["hits"] == 2
+
+
+def test_gc_evicts_least_recently_used_first(tmp_path):
+  index = CacheIndex(tmp_path)
+  old = _write(index, "old", b"x" * 10)
+  new = _write(index, "new", b"y" * 10)
+  (tmp_path / "old.meta.json").write_text("{}")
+  # Reading "old" makes "new" the least recently used entry
+  time.sleep(0.01)
+  index.touch(old)
+
+  count, freed = index.gc(max_bytes=15)
+
+  assert (count, freed) == (1, 10)
+  assert old.exists() and not new.exists()
+  assert [e["key"] for e in index.entries()] == ["old"]
+
+
+def test_gc_by_age(tmp_path):
+  index = CacheIndex(tmp_path)
+  stale = _write(index, "stale", b"1")
+  fresh = _write(index, "fresh", b"2")
+  conn = index._connection()
+  conn.execute("UPDATE entries SET last_access = ? WHERE key = 'stale'", (time.time() - 3600,))
+  conn.commit()
+
+  assert index.gc(max_age=60) == (1, 1)
+  assert not stale.exists() and fresh.exists()
+
+
+def test_verify_removes_missing_and_corrupt_entries(tmp_path):
+  index = CacheIndex(tmp_path)
+  good = _write(index, "good", b"intact")
+  corrupt = _write(index, "corrupt", b"original")
+  missing = _write(index, "missing", b"gone")
+  corrupt.write_bytes(b"tampered")
+  missing.unlink()
+
+  broken = index.verify()
+
+  assert sorted(broken) == ["corrupt", "missing"]
+  assert good.exists() and not corrupt.exists()
+  assert [e["key"] for e in index.entries()] == ["good"]
+
+
+def test_clear_empties_the_cache(tmp_path):
+  cache = tmp_path / "cache"
+  cache.mkdir()
+  index = CacheIndex(cache)
+  _write(index, "a", b"data")
+  (cache / "untracked").mkdir()
+
+  index.clear()
+
+  assert list(cache.iterdir()) == []
+  assert index.stats()["entries"] == 0
+
+
+def test_cache_is_capped_by_env(tmp_path, monkeypatch):
+  monkeypatch.setenv("STRUCT_CACHE_MAX_MB", str(25 / (1024 * 1024)))
+  previous_run = CacheIndex(tmp_path)
+  first = _write(previous_run, "first", b"a" * 10)
+  time.sleep(0.01)
+  second = _write(previous_run, "second", b"b" * 10)
+  time.sleep(0.01)
+
+  index = CacheIndex(tmp_path)
+  third = _write(index, "third", b"c" * 10)
+  assert not first.exists()
+  assert second.exists() and third.exists()
+  assert index.stats()["bytes"] <= 25
+
+  # Entries this run recorded or read are kept until it exits
+  index.touch(second)
+  time.sleep(0.01)
+  fourth = _write(index, "fourth", b"d" * 10)
+  assert second.exists() and third.exists() and fourth.exists()
+
+  index.flush()
+  index._enforce_cap()
+  assert not third.exists()
+  assert index.stats()["bytes"] <= 25
+
+
+def test_cache_command_actions(tmp_path):
+  parser = argparse.ArgumentParser()
+  CacheCommand(parser)
+  cache = tmp_path / "cache"
+
+  args = parser.parse_args(["--cache-dir", str(cache), "stats"])
+  with patch('builtins.print'):
+    stats = args.func(args)
+  assert stats["entries"] == 0
+
+  index = get_cache_index(str(cache))
+  _write(index, "a", b"x" * 100)
+  _write(index, "b", b"y" * 100)
+
+  args = parser.parse_args(["--cache-dir", str(cache), "gc", "--max-size", "150"])
+  with patch('builtins.print'):
+    assert args.func(args) == (1, 100)
+
+  args = parser.parse_args(["--cache-dir", str(cache), "gc"])
+  assert args.func(args) is None
+
+  args = parser.parse_args(["--cache-dir", str(cache), "clear"])
+  with patch('builtins.print'):
+    args.func(args)
+  assert not os.listdir(cache)
+
+
+def test_template_structure_and_mappings_caches_are_indexed(tmp_path, monkeypatch):
+  from struct_module import mappings_store
+  from struct_module.structure_loader import load_structure_file
+  from struct_module.template_renderer import bytecode_store
+  monkeypatch.setenv("HOME", str(tmp_path / "home"))
+  monkeypatch.setenv("STRUCT_STRUCTURE_CACHE", "1")
+  for name in ("STRUCT_JINJA_CACHE", "STRUCT_JINJA_CACHE_DIR", "STRUCT_STRUCTURE_CACHE_DIR", "STRUCT_MAPPINGS_INDEX_DIR"):
+    monkeypatch.delenv(name, raising=False)
+  structure = tmp_path / "root.yaml"
+  structure.write_text("files:\n  - a.txt: a\n")
+  mappings = tmp_path / "mappings.yaml"
+  mappings.write_text("teams:\n  a: b\n")
+
+  class Fetcher:
+    def fetch_content(self, location):
+      return "remote:\n  c: d\n"
+
+  bytecode_store.store("digest", compile("1", "<template>", "eval"), set())
+  load_structure_file(str(structure))
+  mappings_store.MappingsIndex(str(mappings)).open()._index.close()
+  mappings_store.load_remote_mappings("https://example.com/m.yaml", Fetcher())
+
+  parser = argparse.ArgumentParser()
+  CacheCommand(parser)
+  args = parser.parse_args(["stats"])
+  with patch('builtins.print'):
+    stats = args.func(args)
+  assert {kind: counts["entries"] for kind, counts in stats["kinds"].items()} == {
+    "jinja": 1, "structure": 1, "mappings": 2,
+  }
+
+  args = parser.parse_args(["gc", "--max-size", "1"])
+  with patch('builtins.print'):
+    assert args.func(args)[0] == 4
+  cache = tmp_path / "home" / ".struct" / "cache"
+  assert not [p for p in cache.rglob("*") if p.is_file() and p.name != "index.sqlite"]
@@ -1,14 +1,26 @@
+import hashlib
 import io
+import json
 import os
 import stat
 import subprocess
+import time
 from pathlib import Path
 
 import pytest
+import requests
 
 from struct_module.content_fetcher import ContentFetcher
 
 
+def _patch_http(monkeypatch, get):
+    """Route the shared HTTP session's GET requests to a fake."""
+    class Session:
+        def get(self, url, timeout=None, headers=None):
+            return get(url, timeout=timeout) if timeout is not None else get(url)
+    monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: Session())
+
+
 def test_fetch_local_file(tmp_path):
     p = tmp_path / "file.txt"
     p.write_text("hello")
@@ -29,18 +41,43 @@ def test_fetch_http_url_caches(monkeypatch, tmp_path):
         return Resp()
 
     cf = ContentFetcher(cache_dir=tmp_path / "cache")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", fake_get)
+    _patch_http(monkeypatch, fake_get)
 
     # First call populates cache
     assert cf.fetch_content(url) == "DATA"
 
-    # Second call should read from cache and not invoke requests.get
+    # Second call should read from cache and not hit the network
     def boom(u):
         raise AssertionError("should not be called due to cache hit")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", boom)
+    _patch_http(monkeypatch, boom)
     assert cf.fetch_content(url) == "DATA"
 
 
+def test_http_cache_bodies_are_swapped_in(monkeypatch, tmp_path):
+    monkeypatch.setenv("STRUCT_HTTP_CACHE_TTL", "0")
+    url = "https://example.com/data.txt"
+    bodies = iter(["v1", "v2"])
+
+    class Resp:
+        def __init__(self):
+            self.text = next(bodies)
+
+        def raise_for_status(self):
+            return None
+
+    _patch_http(monkeypatch, lambda u: Resp())
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    body_path, _ = cf._http_cache_paths(url)
+
+    assert cf.fetch_content(url) == "v1"
+    # A reader holding the old body keeps it while a new one is written
+    with body_path.open() as reader:
+        assert cf.fetch_content(url) == "v2"
+        assert reader.read() == "v1"
+    assert body_path.read_text() == "v2"
+    assert not [p for p in (tmp_path / "cache").iterdir() if p.name.startswith(".")]
+
+
 def test_fetch_github_https_and_pull(monkeypatch, tmp_path):
     cf = ContentFetcher(cache_dir=tmp_path / "cache")
     repo_dir = tmp_path / "cache" / "owner_repo_main"
@@ -52,6 +89,8 @@ def test_fetch_github_https_and_pull(monkeypatch, tmp_path):
     file_full.parent.mkdir(parents=True, exist_ok=True)
     file_full.write_text("GDATA")
 
+    (repo_dir / "other.txt").write_text("OTHER")
+
     calls = {"pull": 0, "clone": 0}
 
     def fake_run(args, check):
@@ -61,17 +100,20 @@ def test_fetch_github_https_and_pull(monkeypatch, tmp_path):
             repo_dir.mkdir(parents=True, exist_ok=True)
             file_full.parent.mkdir(parents=True, exist_ok=True)
             file_full.write_text("GDATA")
-        elif args[:3] == ["git", "-C", str(repo_dir)]:
+        elif args[:4] == ["git", "-C", str(repo_dir), "fetch"]:
             calls["pull"] += 1
-        else:
+            assert args[4:] == ["--depth", "1", "origin", "main"]
+        elif args[:4] != ["git", "-C", str(repo_dir), "reset"]:
             raise AssertionError(f"Unexpected git call: {args}")
 
     monkeypatch.setattr(subprocess, "run", fake_run)
 
     out = cf.fetch_content("githubhttps://owner/repo/main/path/to/file.txt")
     assert out == "GDATA"
-    # Since repo existed, should have pulled
+    # Since repo existed, should have fetched, and only once per run
+    assert cf.fetch_content("githubhttps://owner/repo/main/other.txt") == "OTHER"
     assert calls["pull"] == 1
+    assert calls["clone"] == 0
 
 
 def test_fetch_github_clone_path(monkeypatch, tmp_path):
@@ -99,6 +141,132 @@ def test_fetch_github_clone_path(monkeypatch, tmp_path):
     assert calls["clone"] == 1
 
 
+def test_fetch_github_widens_existing_sparse_checkout(monkeypatch, tmp_path):
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    repo_dir = tmp_path / "cache" / "owner_repo_main"
+    # A sparse checkout only has the files at the root
+    (repo_dir / ".git" / "info").mkdir(parents=True)
+    (repo_dir / ".git" / "info" / "sparse-checkout").write_text("/*\n")
+    (repo_dir / "README.md").write_text("ROOT")
+    calls = []
+
+    def fake_run(args, check):
+        calls.append(args[3:5])
+        if args[3:5] == ["sparse-checkout", "add"]:
+            (repo_dir / args[5]).mkdir(parents=True)
+            (repo_dir / args[5] / "a.txt").write_text("A")
+            (repo_dir / args[5] / "b.txt").write_text("B")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setenv("STRUCT_DENY_NETWORK", "1")
+
+    assert cf.fetch_content("github://owner/repo/main/README.md") == "ROOT"
+    assert cf.fetch_content("github://owner/repo/main/docs/a.txt") == "A"
+    assert cf.fetch_content("github://owner/repo/main/docs/b.txt") == "B"
+    assert calls == [["fetch", "--depth"], ["reset", "--hard"], ["sparse-checkout", "add"]]
+
+
+_real_run = subprocess.run
+
+
+def _git(*args, cwd):
+    _real_run(["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+def test_fetch_github_reads_bare_repo_objects(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    upstream = tmp_path / "upstream"
+    (upstream / "docs").mkdir(parents=True)
+    (upstream / "README.md").write_text("v1")
+    (upstream / "docs" / "a.txt").write_text("A")
+    _git("init", "-q", "-b", "main", cwd=upstream)
+    _git("add", ".", cwd=upstream)
+    _git("commit", "-q", "-m", "v1", cwd=upstream)
+
+    calls = []
+
+    def local_run(args, check):
+        calls.append(args)
+        args = [f"file://{upstream}" if a == "https://github.com/owner/repo.git" else a for a in args]
+        return _real_run(args, check=check, capture_output=True)
+
+    monkeypatch.setattr(subprocess, "run", local_run)
+    monkeypatch.setenv("STRUCT_DENY_NETWORK", "1")
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    repo_dir = tmp_path / "cache" / "owner_repo_main"
+
+    assert cf.fetch_content("github://owner/repo/main/README.md") == "v1"
+    assert cf.fetch_content("github://owner/repo/main/docs/a.txt") == "A"
+    with pytest.raises(FileNotFoundError):
+        cf.fetch_content("github://owner/repo/main/missing.txt")
+
+    # One bare clone, no checkout; every file came from the object database
+    assert len(calls) == 1 and "--bare" in calls[0]
+    assert not (repo_dir / "README.md").exists()
+
+    # A later run fetches the new commit once
+    (upstream / "README.md").write_text("v2")
+    _git("commit", "-q", "-am", "v2", cwd=upstream)
+    monkeypatch.setattr(mod, "_synced_repos", set())
+    monkeypatch.setattr(mod, "_repo_commits", {})
+
+    assert cf.fetch_content("github://owner/repo/main/README.md") == "v2"
+    assert cf.fetch_content("github://owner/repo/main/docs/a.txt") == "A"
+    assert [c[3] for c in calls[1:]] == ["fetch", "update-ref"]
+
+
+def test_every_generate_run_checks_remotes_again(monkeypatch, tmp_path):
+    import argparse
+    import struct_module.content_fetcher as mod
+    from struct_module.commands.generate import GenerateCommand
+    monkeypatch.setattr(mod, "_synced_repos", {"repo"})
+    monkeypatch.setattr(mod, "_repo_commits", {"repo": "abc"})
+    structure = tmp_path / "root.yaml"
+    structure.write_text("files:\n  - a.txt: a\n")
+
+    parser = argparse.ArgumentParser()
+    command = GenerateCommand(parser)
+    command.execute(parser.parse_args([str(structure), str(tmp_path / "out"), "--non-interactive"]))
+
+    assert mod._synced_repos == set()
+    assert mod._repo_commits == {}
+
+
+def test_fetch_github_reads_tags(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    upstream = tmp_path / "upstream"
+    upstream.mkdir()
+    (upstream / "README.md").write_text("v1")
+    (upstream / "logo.png").write_bytes(b"\x89PNG\x00v1")
+    _git("init", "-q", "-b", "main", cwd=upstream)
+    _git("add", ".", cwd=upstream)
+    _git("commit", "-q", "-m", "v1", cwd=upstream)
+    _git("tag", "-a", "v1.0", "-m", "release", cwd=upstream)
+    (upstream / "README.md").write_text("unreleased")
+    _git("commit", "-q", "-am", "next", cwd=upstream)
+
+    def local_run(args, check):
+        args = [f"file://{upstream}" if a == "https://github.com/owner/repo.git" else a for a in args]
+        return _real_run(args, check=check, capture_output=True)
+
+    monkeypatch.setattr(subprocess, "run", local_run)
+    monkeypatch.setenv("STRUCT_DENY_NETWORK", "1")
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    assert cf.fetch_content("github://owner/repo/v1.0/README.md") == "v1"
+    with cf.open_binary("github://owner/repo/v1.0/logo.png") as f:
+        assert f.read() == b"\x89PNG\x00v1"
+    with pytest.raises(FileNotFoundError):
+        cf.open_binary("github://owner/repo/v1.0/missing.png")
+
+    # A moved tag is picked up by the next run
+    _git("tag", "-f", "-a", "v1.0", "-m", "re-release", cwd=upstream)
+    monkeypatch.setattr(mod, "_synced_repos", set())
+    monkeypatch.setattr(mod, "_repo_commits", {})
+    assert cf.fetch_content("github://owner/repo/v1.0/README.md") == "unreleased"
+
+
 def test_fetch_github_file_not_found(monkeypatch, tmp_path):
     cf = ContentFetcher(cache_dir=tmp_path / "cache")
     repo_dir = tmp_path / "cache" / "owner_repo_main"
@@ -134,7 +302,7 @@ def test_http_error_bubbles_and_no_cache(monkeypatch, tmp_path):
         return Resp()
 
     cf = ContentFetcher(cache_dir=tmp_path / "cache")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", fake_get)
+    _patch_http(monkeypatch, fake_get)
 
     with pytest.raises(Exception):
         cf.fetch_content(url)
@@ -144,7 +312,7 @@ def test_http_error_bubbles_and_no_cache(monkeypatch, tmp_path):
     def fake_get2(u):
         called["count"] += 1
         return Resp()
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", fake_get2)
+    _patch_http(monkeypatch, fake_get2)
     with pytest.raises(Exception):
         cf.fetch_content(url)
     assert called["count"] == 1
@@ -224,7 +392,7 @@ def test_git_pull_error_bubbles(monkeypatch, tmp_path):
 def test_github_raw_fetch_success_no_git_calls(monkeypatch, tmp_path):
     cf = ContentFetcher(cache_dir=tmp_path / "cache")
     # Ensure no existing cache repo
-    # Prepare requests.get to return content
+    # Prepare the HTTP session to return content
     class Resp:
         def __init__(self, text):
             self.text = text
@@ -238,7 +406,7 @@ def test_github_raw_fetch_success_no_git_calls(monkeypatch, tmp_path):
     def fake_run(args, check):
         called["git"] += 1
         raise AssertionError("git should not be called on raw success")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", fake_get)
+    _patch_http(monkeypatch, fake_get)
     monkeypatch.setattr(subprocess, "run", fake_run)
 
     out = cf.fetch_content("githubhttps://owner/repo/main/path/to/file.txt")
@@ -256,7 +424,7 @@ def test_github_raw_fetch_retries_then_fallback_to_git(monkeypatch, tmp_path):
     # Fail HTTP calls
     def bad_get(url, timeout=None):
         raise Exception("network down")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", bad_get)
+    _patch_http(monkeypatch, bad_get)
 
     calls = {"clone": 0}
     def fake_run(args, check):
@@ -291,7 +459,7 @@ def test_github_deny_network_uses_git(monkeypatch, tmp_path):
     # HTTP must not be called
     def bad_get(url, timeout=None):
         raise AssertionError("HTTP should not be invoked when STRUCT_DENY_NETWORK=1")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", bad_get)
+    _patch_http(monkeypatch, bad_get)
 
     def fake_run(args, check):
         if args[:2] == ["git", "clone"]:
@@ -315,14 +483,505 @@ def test_github_existing_cache_prefers_git(monkeypatch, tmp_path):
     # HTTP must not be needed; if called, fail
     def bad_get(url, timeout=None):
         raise AssertionError("HTTP should not be called when cache exists")
-    monkeypatch.setattr("struct_module.content_fetcher.requests.get", bad_get)
+    _patch_http(monkeypatch, bad_get)
 
     pulls = {"count": 0}
     def fake_run(args, check):
-        if args[:3] == ["git", "-C", str(repo_dir)]:
+        if args[:4] == ["git", "-C", str(repo_dir), "fetch"]:
             pulls["count"] += 1
     monkeypatch.setattr(subprocess, "run", fake_run)
 
     out = cf.fetch_content("githubhttps://owner/repo/main/path.txt")
     assert out == "CACHE_DATA"
     assert pulls["count"] == 1
+
+
+def test_prefetch_runs_concurrently_and_captures_errors(monkeypatch, tmp_path):
+    import threading
+    import time
+
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def fake_fetch(location):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        if location.endswith("bad"):
+            raise RuntimeError("nope")
+        return location.upper()
+
+    monkeypatch.setattr(cf, "fetch_content", fake_fetch)
+    locations = [f"https://h/{i}" for i in range(6)] + ["https://h/0", "https://h/bad"]
+    out = cf.prefetch(locations, max_workers=3)
+
+    assert out["https://h/1"] == "HTTPS://H/1"
+    assert isinstance(out["https://h/bad"], RuntimeError)
+    assert len(out) == 7
+    assert 1 < active["max"] <= 3
+
+
+def test_http_session_is_shared_and_pooled(monkeypatch):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_session", None)
+    monkeypatch.setenv("STRUCT_HTTP_POOL_SIZE", "4")
+
+    session = mod.http_session()
+    assert mod.http_session() is session
+    adapter = session.get_adapter("https://raw.githubusercontent.com/x")
+    assert adapter._pool_maxsize == 4
+
+
+def test_http_cache_entries_are_read_from_disk_once(monkeypatch, tmp_path):
+    url = "https://example.com/once.txt"
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    cache_file = tmp_path / "cache" / hashlib.md5(url.encode()).hexdigest()
+    cache_file.write_text("ON_DISK")
+    cache_file.with_name(cache_file.name + ".meta.json").write_text(
+        json.dumps({"url": url, "fetched_at": time.time(), "max_age": 300}))
+
+    assert cf.fetch_content(url) == "ON_DISK"
+    # A second fetcher in the same process is served from memory
+    cache_file.unlink()
+    assert ContentFetcher(cache_dir=tmp_path / "cache").fetch_content(url) == "ON_DISK"
+
+
+class _Resp:
+    def __init__(self, text="", status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+def _recording_session(monkeypatch, responses):
+    calls = []
+
+    class Session:
+        def get(self, url, timeout=None, headers=None):
+            calls.append(headers or {})
+            return responses.pop(0)
+    monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: Session())
+    return calls
+
+
+def _age_entry(cache_dir, url, seconds):
+    import struct_module.content_fetcher as mod
+    mod._memory_cache.clear()
+    meta_path = cache_dir / f"{hashlib.md5(url.encode()).hexdigest()}.meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta["fetched_at"] -= seconds
+    meta_path.write_text(json.dumps(meta))
+
+
+def test_http_cache_revalidates_stale_entries_with_validators(monkeypatch, tmp_path):
+    url = "https://example.com/etag.txt"
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    calls = _recording_session(monkeypatch, [
+        _Resp("V1", headers={"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+                             "Cache-Control": "max-age=60"}),
+        _Resp(status_code=304, headers={"Cache-Control": "max-age=60"}),
+        _Resp("V2", headers={"ETag": '"def"'}),
+    ])
+
+    assert cf.fetch_content(url) == "V1"
+    assert cf.fetch_content(url) == "V1"  # fresh: no request
+    assert len(calls) == 1
+
+    _age_entry(tmp_path / "cache", url, 120)
+    assert cf.fetch_content(url) == "V1"  # 304 keeps the body
+    assert calls[1] == {"If-None-Match": '"abc"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+    _age_entry(tmp_path / "cache", url, 120)
+    assert cf.fetch_content(url) == "V2"
+    assert len(calls) == 3
+
+
+def test_http_cache_serves_stale_while_revalidating(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    url = "https://example.com/swr.txt"
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    _recording_session(monkeypatch, [
+        _Resp("OLD", headers={"Cache-Control": "max-age=10, stale-while-revalidate=600"}),
+        _Resp("NEW", headers={"Cache-Control": "max-age=10"}),
+    ])
+
+    assert cf.fetch_content(url) == "OLD"
+    _age_entry(tmp_path / "cache", url, 60)
+    assert cf.fetch_content(url) == "OLD"
+
+    deadline = time.time() + 5
+    while mod._revalidating and time.time() < deadline:
+        time.sleep(0.01)
+    assert cf.fetch_content(url) == "NEW"
+
+
+def test_github_raw_fetches_are_cached(monkeypatch, tmp_path):
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    calls = _recording_session(monkeypatch, [_Resp("RAW")])
+
+    assert cf.fetch_content("github://owner/repo/main/a.txt") == "RAW"
+    assert cf.fetch_content("github://owner/repo/main/a.txt") == "RAW"
+    assert len(calls) == 1
+
+
+def _tarball(files, commit="abc123", links=None):
+    import tarfile
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz", format=tarfile.PAX_FORMAT,
+                      pax_headers={"comment": commit}) as tf:
+        for name, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(f"repo-main/{name}")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo(f"repo-main/{name}")
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tf.addfile(info)
+    return buf.getvalue()
+
+
+class _ArchiveResp:
+    def __init__(self, body=b"", status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 7):
+            yield self.body[i:i + 7]
+
+    def close(self):
+        pass
+
+
+def _archive_session(monkeypatch, responses):
+    calls = []
+
+    class Session:
+        def get(self, url, timeout=None, headers=None, stream=False):
+            calls.append((url, headers or {}))
+            return responses.pop(0)
+    monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: Session())
+    return calls
+
+
+def test_github_archive_serves_every_file_from_one_download(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_github_archives", {})
+    body = _tarball({"README.md": "readme", "ci/build.yml": "build"})
+    calls = _archive_session(monkeypatch, [_ArchiveResp(body, headers={"ETag": '"v1"'})])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    assert cf.fetch_content("githubarchive://owner/repo/main/README.md") == "readme"
+    assert cf.fetch_content("githubarchive://owner/repo/main/ci/build.yml") == "build"
+    with pytest.raises(FileNotFoundError):
+        cf.fetch_content("githubarchive://owner/repo/main/missing.txt")
+    assert calls == [("https://codeload.github.com/owner/repo/tar.gz/main", {})]
+
+    # A later run revalidates the stored archive instead of downloading it again
+    monkeypatch.setattr(mod, "_github_archives", {})
+    calls = _archive_session(monkeypatch, [_ArchiveResp(status_code=304)])
+    monkeypatch.setenv("STRUCT_GITHUB_ARCHIVE", "1")
+    assert cf.fetch_content("github://owner/repo/main/ci/build.yml") == "build"
+    assert calls[0][1] == {"If-None-Match": '"v1"'}
+
+
+def test_github_archive_keeps_the_tarball_an_older_index_points_to(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    archives = tmp_path / "cache" / "archives"
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    versions = [_tarball({"a.txt": f"v{n}" * n}, commit=f"c{n}") for n in (1, 2, 3)]
+    indexes = []
+    for n, body in enumerate(versions, 1):
+        monkeypatch.setattr(mod, "_github_archives", {})
+        _archive_session(monkeypatch, [_ArchiveResp(body, headers={"ETag": f'"v{n}"'})])
+        assert cf.fetch_content("githubarchive://owner/repo/main/a.txt") == f"v{n}" * n
+        indexes.append(mod._github_archives[("owner", "repo", "main")])
+
+    # Each download has its own file: the current one and the previous one,
+    # which another process may still be reading, are kept
+    tars = [tar for tar, _ in indexes]
+    assert len(set(tars)) == 3
+    assert sorted(archives.glob("*.tar")) == sorted(tars[1:])
+    tar, members = indexes[1]
+    with mod.FileSlice(tar, *members["a.txt"]) as f:
+        assert f.read() == b"v2v2"
+
+
+def test_github_archive_serves_symlinked_files(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_github_archives", {})
+    body = _tarball({"docs/guide.md": "guide"}, links={
+        "README.md": "docs/guide.md", "docs/latest.md": "guide.md", "outside.md": "../etc/passwd",
+    })
+    _archive_session(monkeypatch, [_ArchiveResp(body)])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    assert cf.fetch_content("githubarchive://owner/repo/main/README.md") == "guide"
+    assert cf.fetch_content("githubarchive://owner/repo/main/docs/latest.md") == "guide"
+    with pytest.raises(FileNotFoundError):
+        cf.fetch_content("githubarchive://owner/repo/main/outside.md")
+
+
+def test_github_archive_failure_falls_back_to_raw(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_github_archives", {})
+    calls = _archive_session(monkeypatch, [_ArchiveResp(status_code=404)])
+    monkeypatch.setattr(ContentFetcher, "_cached_http_get",
+                        lambda self, url, timeout=None: url.rsplit("/", 1)[1])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    assert cf.fetch_content("githubarchive://owner/repo/main/a.txt") == "a.txt"
+    assert cf.fetch_content("githubarchive://owner/repo/main/b.txt") == "b.txt"
+    # The failed download is not retried for every file
+    assert len(calls) == 1
+
+    # but the next run of the same process tries the archive again
+    mod.start_run()
+    calls = _archive_session(monkeypatch, [_ArchiveResp(_tarball({"a.txt": "from archive"}))])
+    assert cf.fetch_content("githubarchive://owner/repo/main/a.txt") == "from archive"
+    assert len(calls) == 1
+
+
+def _stubbed_s3(monkeypatch):
+    """A real botocore S3 client answering from queued stub responses."""
+    import boto3
+    from botocore.stub import Stubber
+    import struct_module.content_fetcher as mod
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+    stubber = Stubber(client)
+    stubber.activate()
+    monkeypatch.setattr(mod, "_s3_client", client)
+    monkeypatch.setattr(mod, "_object_versions", {})
+    return stubber
+
+
+def _s3_object(stubber, key, etag, data, ranges=None):
+    from botocore.response import StreamingBody
+    stubber.add_response("head_object", {"ETag": etag, "ContentLength": len(data)}, {"Bucket": "b", "Key": key})
+    for start, end in ranges or [(None, None)]:
+        params = {"Bucket": "b", "Key": key, "IfMatch": etag}
+        body = data
+        if start is not None:
+            params["Range"] = f"bytes={start}-{end}"
+            body = data[start:end + 1]
+        stubber.add_response("get_object", {"Body": StreamingBody(io.BytesIO(body), len(body))}, params)
+
+
+def test_s3_cache_is_keyed_by_bucket_key_and_etag(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    stubber = _stubbed_s3(monkeypatch)
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    # Same basename, different keys: no collision
+    _s3_object(stubber, "a/config.yaml", '"e1"', b"A")
+    _s3_object(stubber, "b/config.yaml", '"e2"', b"B")
+    assert cf.fetch_content("s3://b/a/config.yaml") == "A"
+    assert cf.fetch_content("s3://b/b/config.yaml") == "B"
+    # Checked once per run
+    assert cf.fetch_content("s3://b/a/config.yaml") == "A"
+
+    # Next run: unchanged object is only checked, a changed one is downloaded
+    mod.start_run()
+    stubber.add_response("head_object", {"ETag": '"e1"', "ContentLength": 1}, {"Bucket": "b", "Key": "a/config.yaml"})
+    _s3_object(stubber, "b/config.yaml", '"e3"', b"B2")
+    assert cf.fetch_content("s3://b/a/config.yaml") == "A"
+    assert cf.fetch_content("s3://b/b/config.yaml") == "B2"
+    stubber.assert_no_pending_responses()
+
+
+def test_s3_large_objects_use_ranged_downloads(monkeypatch, tmp_path):
+    stubber = _stubbed_s3(monkeypatch)
+    monkeypatch.setenv("STRUCT_OBJECT_CHUNK_MB", str(4 / (1024 * 1024)))
+    monkeypatch.setenv("STRUCT_OBJECT_CONCURRENCY", "1")
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    _s3_object(stubber, "big.txt", '"e"', b"0123456789", ranges=[(0, 3), (4, 7), (8, 9)])
+
+    assert cf.fetch_content("s3://b/big.txt") == "0123456789"
+    stubber.assert_no_pending_responses()
+
+
+def test_s3_missing_key_raises_file_not_found(monkeypatch, tmp_path):
+    stubber = _stubbed_s3(monkeypatch)
+    stubber.add_client_error("head_object", service_error_code="404", http_status_code=404)
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    with pytest.raises(FileNotFoundError):
+        cf.fetch_content("s3://b/missing.txt")
+
+
+def test_s3_client_is_shared(monkeypatch):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_s3_client", None)
+    monkeypatch.setenv("STRUCT_S3_ENDPOINT_URL", "http://localhost:9000")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    client = mod.s3_client()
+
+    assert mod.s3_client() is client
+    assert client.meta.endpoint_url == "http://localhost:9000"
+
+
+BINARY = b"\x89PNG\r\n\x1a\n\x00\xff\xfe" * 5
+
+
+def test_open_binary_streams_http_bodies_through_the_cache(monkeypatch, tmp_path):
+    url = "https://example.com/logo.png"
+    calls = _archive_session(monkeypatch, [
+        _ArchiveResp(BINARY, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"}),
+        _ArchiveResp(status_code=304),
+    ])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    with cf.open_binary(url) as f:
+        assert f.read() == BINARY
+    with cf.open_binary(url) as f:  # fresh: no request
+        assert f.read() == BINARY
+    assert len(calls) == 1
+
+    meta_path = next((tmp_path / "cache" / "blobs").glob("*.meta.json"))
+    meta = json.loads(meta_path.read_text())
+    meta["fetched_at"] -= 120
+    meta_path.write_text(json.dumps(meta))
+    with cf.open_binary(url) as f:
+        assert f.read() == BINARY
+    assert calls[1] == (url, {"If-None-Match": '"v1"'})
+
+
+def test_open_binary_reads_archive_members_by_offset(monkeypatch, tmp_path):
+    import struct_module.content_fetcher as mod
+    monkeypatch.setattr(mod, "_github_archives", {})
+    _archive_session(monkeypatch, [_ArchiveResp(_tarball({"a.txt": "a", "img/x.bin": "\x00\x01", "z.txt": "z"}))])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    with cf.open_binary("githubarchive://owner/repo/main/img/x.bin") as f:
+        assert f.read(1) == b"\x00"
+        assert f.read() == b"\x01"
+
+
+def test_prefetch_maps_binary_sources_to_openers(tmp_path):
+    png = tmp_path / "logo.png"
+    png.write_bytes(BINARY)
+    data = tmp_path / "blob.dat"
+    data.write_bytes(BINARY)
+    text = tmp_path / "a.txt"
+    text.write_text("text")
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    locations = [f"file://{p}" for p in (png, data, text)]
+
+    results = cf.prefetch(locations, binary={f"file://{png}"})
+
+    assert results[f"file://{text}"] == "text"
+    for path in (png, data):
+        # blob.dat is not valid UTF-8, so it is detected as binary too
+        with results[f"file://{path}"]() as f:
+            assert f.read() == BINARY
+
+
+def test_binary_opener_reads_what_it_resolved(monkeypatch, tmp_path):
+    import gc
+    url = "https://example.com/logo.png"
+    calls = _archive_session(monkeypatch, [_ArchiveResp(BINARY, headers={"ETag": '"v1"'})])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    opener = cf.binary_opener(url)
+    # Another process refreshes the cache entry while this one uses it
+    body_path, _ = cf._http_blob_paths(url)
+    replacement = tmp_path / "new"
+    replacement.write_bytes(b"changed")
+    os.replace(replacement, body_path)
+
+    for _ in range(3):
+        with opener() as f:
+            assert f.read() == BINARY
+    assert len(calls) == 1
+
+    del opener
+    gc.collect()
+    assert list((tmp_path / "cache" / "snapshots").iterdir()) == []
+
+
+class _BodyResp(_ArchiveResp):
+    @property
+    def content(self):
+        return self.body
+
+    @property
+    def text(self):
+        return self.body.decode("latin-1")
+
+
+def test_prefetch_keeps_undeclared_binary_https_bodies_raw(monkeypatch, tmp_path):
+    monkeypatch.setenv("STRUCT_HTTP_CACHE_TTL", "0")
+    url = "https://example.com/download?id=logo"
+    calls = _archive_session(monkeypatch, [
+        _BodyResp(BINARY, headers={"ETag": '"v1"', "Content-Type": "image/png"}),
+        _BodyResp(status_code=304),
+    ])
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+
+    opener = cf.prefetch([url])[url]
+
+    with opener() as f:
+        assert f.read() == BINARY
+    assert len(calls) == 1
+    assert not cf._http_cache_paths(url)[0].exists()
+
+    # The next run goes straight to the binary cache and revalidates it
+    opener = ContentFetcher(cache_dir=tmp_path / "cache").prefetch([url])[url]
+    with opener() as f:
+        assert f.read() == BINARY
+    assert calls[1] == (url, {"If-None-Match": '"v1"'})
+
+
+def test_binary_opener_spools_git_blobs(monkeypatch, tmp_path):
+    upstream = tmp_path / "upstream"
+    upstream.mkdir()
+    (upstream / "logo.png").write_bytes(BINARY)
+    _git("init", "-q", "-b", "main", cwd=upstream)
+    _git("add", ".", cwd=upstream)
+    _git("commit", "-q", "-m", "v1", cwd=upstream)
+
+    def local_run(args, check):
+        args = [f"file://{upstream}" if a == "https://github.com/owner/repo.git" else a for a in args]
+        return _real_run(args, check=check, capture_output=True)
+
+    monkeypatch.setattr(subprocess, "run", local_run)
+    monkeypatch.setenv("STRUCT_DENY_NETWORK", "1")
+    cf = ContentFetcher(cache_dir=tmp_path / "cache")
+    opener = cf.binary_opener("github://owner/repo/main/logo.png")
+    processes = []
+    monkeypatch.setattr(subprocess, "Popen", lambda *a, **k: processes.append(a))
+
+    for _ in range(2):
+        with opener() as f:
+            assert f.read() == BINARY
+    assert processes == []
+
+
+def test_process_stream_raises_when_the_process_fails():
+    from struct_module.content_fetcher import _ProcessStream
+    failing = _ProcessStream(subprocess.Popen(["sh", "-c", "printf partial; exit 3"], stdout=subprocess.PIPE))
+    assert failing.read() == b"partial"
+    with pytest.raises(OSError, match="status 3"):
+        failing.close()
+    assert failing.closed
+
+    # Closing before the end is not a failure, even if the process dies
+    endless = _ProcessStream(subprocess.Popen(["yes"], stdout=subprocess.PIPE))
+    assert endless.read(2) == b"y\n"
+    endless.close()
@@ -0,0 +1,124 @@
+import argparse
+import os
+
+import pytest
+
+from struct_module import filters
+from struct_module.commands.fetch import FetchCommand
+from struct_module.commands.generate import GenerateCommand
+from struct_module.content_fetcher import CacheMissError
+
+
+class _Resp:
+  def __init__(self, text):
+    self.text = text
+    self.status_code = 200
+    self.headers = {}
+
+  def raise_for_status(self):
+    return None
+
+
+def _setup(tmp_path, monkeypatch):
+  # Keep the fetch cache and lookups of this test out of the real home
+  monkeypatch.setenv("HOME", str(tmp_path / "home"))
+  monkeypatch.delenv("STRUCT_OFFLINE", raising=False)
+  filters.cache.clear()
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - LICENSE:
+      file: https://example.com/LICENSE
+folders:
+  - ci:
+      struct: child
+"""
+  )
+  (structures / 'child.yaml').write_text(
+    """
+files:
+  - version.txt: '{{@ "owner/tool" | latest_release @}}'
+"""
+  )
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+  return structures, store
+
+
+def _generate(tmp_path, structures, store, offline=True):
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  argv = ['root', str(tmp_path / 'out'), '-s', str(structures), '-n', str(store), '--non-interactive']
+  if offline:
+    argv.append('--offline')
+  args = parser.parse_args(argv)
+  return command.execute(args)
+
+
+def test_fetch_warms_the_cache_for_offline_generate(tmp_path, monkeypatch):
+  structures, store = _setup(tmp_path, monkeypatch)
+  requested = []
+
+  class Session:
+    def get(self, url, timeout=None, headers=None):
+      requested.append(url)
+      return _Resp("MIT License")
+
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: Session())
+  monkeypatch.setattr(filters, "_latest_release", lambda repo: "v2.0.0")
+
+  parser = argparse.ArgumentParser()
+  command = FetchCommand(parser)
+  results = command.execute(parser.parse_args(['root', '-s', str(structures)]))
+
+  assert results == {"https://example.com/LICENSE": "MIT License", "latest_release:owner/tool": "v2.0.0"}
+
+  # No network from here on
+  def no_network(*args, **kwargs):
+    raise AssertionError("network used in offline mode")
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", no_network)
+  monkeypatch.setattr(filters, "_latest_release", no_network)
+  filters.cache.clear()
+
+  summary = _generate(tmp_path, structures, store)
+
+  assert summary["created"] == 2
+  assert "STRUCT_OFFLINE" not in os.environ
+  assert (tmp_path / 'out' / 'LICENSE').read_text() == "MIT License\n"
+  assert (tmp_path / 'out' / 'ci' / 'version.txt').read_text() == "v2.0.0\n"
+
+
+def test_offline_generate_fails_fast_on_cache_miss(tmp_path, monkeypatch):
+  structures, store = _setup(tmp_path, monkeypatch)
+
+  def no_network(*args, **kwargs):
+    raise AssertionError("network used in offline mode")
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", no_network)
+
+  summary = _generate(tmp_path, structures, store)
+
+  assert summary["created"] == 0
+  assert not (tmp_path / 'out' / 'LICENSE').exists()
+
+
+def test_offline_generate_reports_uncached_lookups(tmp_path, monkeypatch, caplog):
+  structures, store = _setup(tmp_path, monkeypatch)
+  (structures / 'root.yaml').write_text("files:\n  - version.txt: '{{@ \"owner/tool\" | latest_release @}}'\n")
+  monkeypatch.setattr(filters, "_latest_release", lambda repo: pytest.fail("network used in offline mode"))
+
+  summary = _generate(tmp_path, structures, store)
+
+  assert summary["created"] == 0
+  assert "latest_release of owner/tool is not in the cache" in caplog.text
+  assert "struct fetch" in caplog.text
+  assert "STRUCT_OFFLINE" not in os.environ
+
+
+def test_offline_lookups_come_from_the_cache(tmp_path, monkeypatch):
+  _setup(tmp_path, monkeypatch)
+  monkeypatch.setenv("STRUCT_OFFLINE", "1")
+
+  with pytest.raises(CacheMissError):
+    filters.get_default_branch("owner/unknown")
@@ -56,3 +56,78 @@ def test_fetch_content_renders_template(monkeypatch):
     assert file_item.content == "Hello, World!"
     assert rendered["content"] == "Hello, {{@ name @}}!"
     assert rendered["vars"]["name"] == "World"
+
+
+def test_binary_source_is_copied_without_rendering(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    data = b"{{@ name @}}\x00\xff" * 1000
+    source = tmp_path / "blob.dat"
+    source.write_bytes(data)
+    file_item = FileItem({
+        "name": "out/blob.dat",
+        "file": f"file://{source}",
+        "config_variables": [],
+        "input_store": "/tmp/input.json",
+    })
+    assert not file_item.binary
+
+    file_item.fetch_content()
+    file_item.apply_template_variables({"name": "World"})
+    result = file_item.create(str(tmp_path))
+
+    # The invalid UTF-8 source is detected as binary and copied verbatim
+    assert file_item.binary
+    assert result["action"] == "created"
+    assert (tmp_path / "out" / "blob.dat").read_bytes() == data
+    assert file_item.create(str(tmp_path))["action"] == "unchanged"
+
+
+def test_failed_binary_copy_keeps_the_existing_file(tmp_path):
+    import io
+    import os
+
+    class Broken(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            raise OSError("connection lost")
+
+    target = tmp_path / "logo.png"
+    target.write_bytes(b"old")
+    os.chmod(target, 0o640)
+    file_item = FileItem({
+        "name": "logo.png",
+        "file": "https://example.com/logo.png",
+        "config_variables": [],
+        "input_store": "/tmp/input.json",
+        "prefetched_content": Broken,
+    })
+    file_item.apply_template_variables({})
+
+    with pytest.raises(OSError):
+        file_item.create(str(tmp_path))
+    assert target.read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["logo.png"]
+
+    file_item.prefetched_content = lambda: io.BytesIO(b"\x89PNG new")
+    assert file_item.create(str(tmp_path))["action"] == "updated"
+    assert target.read_bytes() == b"\x89PNG new"
+    assert os.stat(target).st_mode & 0o777 == 0o640
+
+
+def test_binary_false_keeps_rendering_text(tmp_path):
+    source = tmp_path / "logo.png"
+    source.write_text("Hello, {{@ file_name @}}!")
+    file_item = FileItem({
+        "name": "logo.png",
+        "file": f"file://{source}",
+        "binary": False,
+        "config_variables": [],
+        "input_store": "/tmp/input.json",
+    })
+
+    file_item.fetch_content()
+
+    assert not file_item.binary
+    assert file_item.content == "Hello, logo.png!"
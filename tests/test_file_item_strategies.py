@@ -1,4 +1,5 @@
 import argparse
+import os
 import logging
 from pathlib import Path
 
@@ -140,3 +141,36 @@ def test_dry_run_diff_summary_counts(tmp_path, caplog):
     # Summary counters
     assert '[DRY RUN] Would create:' in logs or 'Would create:' in logs
     assert '[DRY RUN] Would update:' in logs or 'Would update:' in logs
+
+
+def test_overwrite_leaves_identical_file_untouched(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    command = GenerateCommand(parser)
+
+    base_dir = tmp_path / 'base'
+    base_dir.mkdir(parents=True, exist_ok=True)
+    same = base_dir / 'same.txt'
+    same.write_text('same\n')
+    (base_dir / 'other.txt').write_text('old\n')
+    os.utime(same, (1_000_000, 1_000_000))
+
+    config = {
+        'files': [
+            {'same.txt': 'same'},
+            {'other.txt': 'new'},
+        ],
+        'folders': []
+    }
+
+    args = _base_args(parser, tmp_path)
+
+    with pytest.MonkeyPatch().context() as mp:
+        mp.setattr(command, '_load_yaml_config', lambda *_: config)
+        summary = command._create_structure(args)
+
+    assert os.stat(same).st_mtime == 1_000_000
+    assert summary['unchanged'] == 1
+    assert summary['updated'] == 1
+    assert 'Unchanged:' in caplog.text
@@ -0,0 +1,88 @@
+import argparse
+import json
+
+import pytest
+
+from struct_module import structure_loader
+from struct_module.commands.generate_batch import GenerateBatchCommand
+
+
+def _setup(tmp_path):
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'svc.yaml').write_text(
+    """
+files:
+  - README.md: "{{@ name @}} owned by {{@ mappings.team @}}"
+"""
+  )
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+  return structures, store
+
+
+def _parse(tmp_path, batch, extra=()):
+  parser = argparse.ArgumentParser()
+  command = GenerateBatchCommand(parser)
+  structures, store = _setup(tmp_path)
+  args = parser.parse_args([str(batch), '-s', str(structures), '-n', str(store), *extra])
+  return command, args
+
+
+@pytest.mark.parametrize('processes', ['1', '2'])
+def test_generate_batch_runs_every_target(tmp_path, processes):
+  batch = tmp_path / 'batch.yaml'
+  batch.write_text(
+    f"""
+defaults:
+  mappings:
+    team: platform
+targets:
+  - structure_definition: svc
+    base_path: {tmp_path / 'a'}
+    vars:
+      name: alpha
+  - structure_definition: svc
+    base_path: {tmp_path / 'b'}
+    vars:
+      name: beta
+"""
+  )
+  command, args = _parse(tmp_path, batch, ['-P', processes])
+
+  results = command.execute(args)
+
+  assert [r['created'] for r in results] == [1, 1]
+  assert (tmp_path / 'a' / 'README.md').read_text() == 'alpha owned by platform\n'
+  assert (tmp_path / 'b' / 'README.md').read_text() == 'beta owned by platform\n'
+
+
+def test_generate_batch_shares_parsed_definitions(tmp_path, monkeypatch):
+  structure_loader.clear_structure_cache()
+  calls = {"count": 0}
+  real_parse = structure_loader.parse_yaml
+
+  def counting_parse(stream):
+    calls["count"] += 1
+    return real_parse(stream)
+
+  monkeypatch.setattr(structure_loader, "parse_yaml", counting_parse)
+
+  batch = tmp_path / 'batch.json'
+  batch.write_text(json.dumps([
+    {'structure_definition': 'svc', 'base_path': str(tmp_path / f'r{i}'), 'vars': {'name': str(i)}, 'mappings': {'team': 't'}}
+    for i in range(3)
+  ]))
+  command, args = _parse(tmp_path, batch)
+
+  results = command.execute(args)
+
+  assert len(results) == 3
+  assert calls["count"] == 1
+
+
+def test_generate_batch_rejects_incomplete_targets(tmp_path):
+  batch = tmp_path / 'batch.yaml'
+  batch.write_text("- structure_definition: svc\n")
+  command, args = _parse(tmp_path, batch)
+  assert command.execute(args) is None
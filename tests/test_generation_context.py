@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from struct_module.file_item import FileItem
+from struct_module.generation_context import GenerationContext
+
+
+def _context(tmp_path, mappings=None):
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+  return GenerationContext(str(store), True, mappings, cache_dir=tmp_path / 'cache')
+
+
+def test_file_items_share_context_objects(tmp_path):
+  context = _context(tmp_path)
+  variables = [{'project': {'type': 'string', 'default': 'demo'}}]
+
+  with patch('struct_module.file_item.ContentFetcher') as fetcher_cls, \
+       patch('struct_module.file_item.TemplateRenderer') as renderer_cls:
+    items = [
+      FileItem({'name': f'f{i}.txt', 'content': 'x', 'config_variables': variables}, context=context)
+      for i in range(3)
+    ]
+    fetcher_cls.assert_not_called()
+    renderer_cls.assert_not_called()
+
+  assert all(i.content_fetcher is context.content_fetcher for i in items)
+  assert all(i.model_wrapper is context.model_wrapper for i in items)
+  assert items[0].template_renderer is items[1].template_renderer
+  assert items[0].template_renderer.env is context.template_renderer.env
+  assert items[0].template_renderer.config_variables is variables
+
+
+def test_agent_not_built_without_prompts(tmp_path):
+  with patch('struct_module.model_wrapper.Agent') as agent_cls:
+    context = _context(tmp_path)
+    item = FileItem({'name': 'a.txt', 'content': 'hello {{@ project @}}', 'config_variables': []}, context=context)
+    item.process_prompt()
+    item.apply_template_variables({'project': 'p'})
+    agent_cls.assert_not_called()
+  assert item.content == 'hello p'
+
+
+def test_renderer_views_keep_their_own_variables(tmp_path):
+  context = _context(tmp_path, {'team': 'ops'})
+  a = context.renderer_for([{'x': {'type': 'string', 'default': 'A'}}])
+  b = context.renderer_for([{'x': {'type': 'string', 'default': 'B'}}])
+  assert a.get_defaults_from_config() == {'x': 'A'}
+  assert b.get_defaults_from_config() == {'x': 'B'}
+  assert a.render_template('{{@ mappings.team @}}', {}) == 'ops'
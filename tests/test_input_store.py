@@ -34,3 +34,23 @@ def test_save(input_store):
     with open(input_store.input_file, 'r') as f:
         data = json.load(f)
     assert data == {"key": "value"}
+
+def test_save_keeps_the_file_mode(input_store):
+    os.chmod(input_store.input_file, 0o644)
+    input_store.load()
+    input_store.set_value("key", "value")
+    input_store.save()
+    assert os.stat(input_store.input_file).st_mode & 0o777 == 0o644
+
+def test_save_keeps_answers_saved_by_another_process(tmp_path):
+    first = InputStore(tmp_path / "input.json")
+    second = InputStore(tmp_path / "input.json")
+    first.load()
+    second.load()
+    first.set_value("first", "a")
+    first.save()
+    second.set_value("second", "b")
+    second.save()
+    with open(tmp_path / "input.json") as f:
+        assert json.load(f) == {"first": "a", "second": "b"}
+    assert second.get_data() == {"first": "a", "second": "b"}
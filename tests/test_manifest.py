@@ -0,0 +1,150 @@
+import argparse
+import json
+
+import pytest
+
+from struct_module.commands.generate import GenerateCommand
+from struct_module.manifest import GenerationManifest, hash_obj
+
+
+def _setup(tmp_path):
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - a.txt: "a {{@ project @}}"
+  - b.txt: "static"
+"""
+  )
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+  return structures, store
+
+
+def _run(tmp_path, structures, store, vars='project=one'):
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args(['root', str(tmp_path / 'out'), '--incremental'])
+  args.structures_path = str(structures)
+  args.input_store = str(store)
+  args.vars = vars
+  args.non_interactive = True
+  return command._create_structure(args, print_summary=False)
+
+
+def test_incremental_skips_unchanged_and_rebuilds_changed(tmp_path):
+  structures, store = _setup(tmp_path)
+
+  first = _run(tmp_path, structures, store)
+  assert first['created'] == 2 and first['rebuilt'] == 2
+
+  manifest = json.loads((tmp_path / 'out' / '.struct' / 'manifest.json').read_text())
+  assert set(manifest['files']) == {'a.txt', 'b.txt'}
+  assert set(manifest['files']['a.txt']['inputs']) == {'template', 'vars', 'mappings', 'answers'}
+
+  second = _run(tmp_path, structures, store)
+  assert second['unchanged'] == 2
+  assert second['rebuilt'] == 0 and second['updated'] == 0
+
+  # Structure vars are an input of every file in that structure
+  # (b.txt renders the same bytes and is only counted as unchanged)
+  third = _run(tmp_path, structures, store, vars='project=two')
+  assert third['rebuilt'] == 1 and third['unchanged'] == 1
+  assert (tmp_path / 'out' / 'a.txt').read_text() == 'a two\n'
+
+
+def test_first_incremental_run_over_an_up_to_date_tree_counts_files_once(tmp_path):
+  structures, store = _setup(tmp_path)
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args(['root', str(tmp_path / 'out'), '-s', str(structures), '-n', str(store),
+                            '--vars', 'project=one', '--non-interactive'])
+  command._create_structure(args, print_summary=False)
+
+  summary = _run(tmp_path, structures, store)
+
+  assert summary['unchanged'] == 2
+  assert summary['rebuilt'] == 0
+  assert set(json.loads((tmp_path / 'out' / '.struct' / 'manifest.json').read_text())['files']) == {'a.txt', 'b.txt'}
+
+
+def test_incremental_rebuilds_when_output_was_edited(tmp_path):
+  structures, store = _setup(tmp_path)
+  _run(tmp_path, structures, store)
+
+  (tmp_path / 'out' / 'b.txt').write_text('edited by hand\n')
+  summary = _run(tmp_path, structures, store)
+
+  assert summary['unchanged'] == 1
+  assert summary['rebuilt'] == 1
+  assert (tmp_path / 'out' / 'b.txt').read_text() == 'static\n'
+
+
+class _Resp:
+  def __init__(self, text):
+    self.text = text
+    self.status_code = 200
+    self.headers = {}
+
+  def raise_for_status(self):
+    return None
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+  monkeypatch.setenv("HOME", str(tmp_path / "home"))
+  monkeypatch.delenv("STRUCT_OFFLINE", raising=False)
+  # Revalidate on every run instead of serving the body for 300s
+  monkeypatch.setenv("STRUCT_HTTP_CACHE_TTL", "0")
+  body = {"text": "v1"}
+  monkeypatch.setattr("struct_module.content_fetcher.http_session", lambda: type("S", (), {
+    "get": lambda self, url, timeout=None, headers=None: _Resp(body["text"]),
+  })())
+  return body
+
+
+def test_incremental_rebuilds_when_only_the_upstream_body_changed(tmp_path, upstream):
+  structures, store = _setup(tmp_path)
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - remote.txt:
+      file: https://example.com/remote.txt
+"""
+  )
+  _run(tmp_path, structures, store)
+  assert _run(tmp_path, structures, store)['unchanged'] == 1
+
+  upstream["text"] = "v2"
+  summary = _run(tmp_path, structures, store)
+
+  assert summary['rebuilt'] == 1
+  assert (tmp_path / 'out' / 'remote.txt').read_text() == "v2\n"
+
+
+def test_incremental_rebuilds_when_a_stored_answer_changed(tmp_path):
+  structures, store = _setup(tmp_path)
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - owner.txt: "{{@ owner @}}"
+"""
+  )
+  store.write_text(json.dumps({'owner': 'alice'}))
+  _run(tmp_path, structures, store)
+  assert _run(tmp_path, structures, store)['unchanged'] == 1
+
+  store.write_text(json.dumps({'owner': 'bob'}))
+  summary = _run(tmp_path, structures, store)
+
+  assert summary['rebuilt'] == 1
+  assert (tmp_path / 'out' / 'owner.txt').read_text() == 'bob\n'
+
+
+def test_manifest_ignores_unknown_versions(tmp_path):
+  (tmp_path / '.struct').mkdir()
+  (tmp_path / '.struct' / 'manifest.json').write_text(json.dumps({'version': 999, 'files': {'x': {}}}))
+  manifest = GenerationManifest(str(tmp_path)).load()
+  assert manifest.previous == {}
+  assert not manifest.is_unchanged('x', hash_obj({}))
@@ -0,0 +1,257 @@
+import argparse
+import datetime
+import json
+
+import pytest
+
+from struct_module import mappings_store
+from struct_module.commands.generate import GenerateCommand
+from struct_module.filters import to_json
+from struct_module.structure_loader import parse_yaml
+from struct_module.mappings_store import LazyMapping, MappingsIndex, OverlayMapping, close_mappings, mappings_fingerprint, merge_layers, open_mappings, to_plain
+
+
+def _write_mappings(tmp_path):
+  path = tmp_path / 'mappings.yaml'
+  path.write_text(
+    """
+mappings:
+  teams:
+    devops: devops-team
+    "1": one
+  accounts:
+    prod: 987654321
+    regions: [us-east-1, eu-west-1]
+"""
+  )
+  return path
+
+
+def _count_parses(monkeypatch):
+  calls = {"count": 0}
+  real_parse = mappings_store.parse_yaml
+
+  def counting_parse(stream):
+    calls["count"] += 1
+    return real_parse(stream)
+
+  monkeypatch.setattr(mappings_store, "parse_yaml", counting_parse)
+  return calls
+
+
+def test_index_resolves_keys_lazily(tmp_path):
+  root = MappingsIndex(str(_write_mappings(tmp_path)), tmp_path / 'index').open()
+
+  mappings = root['mappings']
+  assert isinstance(mappings, LazyMapping)
+  assert list(mappings) == ['teams', 'accounts']
+  assert mappings['teams']['devops'] == 'devops-team'
+  assert mappings['accounts']['regions'] == ['us-east-1', 'eu-west-1']
+  assert mappings['accounts'].get('missing') is None
+  with pytest.raises(KeyError):
+    mappings['nope']
+  assert to_json(root['mappings']['teams']) == '{"devops": "devops-team", "1": "one"}'
+
+
+def test_index_keeps_values_json_cannot_represent(tmp_path):
+  source = tmp_path / 'mappings.yaml'
+  source.write_text("releases:\n  1: 2024-01-01\n  latest: {2: two}\n")
+  root = MappingsIndex(str(source), tmp_path / 'index').open()
+
+  assert root == parse_yaml(source.read_text())
+  assert list(root['releases']) == [1, 'latest']
+  assert root['releases'][1] == datetime.date(2024, 1, 1)
+  assert root['releases']['latest'][2] == 'two'
+
+
+def test_index_is_reused_until_source_changes(tmp_path, monkeypatch):
+  calls = _count_parses(monkeypatch)
+  source = _write_mappings(tmp_path)
+  index_dir = tmp_path / 'index'
+
+  first = MappingsIndex(str(source), index_dir).open()
+  second = MappingsIndex(str(source), index_dir).open()
+  assert calls["count"] == 1
+  assert mappings_fingerprint(first) == mappings_fingerprint(second)
+
+  source.write_text("mappings:\n  teams:\n    devops: renamed-team\n")
+  third = MappingsIndex(str(source), index_dir).open()
+  assert calls["count"] == 2
+  assert third['mappings']['teams']['devops'] == 'renamed-team'
+  assert mappings_fingerprint(third) != mappings_fingerprint(first)
+
+
+def test_generate_with_sqlite_mappings_backend(tmp_path, monkeypatch):
+  monkeypatch.setenv('STRUCT_MAPPINGS_INDEX_DIR', str(tmp_path / 'index'))
+  source = _write_mappings(tmp_path)
+  overlay = tmp_path / 'overlay.yaml'
+  overlay.write_text("mappings:\n  teams:\n    devops: sre-team\n")
+  structure = tmp_path / 'root.yaml'
+  structure.write_text(
+    'files:\n  - owners.txt: "{{@ mappings.mappings.teams.devops @}} {{@ mappings.mappings.accounts.prod @}}"\n'
+  )
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args([
+    str(structure), str(tmp_path / 'out'), '-n', str(store), '--non-interactive',
+    '--mappings-file', str(source), '--mappings-file', str(overlay), '--mappings-backend', 'sqlite',
+  ])
+  command.execute(args)
+
+  assert (tmp_path / 'out' / 'owners.txt').read_text() == 'sre-team 987654321\n'
+  assert open_mappings(str(source)) is open_mappings(str(source))
+
+
+@pytest.mark.parametrize("backend", ["yaml", "sqlite"])
+def test_mappings_keys_named_fingerprint_are_rendered(tmp_path, monkeypatch, backend):
+  monkeypatch.setenv('STRUCT_MAPPINGS_INDEX_DIR', str(tmp_path / 'index'))
+  base = tmp_path / 'm1.yaml'
+  base.write_text("team:\n  fingerprint: abc\n  name: platform\n")
+  overlay = tmp_path / 'm3.yaml'
+  overlay.write_text("team:\n  name: infra\n")
+  structure = tmp_path / 'root.yaml'
+  structure.write_text('files:\n  - team.txt: "{{@ mappings.team.fingerprint @}} {{@ mappings.team.name @}}"\n')
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args([
+    str(structure), str(tmp_path / 'out'), '-n', str(store), '--non-interactive',
+    '--mappings-file', str(base), '--mappings-file', str(overlay), '--mappings-backend', backend,
+  ])
+  command.execute(args)
+
+  assert (tmp_path / 'out' / 'team.txt').read_text() == 'abc infra\n'
+
+
+def test_single_indexed_mappings_file_renders_fingerprint_key(tmp_path, monkeypatch):
+  monkeypatch.setenv('STRUCT_MAPPINGS_INDEX_DIR', str(tmp_path / 'index'))
+  source = tmp_path / 'm1.yaml'
+  source.write_text("team:\n  fingerprint: abc\n")
+  structure = tmp_path / 'root.yaml'
+  structure.write_text('files:\n  - team.txt: "{{@ mappings.team.fingerprint @}}"\n')
+  store = tmp_path / 'input.json'
+  store.write_text('{}')
+
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = parser.parse_args([
+    str(structure), str(tmp_path / 'out'), '-n', str(store), '--non-interactive',
+    '--mappings-file', str(source), '--mappings-backend', 'sqlite',
+  ])
+  command.execute(args)
+
+  assert (tmp_path / 'out' / 'team.txt').read_text() == 'abc\n'
+
+
+def test_overlay_matches_deep_merge():
+  base = {'teams': {'a': 1, 'b': {'x': 1, 'y': 2}}, 'list': [1], 'scalar': {'was': 'dict'}}
+  env = {'teams': {'b': {'y': 20, 'z': 30}, 'c': 3}, 'scalar': 'now-a-string'}
+  team = {'teams': {'b': 'flat'}, 'extra': {'k': 'v'}, 'scalar': {'dict': 'again'}}
+  command = GenerateCommand(argparse.ArgumentParser())
+
+  expected = command._deep_merge_dicts(command._deep_merge_dicts(base, env), team)
+  overlay = merge_layers([base, env, team])
+
+  assert isinstance(overlay, OverlayMapping)
+  assert overlay == expected
+  assert list(overlay) == list(expected)
+  assert to_plain(overlay) == expected
+  # nothing was copied: untouched subtrees are the original objects
+  assert overlay['list'] is base['list']
+  assert overlay['extra'] is team['extra']
+
+
+def test_overlay_only_visits_requested_keys():
+  class Recording(dict):
+    def __init__(self, *args, **kwargs):
+      super().__init__(*args, **kwargs)
+      self.reads = []
+
+    def __getitem__(self, key):
+      self.reads.append(key)
+      return super().__getitem__(key)
+
+  base = Recording(teams={'a': 1}, accounts={'prod': 1})
+  overlay = merge_layers([base, {'teams': {'b': 2}}])
+
+  assert overlay['teams']['b'] == 2
+  assert overlay['teams']['a'] == 1
+  assert base.reads == ['teams']
+
+
+@pytest.mark.parametrize('backend', ['yaml', 'sqlite'])
+def test_remote_mappings_are_parsed_once(tmp_path, monkeypatch, backend):
+  monkeypatch.setenv('STRUCT_MAPPINGS_INDEX_DIR', str(tmp_path / 'index'))
+  monkeypatch.setattr(mappings_store, '_remote_parsed', {})
+  calls = _count_parses(monkeypatch)
+  fetched = []
+
+  def fake_fetch(self, location):
+    fetched.append(location)
+    return "mappings:\n  teams:\n    devops: remote-team\n"
+
+  monkeypatch.setattr('struct_module.content_fetcher.ContentFetcher.fetch_content', fake_fetch)
+  command = GenerateCommand(argparse.ArgumentParser())
+
+  first = command._load_mappings(['s3://bucket/mappings.yaml'], backend)
+  monkeypatch.setattr(mappings_store, '_remote_parsed', {})
+  second = command._load_mappings(['s3://bucket/mappings.yaml'], backend)
+
+  assert fetched == ['s3://bucket/mappings.yaml'] * 2
+  assert calls['count'] == 1
+  assert first['mappings']['teams']['devops'] == 'remote-team'
+  assert to_plain(second) == to_plain(first)
+
+
+def test_remote_mappings_cache_is_json_and_skips_unrepresentable_catalogs(tmp_path, monkeypatch):
+  monkeypatch.setenv('STRUCT_MAPPINGS_INDEX_DIR', str(tmp_path / 'index'))
+  monkeypatch.setattr(mappings_store, '_remote_parsed', {})
+  bodies = {
+    's3://bucket/plain.yaml': "teams:\n  devops: remote-team\n",
+    's3://bucket/dated.yaml': "released: 2024-01-01\n",
+  }
+  monkeypatch.setattr('struct_module.content_fetcher.ContentFetcher.fetch_content', lambda self, location: bodies[location])
+  command = GenerateCommand(argparse.ArgumentParser())
+
+  command._load_mappings(list(bodies))
+
+  cached = list((tmp_path / 'index' / 'remote').iterdir())
+  assert [path.suffix for path in cached] == ['.json']
+  assert json.loads(cached[0].read_text()) == {'teams': {'devops': 'remote-team'}}
+
+
+def test_remote_mappings_fetch_errors_are_reported(monkeypatch):
+  def failing_fetch(self, location):
+    raise RuntimeError('boom')
+
+  monkeypatch.setattr('struct_module.content_fetcher.ContentFetcher.fetch_content', failing_fetch)
+  command = GenerateCommand(argparse.ArgumentParser())
+  assert command._load_mappings(['https://example.com/m.yaml']) is None
+
+
+def test_fingerprint_of_overlay_does_not_read_indexed_layers(tmp_path, monkeypatch):
+  source = _write_mappings(tmp_path)
+  indexed = MappingsIndex(str(source), tmp_path / 'index').open()
+  overlay = merge_layers([indexed, {'extra': {'k': 'v'}}])
+  before = mappings_fingerprint(overlay)
+
+  monkeypatch.setattr(MappingsIndex, 'resolve', lambda self, path: pytest.fail(f"read {path}"))
+  assert mappings_fingerprint(overlay) == before
+  assert mappings_fingerprint(merge_layers([indexed, {'extra': {'k': 'w'}}])) != before
+
+
+def test_reopening_a_changed_file_closes_the_stale_index(tmp_path):
+  source = _write_mappings(tmp_path)
+  first = open_mappings(str(source), tmp_path / 'index')
+  source.write_text("mappings:\n  teams:\n    devops: renamed-team-name\n")
+  second = open_mappings(str(source), tmp_path / 'index')
+
+  assert first._index._conn is None
+  assert second['mappings']['teams']['devops'] == 'renamed-team-name'
+  close_mappings()
+  assert second._index._conn is None
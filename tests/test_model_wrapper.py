@@ -14,6 +14,9 @@ class TestModelWrapper:
             with patch('struct_module.model_wrapper.Agent') as mock_agent:
                 wrapper = ModelWrapper()
                 assert wrapper.model_name == "openai:gpt-4.1"
+                # Agent is only built when first needed
+                mock_agent.assert_not_called()
+                wrapper.agent
                 mock_agent.assert_called_once_with(model="openai:gpt-4.1")
                 # Should not set placeholder key when real key exists
                 assert os.environ["OPENAI_API_KEY"] == "sk-test-key"
@@ -37,7 +40,8 @@ class TestModelWrapper:
                 mock_logger.warning.assert_called_with(
                     "OPENAI_API_KEY not set. Using placeholder. AI features may not work properly."
                 )
-                # Agent should still be created
+                # Agent should still be created on first use
+                wrapper.agent
                 mock_agent.assert_called_once_with(model="openai:gpt-4.1")
 
     def test_init_with_non_openai_model_no_placeholder(self):
@@ -57,7 +61,8 @@ class TestModelWrapper:
                 assert "OPENAI_API_KEY" not in os.environ
                 # Should not log warning
                 mock_logger.warning.assert_not_called()
-                # Agent should still be created
+                # Agent should still be created on first use
+                wrapper.agent
                 mock_agent.assert_called_once_with(model="anthropic:claude-3")
 
     def test_generate_content_with_placeholder_key(self):
@@ -0,0 +1,224 @@
+import argparse
+import threading
+import time
+
+import pytest
+
+from struct_module.commands.generate import GenerateCommand
+from struct_module.plan import GenerationPlan, PlanNode, run_plan
+
+
+def _write_structures(tmp_path):
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - README.md: "root {{@ project @}}"
+folders:
+  - svc-a:
+      struct: child
+      with:
+        name: a
+  - svc-b:
+      struct:
+        - child
+        - other
+      with:
+        name: b
+"""
+  )
+  (structures / 'child.yaml').write_text(
+    """
+files:
+  - child.txt: "child {{@ name @}} of {{@ project @}}"
+"""
+  )
+  (structures / 'other.yaml').write_text(
+    """
+files:
+  - other.txt: "other {{@ name @}}"
+"""
+  )
+  return structures
+
+
+def _args(parser, tmp_path, structures, jobs):
+  store = tmp_path / f'input-{jobs}.json'
+  store.write_text('{}')
+  args = parser.parse_args(['root', str(tmp_path / f'out-{jobs}')])
+  args.structures_path = str(structures)
+  args.input_store = str(store)
+  args.vars = 'project=demo'
+  args.non_interactive = True
+  args.jobs = jobs
+  return args
+
+
+def test_build_plan_resolves_nested_tree(tmp_path):
+  structures = _write_structures(tmp_path)
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = _args(parser, tmp_path, structures, 1)
+
+  plan = command._build_plan(args)
+
+  kinds = [n.kind for n in plan.nodes]
+  assert kinds.count('structure') == 4
+  assert kinds.count('folder') == 2
+  assert sorted(n.data['name'] for n in plan.files()) == ['README.md', 'child.txt', 'child.txt', 'other.txt']
+  # every node depends only on nodes that come before it
+  for node in plan.nodes:
+    assert all(dep.id < node.id for dep in node.deps)
+  # nested structures hang off their folder node
+  nested = [n for n in plan.nodes if n.kind == 'structure' and n.deps]
+  assert all(dep.kind == 'folder' for n in nested for dep in n.deps)
+  vars_b = [n.data['template_vars'] for n in nested if n.path.endswith('svc-b')]
+  assert vars_b[0] == {'project': 'demo', 'name': 'b'}
+
+
+def test_github_archive_structures_use_the_archive_protocol(tmp_path):
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'root.yaml').write_text(
+    """
+github_archive: true
+files:
+  - a.txt:
+      file: github://owner/repo/main/a.txt
+  - b.txt:
+      file: githubssh://owner/repo/main/b.txt
+  - c.txt:
+      file: https://example.com/c.txt
+"""
+  )
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = _args(parser, tmp_path, structures, 1)
+
+  plan = command._build_plan(args)
+
+  assert [n.data['content']['file'] for n in plan.files()] == [
+    'githubarchive://owner/repo/main/a.txt',
+    'githubarchive://owner/repo/main/b.txt',
+    'https://example.com/c.txt',
+  ]
+
+
+def test_nested_vars_are_layered_not_reparsed(tmp_path):
+  structures = _write_structures(tmp_path)
+  (structures / 'child.yaml').write_text(
+    """
+folders:
+  - deeper:
+      struct: other
+      with:
+        name: "{{@ name @}}-inner"
+"""
+  )
+  vars_file = tmp_path / 'vars.yaml'
+  vars_file.write_text("project: alpha, beta\ntags: [x, y]\nname: from-file\n")
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = _args(parser, tmp_path, structures, 1)
+  args.vars_file = str(vars_file)
+  args.vars = 'name=from-cli'
+
+  plan = command._build_plan(args)
+
+  by_path = {n.path: n.data['template_vars'] for n in plan.nodes if n.kind == 'structure'}
+  root_vars = by_path[args.base_path]
+  assert root_vars == {'project': 'alpha, beta', 'tags': ['x', 'y'], 'name': 'from-cli'}
+  inner = by_path[str(tmp_path / 'out-1' / 'svc-a' / 'deeper')]
+  # values with commas survive nesting and the closest with: layer wins
+  assert inner['project'] == 'alpha, beta'
+  assert inner['name'] == 'a-inner'
+  assert inner.parents['name'] == 'a'
+  assert root_vars['name'] == 'from-cli'
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_generate_with_jobs_matches_sequential(tmp_path, jobs):
+  structures = _write_structures(tmp_path)
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = _args(parser, tmp_path, structures, jobs)
+
+  summary = command._create_structure(args, print_summary=False)
+
+  out = tmp_path / f'out-{jobs}'
+  assert summary['created'] == 4
+  assert summary['folders'] == 2
+  assert (out / 'README.md').read_text() == 'root demo\n'
+  assert (out / 'svc-a' / 'child.txt').read_text() == 'child a of demo\n'
+  assert (out / 'svc-b' / 'other.txt').read_text() == 'other b\n'
+
+
+def test_run_plan_respects_dependencies():
+  plan = GenerationPlan()
+  root = plan.add(PlanNode('structure', '/x'))
+  folder = plan.add(PlanNode('folder', '/x/a', deps=[root]))
+  leaves = [plan.add(PlanNode('file', f'/x/a/{i}', deps=[folder])) for i in range(5)]
+
+  finished = []
+  lock = threading.Lock()
+
+  def handler(node):
+    for dep in node.deps:
+      assert dep in finished
+    time.sleep(0.01)
+    with lock:
+      finished.append(node)
+
+  run_plan(plan, handler, jobs=3)
+  assert len(finished) == len(leaves) + 2
+
+
+def test_run_plan_orders_writers_of_same_path():
+  plan = GenerationPlan()
+  first = plan.add(PlanNode('file', '/x/same'))
+  second = plan.add(PlanNode('file', '/x/same'))
+  assert first in second.deps
+
+
+def test_run_plan_propagates_errors():
+  plan = GenerationPlan()
+  plan.add(PlanNode('file', '/x/a'))
+
+  def handler(node):
+    raise ValueError('boom')
+
+  with pytest.raises(ValueError):
+    run_plan(plan, handler, jobs=2)
+
+
+def test_generate_prefetches_file_sources_once(tmp_path, monkeypatch):
+  structures = tmp_path / 'structures'
+  structures.mkdir()
+  (structures / 'root.yaml').write_text(
+    """
+files:
+  - a.txt:
+      file: https://example.com/shared.txt
+  - b.txt:
+      file: https://example.com/shared.txt
+  - c.txt:
+      file: https://example.com/other.txt
+"""
+  )
+  calls = []
+
+  def fake_fetch(self, location):
+    calls.append(location)
+    return f"body of {location}"
+
+  monkeypatch.setattr('struct_module.content_fetcher.ContentFetcher.fetch_content', fake_fetch)
+
+  parser = argparse.ArgumentParser()
+  command = GenerateCommand(parser)
+  args = _args(parser, tmp_path, structures, 2)
+
+  command._create_structure(args, print_summary=False)
+
+  assert sorted(calls) == ['https://example.com/other.txt', 'https://example.com/shared.txt']
+  assert (tmp_path / 'out-2' / 'b.txt').read_text() == 'body of https://example.com/shared.txt\n'
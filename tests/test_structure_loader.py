@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from struct_module import structure_loader
+from struct_module.structure_loader import load_structure_file, clear_structure_cache
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+  clear_structure_cache()
+  yield
+  clear_structure_cache()
+
+
+def _count_parses(monkeypatch):
+  calls = {"count": 0}
+  real_parse = structure_loader.parse_yaml
+
+  def counting_parse(stream):
+    calls["count"] += 1
+    return real_parse(stream)
+
+  monkeypatch.setattr(structure_loader, "parse_yaml", counting_parse)
+  return calls
+
+
+def test_memory_cache_hits_until_file_changes(tmp_path, monkeypatch):
+  calls = _count_parses(monkeypatch)
+  p = tmp_path / "s.yaml"
+  p.write_text("files:\n  - a.txt: one\n")
+
+  first = load_structure_file(str(p))
+  second = load_structure_file(str(p))
+  assert first is second
+  assert calls["count"] == 1
+
+  p.write_text("files:\n  - a.txt: changed\n")
+  st = os.stat(p)
+  os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+  third = load_structure_file(str(p))
+  assert third["files"][0]["a.txt"] == "changed"
+  assert calls["count"] == 2
+
+
+def test_disk_cache_survives_process_cache_reset(tmp_path, monkeypatch):
+  monkeypatch.setenv("STRUCT_STRUCTURE_CACHE", "1")
+  monkeypatch.setenv("STRUCT_STRUCTURE_CACHE_DIR", str(tmp_path / "cache"))
+  calls = _count_parses(monkeypatch)
+  p = tmp_path / "s.yaml"
+  p.write_text("description: cached\n")
+
+  assert load_structure_file(str(p)) == {"description": "cached"}
+  clear_structure_cache()
+  assert load_structure_file(str(p)) == {"description": "cached"}
+  assert calls["count"] == 1
+  assert list((tmp_path / "cache").iterdir())
+
+
+def test_missing_file_raises(tmp_path):
+  with pytest.raises(FileNotFoundError):
+    load_structure_file(str(tmp_path / "nope.yaml"))
+
+
+def test_disk_cache_stores_json_and_skips_unrepresentable_definitions(tmp_path, monkeypatch):
+  monkeypatch.setenv("STRUCT_STRUCTURE_CACHE", "1")
+  monkeypatch.setenv("STRUCT_STRUCTURE_CACHE_DIR", str(tmp_path / "cache"))
+  plain = tmp_path / "plain.yaml"
+  plain.write_text("description: cached\n")
+  dated = tmp_path / "dated.yaml"
+  dated.write_text("released: 2024-01-01\n")
+
+  load_structure_file(str(plain))
+  load_structure_file(str(dated))
+
+  entries = list((tmp_path / "cache").iterdir())
+  assert len(entries) == 1 and entries[0].suffix == ".json"
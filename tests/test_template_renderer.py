@@ -1,3 +1,5 @@
+import os
+
 import pytest
 from unittest.mock import patch, MagicMock
 from struct_module.template_renderer import TemplateRenderer
@@ -107,6 +109,33 @@ def test_render_template_with_mappings():
     assert rendered_content_dot == "Account: 123456789"
 
 
+class _NoCopyDict(dict):
+    """A mapping that fails if anything copies or iterates it."""
+    def copy(self):
+        raise AssertionError("copied")
+
+    def __iter__(self):
+        raise AssertionError("iterated")
+
+    def keys(self):
+        raise AssertionError("iterated")
+
+    def items(self):
+        raise AssertionError("iterated")
+
+
+def test_render_template_layers_context_without_copying():
+    from collections import ChainMap
+    mappings = _NoCopyDict(team={"owner": "platform"})
+    structure_vars = _NoCopyDict(project="demo", name="structure")
+    renderer = TemplateRenderer([], "/tmp/input.json", True, mappings=mappings)
+
+    vars = ChainMap({"name": "file"}, structure_vars)
+    content = "{{@ name @}} {{@ project @}} {{@ mappings.team.owner @}} {{@ uuid is defined @}}"
+    assert renderer.render_template(content, vars) == "file demo platform True"
+    assert renderer.render_template("{{@ mappings is sameas m @}}", {"m": mappings}) == "True"
+
+
 def test_prompt_with_description_display():
     """Test that variable descriptions are displayed in interactive prompts with Option 4 formatting"""
     config_variables = [
@@ -204,3 +233,103 @@ def test_variable_icon_selection():
     assert renderer._get_variable_icon("version", "string") == "🏷️"
     assert renderer._get_variable_icon("config_path", "string") == "📁"
     assert renderer._get_variable_icon("random_var", "string") == "🔧"
+
+
+def test_templates_are_parsed_once_per_source(monkeypatch):
+    """Rendering and variable discovery share one cached parse per source"""
+    from struct_module import template_renderer as tr
+    monkeypatch.setenv("STRUCT_JINJA_CACHE", "0")
+    tr.clear_template_cache()
+    renderer = TemplateRenderer([], "/tmp/input.json", True)
+    other = TemplateRenderer([], "/tmp/input.json", True)
+    content = "License {{@ holder @}} {{@ year @}}"
+
+    with patch.object(renderer.env, 'parse', wraps=renderer.env.parse) as mock_parse:
+        assert renderer.get_undeclared_variables(content) == {"holder", "year"}
+        assert renderer.render_template(content, {"holder": "A", "year": 1}) == "License A 1"
+        assert other.render_template(content, {"holder": "B", "year": 2}) == "License B 2"
+        other.prompt_for_missing_vars(content, {"holder": "x", "year": "y"})
+        assert mock_parse.call_count == 1
+
+    assert renderer.env is other.env
+
+
+def test_bytecode_cache_skips_compilation_across_processes(tmp_path, monkeypatch):
+    """A warm on-disk cache avoids parsing even with a cold in-memory cache"""
+    from struct_module import template_renderer as tr
+    monkeypatch.setenv("STRUCT_JINJA_CACHE_DIR", str(tmp_path / "jinja"))
+    monkeypatch.setattr(tr, "bytecode_store", tr.BytecodeStore())
+    tr.clear_template_cache()
+    renderer = TemplateRenderer([], "/tmp/input.json", True)
+    content = "{%@ for i in items @%}{{@ i @}}{%@ endfor @%} {{@ name @}}"
+
+    assert renderer.render_template(content, {"items": [1, 2], "name": "x"}) == "12 x"
+    assert tr.bytecode_store.misses == 1
+    assert len(list((tmp_path / "jinja").iterdir())) == 1
+
+    # Simulate a new invocation: the process-level cache is empty
+    tr.clear_template_cache()
+    with patch.object(renderer.env, 'parse', side_effect=AssertionError("should not parse")):
+        assert renderer.get_undeclared_variables(content) == {"items", "name"}
+        assert renderer.render_template(content, {"items": [3], "name": "y"}) == "3 y"
+    assert tr.bytecode_store.hits == 1
+
+
+def test_cached_templates_call_lookup_filters_on_every_render(tmp_path, monkeypatch):
+    """Lookups with constant arguments are not folded into cached code"""
+    from struct_module import filters
+    from struct_module import template_renderer as tr
+    monkeypatch.setenv("STRUCT_JINJA_CACHE_DIR", str(tmp_path / "jinja"))
+    monkeypatch.setattr(tr, "bytecode_store", tr.BytecodeStore())
+    tr.clear_template_cache()
+    renderer = TemplateRenderer([], "/tmp/input.json", True)
+    content = '{{@ "owner/tool" | latest_release @}}'
+
+    releases = iter(["v1.0.0", "v2.0.0"])
+    monkeypatch.setattr(filters, "get_latest_release", lambda repo: next(releases))
+    monkeypatch.setattr(tr, "get_latest_release", filters.get_latest_release)
+    monkeypatch.setattr(tr, "_shared_env", None)
+    renderer.env = tr.get_environment()
+
+    assert renderer.render_template(content, {}) == "v1.0.0"
+    tr.clear_template_cache()
+    assert renderer.render_template(content, {}) == "v2.0.0"
+    assert tr.bytecode_store.hits == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_bytecode_cache_ignores_entries_others_can_write(tmp_path, monkeypatch):
+    from struct_module import template_renderer as tr
+    directory = tmp_path / "jinja"
+    monkeypatch.setenv("STRUCT_JINJA_CACHE_DIR", str(directory))
+    monkeypatch.setattr(tr, "bytecode_store", tr.BytecodeStore())
+    tr.clear_template_cache()
+    renderer = TemplateRenderer([], "/tmp/input.json", True)
+    renderer.render_template("{{@ name @}}", {"name": "x"})
+
+    assert directory.stat().st_mode & 0o777 == 0o700
+    entry, = directory.iterdir()
+    assert entry.stat().st_mode & 0o777 == 0o600
+
+    entry.chmod(0o666)
+    tr.clear_template_cache()
+    with patch.object(renderer.env, 'parse', wraps=renderer.env.parse) as mock_parse:
+        assert renderer.render_template("{{@ name @}}", {"name": "y"}) == "y"
+        assert mock_parse.call_count == 1
+    assert tr.bytecode_store.hits == 0
+
+
+@pytest.mark.parametrize('content', [
+    "plain text",
+    "trailing newline\n",
+    "windows\r\nlines\r\n",
+    "two trailing\n\n",
+    "default {{ jinja }} and {% braces %} stay as-is",
+    "",
+])
+def test_plain_text_bypasses_jinja_with_identical_output(renderer, content):
+    expected = renderer.env.from_string(content).render()
+    with patch.object(renderer.env, 'parse', side_effect=AssertionError("should not parse")):
+        assert renderer.render_template(content, {}) == expected
+        assert renderer.get_undeclared_variables(content) == set()
+        assert renderer.prompt_for_missing_vars(content, {}) == {}